@@ -0,0 +1,106 @@
+# app/agendador_emits.py
+"""
+Agendador central dos emits Socket.IO do supervisor.
+
+Estado (posto/state_patch, producao/update, transporte/update) não sai na
+hora: fica só o mais recente por chave (sala, evento, chave) e é enviado no
+próximo quadro (SOCKETIO_HZ, padrão 10 Hz). Uma rajada de mudanças vira no
+máximo um emit por chave por quadro, então o custo depende da taxa de
+quadros e não da taxa de eventos, e tablet lento não acumula fila.
+
+Alertas e comandos de tela (alerta_posto, timer/control, reset de campos...)
+vão pela faixa prioritária: emitidos na hora, sem coalescência.
+
+SOCKETIO_HZ=0 desliga o agendamento (tudo sai na hora).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AgendadorEmits:
+    def __init__(self, socketio, hz: Optional[float] = None):
+        hz = float(os.getenv("SOCKETIO_HZ", 10)) if hz is None else float(hz)
+        self.socketio = socketio
+        self.intervalo = 1.0 / hz if hz > 0 else 0.0
+        self._lock = threading.Lock()
+        self._envio = threading.Lock()   # um quadro por vez (mantém a ordem entre quadros)
+        self._pendentes = OrderedDict()  # (room, evento, chave) -> dados
+        self._contadores = {"agendados": 0, "coalescidos": 0, "emitidos": 0, "imediatos": 0, "quadros": 0}
+        if self.intervalo > 0:
+            socketio.start_background_task(self._run)
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+    def emitir(self, evento: str, dados, room: Optional[str] = None, chave=None,
+               mesclar: Optional[Callable[[dict, dict], dict]] = None) -> None:
+        """
+        Agenda o estado para o próximo quadro. Com um pendente na mesma chave,
+        o novo substitui o anterior, ou `mesclar(anterior, novo)` combina os dois.
+        """
+        if self.intervalo <= 0:
+            self._emit(evento, dados, room)
+            return
+        k = (room, evento, chave)
+        with self._lock:
+            self._contadores["agendados"] += 1
+            anterior = self._pendentes.get(k)
+            if anterior is not None:
+                self._contadores["coalescidos"] += 1
+                if mesclar is not None:
+                    dados = mesclar(anterior, dados)
+            self._pendentes[k] = dados
+
+    def emitir_imediato(self, evento: str, dados=None, room: Optional[str] = None) -> None:
+        """Faixa prioritária (alertas/comandos de tela)."""
+        with self._lock:
+            self._contadores["imediatos"] += 1
+        self._emit(evento, dados, room)
+
+    def descarregar(self) -> int:
+        """Envia agora tudo o que está pendente. Retorna quantos emits saíram."""
+        with self._envio:
+            with self._lock:
+                lote = self._pendentes
+                self._pendentes = OrderedDict()
+            if not lote:
+                return 0
+            for (room, evento, _), dados in lote.items():
+                self._emit(evento, dados, room)
+            with self._lock:
+                self._contadores["quadros"] += 1
+                self._contadores["emitidos"] += len(lote)
+            return len(lote)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {**self._contadores, "pendentes": len(self._pendentes),
+                    "hz": round(1.0 / self.intervalo, 2) if self.intervalo else 0}
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.intervalo)
+            try:
+                self.descarregar()
+            except Exception as e:
+                logger.exception("Erro no quadro de emits: %s", e)
+
+    def _emit(self, evento, dados, room):
+        args = () if dados is None else (dados,)
+        try:
+            if room is None:
+                self.socketio.emit(evento, *args)
+            else:
+                self.socketio.emit(evento, *args, room=room)
+        except Exception as e:
+            logger.error("Falha ao emitir %s: %s", evento, e)
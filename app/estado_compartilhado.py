@@ -0,0 +1,353 @@
+# app/estado_compartilhado.py
+"""
+Vários workers web com um único dono da planta.
+
+PAPEL_WORKER=principal (padrão): conexão MQTT, FSMs dos postos e supervisores.
+Com ESTADO_COMPARTILHADO_URL, o PublicadorEstado espelha o estado das linhas
+no armazém compartilhado:
+  - documento de cada posto (seq + documento), por um escritor próprio fora
+    da trava de estado: só o mais novo de cada posto é gravado;
+  - documento global (ETag + JSON), KPIs e transporte, quando a versão muda;
+  - status da produção (OFF/ARMED/ON), na transição.
+
+PAPEL_WORKER=web: sem MQTT nem postos. Cada linha é uma LinhaRemota, que lê
+do armazém o que as telas pedem (join_posto, global/request_sync, status no
+connect, /api/status_global, /api/kpi, /api/transporte). Os emits do principal
+chegam aos clientes de todos os workers pela fila do Socket.IO
+(SOCKETIO_MESSAGE_QUEUE). posto/command é repassado ao principal pelo canal de
+comandos do armazém; as demais rotas respondem 421 e devem ir ao principal.
+
+Armazéns: "memoria://<nome>" (no processo: testes e simulação) e
+"redis://host:6379/0" (pacote `redis`, opcional).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+CANAL_COMANDOS = "comandos"
+# comandos aceitos pelo PostoSupervisor.command (repassados pelos workers web)
+COMANDOS_POSTO = {"ativa_batedor", "ativa_camera", "desativa_camera"}
+
+# endpoints atendidos pelos workers web (o resto vai ao principal)
+ROTAS_WEB = {
+    "static", "ping", "quantidade_postos", "listar_linhas", "supervisorio", "posto_operador",
+    "status_global", "transporte_em_andamento", "transporte_estatisticas", "kpi_linha",
+}
+
+
+# -----------------------------------------------------------------------------
+# Armazéns
+# -----------------------------------------------------------------------------
+class ArmazemMemoria:
+    """Stand-in local do armazém: dicionário + pub/sub no próprio processo."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._valores: Dict[str, str] = {}
+        self._assinantes: Dict[str, list] = {}
+
+    def gravar(self, chave: str, valor: str) -> None:
+        with self._lock:
+            self._valores[chave] = valor
+
+    def ler(self, chave: str) -> Optional[str]:
+        with self._lock:
+            return self._valores.get(chave)
+
+    def publicar(self, canal: str, mensagem: str) -> None:
+        with self._lock:
+            assinantes = list(self._assinantes.get(canal, ()))
+        for callback in assinantes:
+            try:
+                callback(mensagem)
+            except Exception as e:
+                logger.error("Assinante de %s falhou: %s", canal, e)
+
+    def assinar(self, canal: str, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            self._assinantes.setdefault(canal, []).append(callback)
+
+
+class ArmazemRedis:
+    def __init__(self, url: str) -> None:
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("ESTADO_COMPARTILHADO_URL=redis://... precisa do pacote `redis`.") from e
+        self._r = redis.Redis.from_url(url)
+        self._pubsub = None
+
+    def gravar(self, chave: str, valor: str) -> None:
+        self._r.set(chave, valor)
+
+    def ler(self, chave: str) -> Optional[str]:
+        valor = self._r.get(chave)
+        return valor.decode("utf-8") if valor is not None else None
+
+    def publicar(self, canal: str, mensagem: str) -> None:
+        self._r.publish(canal, mensagem)
+
+    def assinar(self, canal: str, callback: Callable[[str], None]) -> None:
+        def handler(msg):
+            dados = msg.get("data")
+            try:
+                callback(dados.decode("utf-8") if isinstance(dados, bytes) else dados)
+            except Exception as e:
+                logger.error("Assinante de %s falhou: %s", canal, e)
+
+        if self._pubsub is None:
+            self._pubsub = self._r.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{canal: handler})
+            self._pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+        else:
+            self._pubsub.subscribe(**{canal: handler})
+
+
+_ARMAZENS_MEMORIA: Dict[str, ArmazemMemoria] = {}
+
+
+def armazem_para(url: str):
+    if url.startswith("memoria://"):
+        return _ARMAZENS_MEMORIA.setdefault(url, ArmazemMemoria())
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return ArmazemRedis(url)
+    raise ValueError(f"ESTADO_COMPARTILHADO_URL não suportada: {url}")
+
+
+def _chave(linha: str, item: str) -> str:
+    return f"dd:{linha or '_'}:{item}"
+
+
+# -----------------------------------------------------------------------------
+# Worker principal: espelha o estado das linhas
+# -----------------------------------------------------------------------------
+class PublicadorEstado:
+    def __init__(self, armazem, linhas, socketio, intervalo_s: Optional[float] = None) -> None:
+        self.armazem = armazem
+        self.linhas = linhas
+        self.socketio = socketio
+        self.intervalo_s = float(os.getenv("ESTADO_INTERVALO_S", 0.5)) if intervalo_s is None else intervalo_s
+        self._enviados: Dict[tuple, object] = {}   # (linha, item) -> versão gravada
+        # (linha, posto) -> (seq, documento) ainda não gravado; só o mais novo importa
+        self._postos_pendentes: Dict[tuple, tuple] = {}
+        self._cond_postos = threading.Condition()
+
+    def iniciar(self) -> None:
+        for supervisor in self.linhas:
+            supervisor.ouvintes_estado.append(
+                lambda posto_id, seq, doc, linha=supervisor.linha: self._posto_alterado(linha, posto_id, seq, doc)
+            )
+            supervisor.state.observar_producao(
+                lambda status, versao, supervisor=supervisor: self._gravar_status(supervisor)
+            )
+            self._gravar_status(supervisor)
+            for posto_id in supervisor.postos:
+                doc = supervisor.get_snapshot(posto_id)   # estado atual, com o seq já enviado
+                if doc:
+                    self._gravar_posto(supervisor.linha, posto_id, doc["seq"], doc)
+        self.armazem.assinar(CANAL_COMANDOS, self._executar_comando)
+        self.publicar()
+        self.socketio.start_background_task(self._run)
+        self.socketio.start_background_task(self._run_postos)
+
+    def _posto_alterado(self, linha, posto_id, seq, doc) -> None:
+        # chamado sob a trava de estado do supervisor: só registra, a escrita
+        # no armazém (rede) fica com _run_postos
+        with self._cond_postos:
+            self._postos_pendentes[(linha, posto_id)] = (seq, doc)
+            self._cond_postos.notify()
+
+    def _run_postos(self):
+        while True:
+            with self._cond_postos:
+                while not self._postos_pendentes:
+                    self._cond_postos.wait()
+                lote = self._postos_pendentes
+                self._postos_pendentes = {}
+            for (linha, posto_id), (seq, doc) in lote.items():
+                self._gravar_posto(linha, posto_id, seq, doc)
+
+    def _gravar_posto(self, linha, posto_id, seq, doc) -> None:
+        try:
+            self.armazem.gravar(_chave(linha, f"posto:{posto_id}"),
+                                json.dumps({**doc, "seq": seq}, default=str, ensure_ascii=False))
+        except Exception as e:
+            logger.error("Falha ao espelhar %s/%s: %s", linha, posto_id, e)
+
+    def _gravar_status(self, supervisor) -> None:
+        state = supervisor.state
+        status, versao = state.get_producao_status_versionado()
+        doc = {"status": status, "versao": versao, "ordem": state.get_ordem_atual(),
+               "meta": state.get_meta(), "modelo": state.get_modelo()}
+        try:
+            self.armazem.gravar(_chave(supervisor.linha, "status"), json.dumps(doc, default=str))
+        except Exception as e:
+            logger.error("Falha ao espelhar status (%s): %s", supervisor.linha, e)
+
+    def publicar(self) -> None:
+        """Documento global, transporte e KPIs de cada linha, se a versão mudou."""
+        for supervisor in self.linhas:
+            linha = supervisor.linha
+            etag, corpo = supervisor.documento_global_json()
+            if self._enviados.get((linha, "global")) != etag:
+                # etag + JSON no mesmo valor: quem lê nunca vê um par misturado
+                self.armazem.gravar(_chave(linha, "global"), etag + "\n" + corpo.decode("utf-8"))
+                self.armazem.gravar(_chave(linha, "transporte"), json.dumps({
+                    "valores": supervisor.transitos.valores(),
+                    "estatisticas": supervisor.transitos.estatisticas(),
+                }, default=str))
+                self._enviados[(linha, "global")] = etag
+            if self._enviados.get((linha, "kpi")) != supervisor.kpi.versao:
+                resumo = supervisor.kpi_atual()
+                self.armazem.gravar(_chave(linha, "kpi"), json.dumps(resumo, default=str))
+                self._enviados[(linha, "kpi")] = resumo["versao"]
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.intervalo_s)
+            try:
+                self.publicar()
+            except Exception as e:
+                logger.error("Falha ao espelhar o estado das linhas: %s", e)
+
+    def _executar_comando(self, mensagem: str) -> None:
+        try:
+            dados = json.loads(mensagem)
+        except (TypeError, ValueError):
+            logger.warning("Comando inválido no canal %s: %r", CANAL_COMANDOS, mensagem)
+            return
+        if not isinstance(dados, dict):
+            logger.warning("Comando inválido no canal %s: %r", CANAL_COMANDOS, mensagem)
+            return
+        linha, posto_id, cmd, args = dados.get("linha"), dados.get("posto"), dados.get("cmd"), dados.get("args") or {}
+        supervisor = self.linhas.obter(linha) if linha is None or isinstance(linha, str) else None
+        if (supervisor is None or not isinstance(posto_id, str) or posto_id not in supervisor.postos
+                or cmd not in COMANDOS_POSTO or not isinstance(args, dict)):
+            logger.warning("Comando recusado: linha=%r posto=%r cmd=%r", linha, posto_id, cmd)
+            return
+        supervisor.command(posto_id, cmd, **args)
+
+
+# -----------------------------------------------------------------------------
+# Worker web: leitura do armazém
+# -----------------------------------------------------------------------------
+def _ler_json(armazem, chave, padrao=None):
+    valor = armazem.ler(chave)
+    return json.loads(valor) if valor is not None else padrao
+
+
+class EstadoRemoto:
+    """Subconjunto de leitura do State, a partir do status espelhado pelo principal."""
+
+    def __init__(self, armazem, linha: str) -> None:
+        self._armazem = armazem
+        self._linha = linha
+
+    def _doc(self) -> dict:
+        return _ler_json(self._armazem, _chave(self._linha, "status"), {"status": "OFF", "versao": 0})
+
+    def get_producao_status_versionado(self):
+        doc = self._doc()
+        return doc["status"], doc["versao"]
+
+    def get_producao_status(self) -> str:
+        return self._doc()["status"]
+
+    def get_ordem_atual(self):
+        return self._doc().get("ordem")
+
+    def producao_ligada(self) -> bool:
+        return self.get_producao_status() == "ON"
+
+    def observar_producao(self, callback) -> None:
+        # as transições chegam aos clientes pelo emit do principal (fila do Socket.IO)
+        pass
+
+
+class TransitosRemotos:
+    def __init__(self, armazem, linha: str) -> None:
+        self._armazem = armazem
+        self._linha = linha
+
+    def _doc(self) -> dict:
+        return _ler_json(self._armazem, _chave(self._linha, "transporte"), {"valores": [], "estatisticas": {}})
+
+    def valores(self):
+        return self._doc()["valores"]
+
+    def estatisticas(self):
+        return self._doc()["estatisticas"]
+
+
+class LinhaRemota:
+    """
+    No worker web, ocupa o lugar do PostoSupervisor nas rotas e no gateway
+    Socket.IO: mesma interface de leitura, dados do armazém.
+    """
+
+    def __init__(self, armazem, linha_id: str, ultimo_posto: int, relogio=None) -> None:
+        from auxiliares.relogio import relogio_atual
+        from auxiliares.utils import sala_linha
+
+        self.armazem = armazem
+        self.linha = linha_id
+        self.sala_geral = sala_linha(linha_id)
+        self.relogio = relogio or relogio_atual()
+        self.postos = {f"posto_{i}": None for i in range(ultimo_posto + 1)}
+        self.state = EstadoRemoto(armazem, linha_id)
+        self.transitos = TransitosRemotos(armazem, linha_id)
+
+    def sala_posto(self, posto_id):
+        from auxiliares.utils import sala_posto
+        return sala_posto(self.linha, posto_id)
+
+    def topico(self, topico):
+        from auxiliares.utils import topico_da_linha
+        return topico_da_linha(self.linha, topico)
+
+    def get_snapshot(self, posto_id):
+        return _ler_json(self.armazem, _chave(self.linha, f"posto:{posto_id}"))
+
+    def documento_global_json(self):
+        valor = self.armazem.ler(_chave(self.linha, "global"))
+        if valor is None:
+            return "vazio", b"{}"
+        etag, _, corpo = valor.partition("\n")
+        return etag, corpo.encode("utf-8")
+
+    def get_global_status(self):
+        _, corpo = self.documento_global_json()
+        doc = json.loads(corpo)
+        # cronômetro calculado aqui, como no principal
+        tempo_ms = doc.get("timer_base_ms") or 0
+        if doc.get("timer_running") and doc.get("timer_inicio_ms"):
+            tempo_ms += self.relogio.agora() * 1000 - doc["timer_inicio_ms"]
+        return {**doc, "timer_ms": tempo_ms}
+
+    def kpi_atual(self):
+        return _ler_json(self.armazem, _chave(self.linha, "kpi"), {})
+
+    def command(self, posto_id, cmd, **kwargs):
+        self.armazem.publicar(CANAL_COMANDOS, json.dumps(
+            {"linha": self.linha, "posto": posto_id, "cmd": cmd, "args": kwargs}
+        ))
+
+
+def restringir_rotas_web(app) -> None:
+    """No worker web, só as rotas de leitura em ROTAS_WEB; as outras respondem 421."""
+
+    @app.before_request
+    def _somente_leitura():
+        if request.endpoint in ROTAS_WEB and request.method in ("GET", "HEAD"):
+            return None
+        if request.path.startswith("/socket.io"):
+            return None
+        return jsonify(status="erro", mensagem="Rota atendida pelo worker principal."), 421
@@ -0,0 +1,78 @@
+# app/fila_eventos.py
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+from auxiliares.relogio import relogio_atual
+
+logger = logging.getLogger(__name__)
+
+
+class FilaEventosPosto:
+    """
+    Fila ordenada de eventos de dispositivo de um único posto.
+
+    O callback MQTT só carimba o evento (relógio monotônico na recepção) e enfileira;
+    um worker por posto consome a fila em ordem. Assim um commit lento ou uma
+    regravação de CSV em um posto não atrasa os eventos dos outros, e os tempos
+    de ciclo são calculados com o instante em que a mensagem chegou, não com o
+    instante em que foi processada.
+
+    Com eventlet.monkey_patch() as threads viram greenlets.
+    """
+
+    def __init__(self, posto_id: str, processar: Callable[[str, float], None], relogio=None):
+        self.posto_id = posto_id
+        self.relogio = relogio or relogio_atual()
+        self._processar = processar
+        self._fila = queue.Queue()
+        self._t = threading.Thread(target=self._run, daemon=True, name=f"eventos_{posto_id}")
+        self._t.start()
+
+    def enfileirar(self, payload: str, recebido_em: float | None = None) -> None:
+        recebido_em = self.relogio.monotonic() if recebido_em is None else recebido_em
+        # o atraso na fila é medido em tempo de parede (o relógio pode ser virtual)
+        self._fila.put((payload, recebido_em, time.perf_counter()))
+
+    def executar(self, tarefa: Callable[[], None]) -> None:
+        """
+        Enfileira uma tarefa que mexe no posto fora da FSM (ex: associação do palete
+        no posto 0): roda no worker, na ordem dos eventos já enfileirados.
+        """
+        self._fila.put((tarefa, None, time.perf_counter()))
+
+    def descartar(self) -> int:
+        """Remove os eventos ainda não processados (usado no reset da produção)."""
+        n = 0
+        while True:
+            try:
+                self._fila.get_nowait()
+            except queue.Empty:
+                return n
+            self._fila.task_done()
+            n += 1
+
+    def profundidade(self) -> int:
+        return self._fila.qsize()
+
+    def aguardar(self) -> None:
+        """Bloqueia até todos os eventos enfileirados terem sido processados."""
+        self._fila.join()
+
+    def _run(self):
+        while True:
+            payload, recebido_em, entrada = self._fila.get()
+            try:
+                atraso = time.perf_counter() - entrada
+                if atraso > 1.0:
+                    logger.warning("[%s] Evento %s processado com %.2fs de atraso na fila.", self.posto_id, payload, atraso)
+                if callable(payload):
+                    payload()
+                else:
+                    self._processar(payload, recebido_em)
+            except Exception as e:
+                logger.exception("[%s] Erro processando evento %s: %s", self.posto_id, payload, e)
+            finally:
+                self._fila.task_done()
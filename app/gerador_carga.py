@@ -0,0 +1,195 @@
+# app/gerador_carga.py
+"""
+Gerador de carga sintética para a linha.
+
+Monta uma linha simulada (app.simulacao) com N postos e M paletes e publica,
+pelo broker simulado, o que os ESP32 e a visão publicariam: leitura NFC do
+palete, BT1, estados da visão (MONTAGEM -> FINALIZADO, para o gate do BT2
+liberar), BT2 e BD. O roteiro é calculado antes (flow shop: cada posto atende
+um palete por vez e um palete só volta ao posto 0 depois de sair do último).
+
+    python -m app.gerador_carga --postos 5 --paletes 8 --produtos 200 --velocidade 50
+
+Saída: eventos/s sustentados, latência p50/p99 por etapa e crescimento de memória.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tracemalloc
+from typing import List, Tuple
+
+import numpy as np
+
+from app.simulacao import formatar_resumo, montar_linha_simulada
+from auxiliares.relogio import RelogioVirtual
+from auxiliares.mqtt_outbox import outbox_para
+
+# fração do tempo de ciclo em cada etapa do posto
+FRACAO_PREPARO = 0.2
+FRACAO_MONTAGEM = 0.6
+# a visão passa a FINALIZADO nesta fração da montagem
+FRACAO_VISAO_FINALIZADO = 0.5
+
+
+def uids_paletes(n_paletes: int) -> List[Tuple[str, str]]:
+    """(uid NFC, palete) sintéticos, no mesmo formato de cartao_palete."""
+    return [(f" F{k // 256:02X} {k % 256:02X} 5A 5A", f"PLTS{k:03d}") for k in range(n_paletes)]
+
+
+def gerar_roteiro(n_postos: int, n_paletes: int, n_produtos: int,
+                  ciclo_medio: float, ciclo_desvio: float, transporte: float,
+                  seed: int | None = None) -> List[Tuple[float, str, str]]:
+    """
+    Lista (t, tópico, payload) ordenada por t (segundos simulados).
+    n_postos: quantidade de postos (posto_0 .. posto_{n_postos-1}).
+    """
+    rng = np.random.default_rng(seed)
+    uids = [uid for uid, _ in uids_paletes(n_paletes)]
+    livre_posto = [0.0] * n_postos
+    livre_palete = [0.0] * n_paletes
+    eventos = []
+    seq = 0
+
+    def ev(t, topico, payload):
+        nonlocal seq
+        eventos.append((t, seq, topico, payload))
+        seq += 1
+
+    for j in range(n_produtos):
+        p = j % n_paletes
+        uid = uids[p]
+        saida = max(livre_palete[p], livre_posto[0]) - transporte
+        for i in range(n_postos):
+            dispositivo = f"rastreio_nfc/esp32/posto_{i}/dispositivo"
+            visao = f"visao/posto_{i}/estado"
+            t = max(saida + transporte, livre_posto[i]) + 0.1
+            ciclo = max(float(rng.normal(ciclo_medio, ciclo_desvio)), 1.0)
+            t_bt1 = t + ciclo * FRACAO_PREPARO
+            t_bt2 = t_bt1 + ciclo * FRACAO_MONTAGEM
+            t_bd = t + ciclo
+
+            ev(t, dispositivo, uid)
+            ev(t_bt1, dispositivo, "BT1")
+            ev(t_bt1 + 0.01, visao, "MONTAGEM")
+            ev(t_bt1 + ciclo * FRACAO_MONTAGEM * FRACAO_VISAO_FINALIZADO, visao, "FINALIZADO")
+            ev(t_bt2, dispositivo, "BT2")
+            ev(t_bd, dispositivo, "BD")
+            ev(t_bd + 0.01, visao, "INICIO")
+
+            livre_posto[i] = t_bd
+            saida = t_bd
+        livre_palete[p] = saida
+
+    eventos.sort()
+    return [(t, topico, payload) for t, _, topico, payload in eventos]
+
+
+def _rss_kb() -> int:
+    """RSS atual em kB (Linux); cai para o pico do processo em outros sistemas."""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def executar_carga(n_postos: int, n_paletes: int, n_produtos: int,
+                   ciclo_medio: float = 30.0, ciclo_desvio: float = 5.0, transporte: float = 5.0,
+                   velocidade: float = 1.0, seed: int | None = None, rastrear_memoria: bool = False) -> dict:
+    if n_postos < 2:
+        raise ValueError("A linha precisa de pelo menos 2 postos.")
+
+    # NUMERO_POSTOS é o índice do último posto
+    # velocidade 0: relógio virtual, o turno inteiro roda sem esperar o tempo real
+    relogio = RelogioVirtual() if velocidade <= 0 else None
+    linha = montar_linha_simulada(n_postos=n_postos - 1, relogio=relogio)
+
+    from auxiliares.configuracoes import cartao_palete
+    cartao_palete.update(uids_paletes(n_paletes))
+
+    roteiro = gerar_roteiro(n_postos, n_paletes, n_produtos, ciclo_medio, ciclo_desvio, transporte, seed)
+
+    if rastrear_memoria:
+        tracemalloc.start()
+    rss_inicio = _rss_kb()
+
+    duracao = linha.reproduzir(roteiro, velocidade)
+    outbox_para(linha.mqtt).drenar()
+
+    rss_fim = _rss_kb()
+    memoria = {"rss_inicio_kb": rss_inicio, "rss_fim_kb": rss_fim, "crescimento_kb": rss_fim - rss_inicio}
+    if rastrear_memoria:
+        atual, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memoria.update({"python_atual_kb": atual // 1024, "python_pico_kb": pico // 1024})
+
+    concluidos = linha.produtos_concluidos()
+    return {
+        "postos": n_postos,
+        "paletes": n_paletes,
+        "produtos": n_produtos,
+        "produtos_concluidos": concluidos,
+        "velocidade": velocidade,
+        "eventos": len(roteiro),
+        "duracao_simulada_s": roteiro[-1][0] - roteiro[0][0] if roteiro else 0.0,
+        "duracao_s": duracao,
+        "eventos_por_s": len(roteiro) / duracao if duracao > 0 else float("inf"),
+        "emits_socketio": linha.socketio.total_emitidos,
+        "bytes_socketio": linha.socketio.total_bytes,
+        "memoria": memoria,
+        "memoria_por_produto_kb": memoria["crescimento_kb"] / concluidos if concluidos else None,
+        "latencia": linha.medidor.resumo(),
+        "outbox_mqtt": outbox_para(linha.mqtt).estatisticas(),
+        "pasta": linha.pasta,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Carga sintética na linha simulada.")
+    parser.add_argument("--postos", type=int, default=int(os.getenv("NUMERO_POSTOS", 2)) + 1, help="quantidade de postos")
+    parser.add_argument("--paletes", type=int, default=4)
+    parser.add_argument("--produtos", type=int, default=100)
+    parser.add_argument("--ciclo-medio", type=float, default=30.0, help="tempo de ciclo médio por posto (s)")
+    parser.add_argument("--ciclo-desvio", type=float, default=5.0, help="desvio padrão do tempo de ciclo (s)")
+    parser.add_argument("--transporte", type=float, default=5.0, help="tempo de transporte entre postos (s)")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="1 = tempo real, N = Nx, 0 = máximo")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--tracemalloc", action="store_true", help="mede também a memória alocada pelo Python")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    r = executar_carga(
+        args.postos, args.paletes, args.produtos,
+        ciclo_medio=args.ciclo_medio, ciclo_desvio=args.ciclo_desvio, transporte=args.transporte,
+        velocidade=args.velocidade, seed=args.seed, rastrear_memoria=args.tracemalloc,
+    )
+
+    if args.json:
+        print(json.dumps(r, indent=2, ensure_ascii=False))
+        return 0
+
+    m = r["memoria"]
+    print(f"Linha:               {r['postos']} postos, {r['paletes']} paletes")
+    print(f"Produtos:            {r['produtos_concluidos']}/{r['produtos']} concluídos")
+    print(f"Eventos:             {r['eventos']} em {r['duracao_s']:.2f}s (simulado {r['duracao_simulada_s']:.0f}s, velocidade {r['velocidade']:g})")
+    print(f"Eventos/s:           {r['eventos_por_s']:.1f}")
+    print(f"Emits Socket.IO:     {r['emits_socketio']} ({r['bytes_socketio'] / 1024:.1f} kB)")
+    print(f"Memória (RSS):       {m['rss_inicio_kb']} -> {m['rss_fim_kb']} kB ({m['crescimento_kb']:+d} kB)")
+    if "python_pico_kb" in m:
+        print(f"Memória (Python):    atual {m['python_atual_kb']} kB, pico {m['python_pico_kb']} kB")
+    o = r["outbox_mqtt"]
+    print(f"Comandos MQTT:       {o['publicados']} publicados de {o['enfileirados']} ({o['coalescidos']} coalescidos)")
+    print()
+    print(formatar_resumo(r["latencia"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
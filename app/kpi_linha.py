@@ -0,0 +1,178 @@
+# app/kpi_linha.py
+"""
+KPIs da linha calculados de forma incremental.
+
+Alimentado pelos tempos que cada posto registra (preparo, montagem, espera,
+ciclo) e pelas conclusões no último posto. Cada evento custa O(1): média
+acumulada, EWMA e média de uma janela fixa por (posto, etapa), e uma janela
+de tempo com as últimas conclusões para a vazão.
+
+- vazão: produtos/h nas conclusões dos últimos `janela_vazao_s` segundos;
+- ritmo: EWMA do intervalo entre conclusões;
+- takt: TEMPO_TURNO_H / meta da ordem (tempo disponível por unidade);
+- gargalo: posto com maior EWMA de trabalho (preparo + montagem). A espera
+  não conta: é tempo bloqueado pelo posto seguinte.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from auxiliares.relogio import relogio_atual
+
+CAMPOS_KPI = ("tempo_preparo", "tempo_montagem", "tempo_espera", "tempo_ciclo")
+CAMPOS_TRABALHO = ("tempo_preparo", "tempo_montagem")
+
+
+class JanelaMovel:
+    """Média das últimas `tamanho` amostras (soma corrente, O(1))."""
+
+    __slots__ = ("_v", "_soma")
+
+    def __init__(self, tamanho: int) -> None:
+        self._v = deque(maxlen=tamanho)
+        self._soma = 0.0
+
+    def adicionar(self, x: float) -> None:
+        if len(self._v) == self._v.maxlen:
+            self._soma -= self._v[0]
+        self._v.append(x)
+        self._soma += x
+
+    def media(self) -> Optional[float]:
+        return self._soma / len(self._v) if self._v else None
+
+
+class EstatisticaEtapa:
+    __slots__ = ("n", "media", "ewma", "janela", "alfa")
+
+    def __init__(self, janela: int, alfa: float) -> None:
+        self.n = 0
+        self.media = 0.0
+        self.ewma: Optional[float] = None
+        self.janela = JanelaMovel(janela)
+        self.alfa = alfa
+
+    def adicionar(self, x: float) -> None:
+        self.n += 1
+        self.media += (x - self.media) / self.n
+        self.ewma = x if self.ewma is None else self.alfa * x + (1 - self.alfa) * self.ewma
+        self.janela.adicionar(x)
+
+    def resumo(self) -> dict:
+        janela = self.janela.media()
+        return {
+            "n": self.n,
+            "media_s": round(self.media, 2),
+            "ewma_s": round(self.ewma, 2) if self.ewma is not None else None,
+            "janela_s": round(janela, 2) if janela is not None else None,
+        }
+
+
+def _arred(x, casas=2):
+    return round(x, casas) if x is not None else None
+
+
+class KpiLinha:
+    def __init__(self, postos: Iterable[str], janela: int = 20, alfa: float = 0.2,
+                 janela_vazao_s: float = 900.0, relogio=None) -> None:
+        self.relogio = relogio or relogio_atual()
+        self.postos = list(postos)
+        self.janela = janela
+        self.alfa = alfa
+        self.janela_vazao_s = janela_vazao_s
+        self.turno_s = float(os.getenv("TEMPO_TURNO_H", 8)) * 3600.0
+        self._trava = threading.Lock()
+        self.versao = 0
+        self._limpar()
+
+    def _limpar(self) -> None:
+        self._etapas: Dict[str, Dict[str, EstatisticaEtapa]] = {
+            pid: {campo: EstatisticaEtapa(self.janela, self.alfa) for campo in CAMPOS_KPI}
+            for pid in self.postos
+        }
+        self._conclusoes = deque(maxlen=10_000)  # instantes (monotônico) das conclusões na janela
+        self._ultima_conclusao: Optional[float] = None
+        self._ritmo_ewma: Optional[float] = None
+        self.produzidos = 0
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+    def registrar_tempo(self, posto_id: str, campo: str, valor: float) -> None:
+        if campo not in CAMPOS_KPI:
+            return
+        with self._trava:
+            etapas = self._etapas.get(posto_id)
+            if etapas is None:
+                return
+            etapas[campo].adicionar(float(valor))
+            self.versao += 1
+
+    def registrar_conclusao(self, ts: Optional[float] = None) -> None:
+        """Produto concluído no último posto."""
+        ts = self.relogio.monotonic() if ts is None else ts
+        with self._trava:
+            self.produzidos += 1
+            if self._ultima_conclusao is not None:
+                intervalo = max(0.0, ts - self._ultima_conclusao)
+                self._ritmo_ewma = intervalo if self._ritmo_ewma is None else (
+                    self.alfa * intervalo + (1 - self.alfa) * self._ritmo_ewma
+                )
+            self._ultima_conclusao = ts
+            self._conclusoes.append(ts)
+            self._podar(ts)
+            self.versao += 1
+
+    def _podar(self, agora: float) -> None:
+        # chamar com self._trava
+        limite = agora - self.janela_vazao_s
+        while self._conclusoes and self._conclusoes[0] < limite:
+            self._conclusoes.popleft()
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._limpar()
+            self.versao += 1
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def resumo(self, meta: int = 0) -> dict:
+        with self._trava:
+            self._podar(self.relogio.monotonic())
+            n = len(self._conclusoes)
+            vazao_h = None
+            if n >= 2 and self._conclusoes[-1] > self._conclusoes[0]:
+                vazao_h = (n - 1) * 3600.0 / (self._conclusoes[-1] - self._conclusoes[0])
+
+            postos = {}
+            trabalho = {}
+            for pid, etapas in self._etapas.items():
+                postos[pid] = {campo.replace("tempo_", ""): est.resumo() for campo, est in etapas.items()}
+                ewmas = [etapas[c].ewma for c in CAMPOS_TRABALHO]
+                if all(e is not None for e in ewmas):
+                    trabalho[pid] = sum(ewmas)
+
+            gargalo = max(trabalho, key=trabalho.get) if trabalho else None
+            maior = trabalho.get(gargalo) if gargalo else None
+            for pid, t in trabalho.items():
+                postos[pid]["trabalho_ewma_s"] = round(t, 2)
+                postos[pid]["carga_relativa"] = round(t / maior, 3) if maior else None
+
+            takt = self.turno_s / meta if meta and meta > 0 else None
+            ritmo = self._ritmo_ewma
+            return {
+                "versao": self.versao,
+                "produzidos": self.produzidos,
+                "vazao_h": _arred(vazao_h, 1),
+                "ritmo_s": _arred(ritmo),
+                "takt_s": _arred(takt),
+                # >= 1: a linha acompanha o takt
+                "aderencia_takt": _arred(takt / ritmo, 3) if takt and ritmo else None,
+                "gargalo": gargalo,
+                "gargalo_trabalho_s": _arred(maior),
+                "postos": postos,
+            }
@@ -0,0 +1,105 @@
+# app/linhas.py
+"""
+Várias linhas de produção no mesmo processo.
+
+LINHAS="L1:3,L2:5" declara as linhas (id:último posto). Cada linha tem seu
+State, VisionStateStore, postos e PostoSupervisor; tópicos MQTT levam o id
+como primeiro nível (L2/rastreio_nfc/esp32/posto_0/dispositivo) e as salas
+Socket.IO o id como prefixo (L2:posto:posto_0, linha:L2).
+
+Compartilhado entre as linhas: a conexão MQTT (e sua outbox), o servidor
+Socket.IO, os engines/pools do banco (auxiliares.db) e os escritores de
+producao_ciclos, a tabela de associações palete<->produto e o cache de
+funcionários.
+
+Sem LINHAS: uma única linha com id "" e NUMERO_POSTOS, com tópicos, salas e
+arquivos exatamente como antes.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_RE_ID_LINHA = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def ler_configuracao_linhas(valor: Optional[str] = None) -> List[Tuple[str, int]]:
+    """[(id, último posto)] a partir de LINHAS; sem LINHAS, [("", NUMERO_POSTOS)]."""
+    valor = os.getenv("LINHAS", "") if valor is None else valor
+    linhas = []
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        linha_id, _, ultimo = item.partition(":")
+        linha_id = linha_id.strip()
+        if not _RE_ID_LINHA.fullmatch(linha_id):
+            raise ValueError(f"Id de linha inválido em LINHAS: {linha_id!r}")
+        if any(linha_id == existente for existente, _ in linhas):
+            raise ValueError(f"Linha repetida em LINHAS: {linha_id}")
+        linhas.append((linha_id, int(ultimo) if ultimo.strip() else int(os.getenv("NUMERO_POSTOS", 2))))
+    return linhas or [("", int(os.getenv("NUMERO_POSTOS", 2)))]
+
+
+def montar_linha(linha_id: str, ultimo_posto: int, mqttc, socketio, **kwargs):
+    """State, visão, postos e supervisor de uma linha (kwargs vão para o PostoSupervisor)."""
+    from auxiliares.classes import inicializar_postos
+    from app.supervisor import PostoSupervisor
+    from state import State
+    from vision_state import VisionStateStore
+
+    state = State(ultimo_posto)
+    postos = inicializar_postos(mqttc, linha=linha_id, ultimo_posto=ultimo_posto)
+    return PostoSupervisor(
+        postos, socketio, mqttc,
+        state=state,
+        vision_state=VisionStateStore(),
+        linha=linha_id,
+        **kwargs,
+    )
+
+
+def supervisor_da_requisicao(linhas):
+    """Supervisor da linha pedida (?linha=, campo `linha` do form/JSON; sem linha = padrão). 404 se não existe."""
+    from flask import abort, request
+
+    dados = request.get_json(silent=True) or {}
+    linha_id = request.values.get("linha") or dados.get("linha")
+    supervisor = linhas.obter(linha_id)
+    if supervisor is None:
+        abort(404, description=f"Linha {linha_id} não encontrada.")
+    return supervisor
+
+
+class RegistroLinhas:
+    """Supervisores por id de linha. A primeira linha registrada é a padrão."""
+
+    def __init__(self) -> None:
+        self._linhas: "OrderedDict[str, object]" = OrderedDict()
+
+    def registrar(self, supervisor) -> None:
+        if supervisor.linha in self._linhas:
+            raise ValueError(f"Linha já registrada: {supervisor.linha!r}")
+        self._linhas[supervisor.linha] = supervisor
+        logger.info("Linha registrada: %s (%d postos)", supervisor.linha or "<padrão>", len(supervisor.postos))
+
+    @property
+    def padrao(self):
+        return next(iter(self._linhas.values()))
+
+    def obter(self, linha_id: Optional[str] = None):
+        """Supervisor da linha; sem id (None/""), a linha padrão. None se o id não existe."""
+        if not linha_id:
+            return self.padrao
+        return self._linhas.get(linha_id)
+
+    def ids(self) -> List[str]:
+        return list(self._linhas.keys())
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self._linhas.values()))
+
+    def __len__(self) -> int:
+        return len(self._linhas)
@@ -0,0 +1,55 @@
+# app/rastreio_rota.py
+from typing import Dict, Iterable, Optional
+
+
+class ProgressoRota:
+    """
+    Progresso de cada produto ao longo da linha.
+
+    Guarda, por produto, o maior posto concluído de forma contígua a partir do
+    posto 0 (ex: concluiu 0, 1 e 2 -> 2). É atualizado a cada BD, então a
+    checagem de trajetória vira uma única consulta ao dicionário.
+    """
+
+    def __init__(self) -> None:
+        self._ultimo_concluido: Dict[str, int] = {}
+
+    def registrar_conclusao(self, produto: str, n_posto: int) -> bool:
+        """
+        Registra que o produto concluiu o posto `n_posto`.
+        Retorna False se a conclusão não é contígua (pulou algum posto).
+        """
+        if not produto:
+            return False
+        atual = self._ultimo_concluido.get(produto, -1)
+        if n_posto == atual + 1:
+            self._ultimo_concluido[produto] = n_posto
+            return True
+        return n_posto <= atual
+
+    def trajetoria_correta(self, produto: Optional[str], n_posto: int) -> bool:
+        """True se o produto concluiu todos os postos anteriores a `n_posto`."""
+        if n_posto <= 0:
+            return True
+        if not produto:
+            return False
+        return self._ultimo_concluido.get(produto, -1) >= n_posto - 1
+
+    def ultimo_posto_concluido(self, produto: str) -> Optional[int]:
+        return self._ultimo_concluido.get(produto)
+
+    def reconstruir(self, concluidos_por_posto: Iterable[Iterable[str]]) -> None:
+        """
+        Refaz o progresso a partir dos produtos concluídos em cada posto,
+        na ordem da linha (posto 0, 1, 2, ...).
+        """
+        self._ultimo_concluido.clear()
+        for n_posto, produtos in enumerate(concluidos_por_posto):
+            for produto in produtos:
+                self.registrar_conclusao(produto, n_posto)
+
+    def limpar(self) -> None:
+        self._ultimo_concluido.clear()
+
+    def __len__(self) -> int:
+        return len(self._ultimo_concluido)
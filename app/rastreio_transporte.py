@@ -0,0 +1,216 @@
+# app/rastreio_transporte.py
+import bisect
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class QuantilP2:
+    """
+    Quantil aproximado em memória fixa (algoritmo P², Jain & Chlamtac 1985).
+
+    Mantém 5 marcadores; cada amostra custa O(1). As primeiras LIMITE_EXATO
+    amostras também são guardadas e, até lá, o valor é exato (o P² ainda
+    não convergiu com poucas amostras).
+    """
+
+    LIMITE_EXATO = 32
+
+    def __init__(self, p: float) -> None:
+        self.p = p
+        self.n = 0
+        self._exatas: List[float] = []
+        self._q: List[float] = []                 # alturas dos marcadores
+        self._pos = [1, 2, 3, 4, 5]               # posições reais
+        self._des = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]  # posições desejadas
+        self._inc = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def adicionar(self, x: float) -> None:
+        self.n += 1
+        if self.n <= self.LIMITE_EXATO:
+            bisect.insort(self._exatas, x)
+        elif self._exatas:
+            self._exatas = []
+        q, pos = self._q, self._pos
+        if self.n <= 5:
+            bisect.insort(q, x)
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self._des[i] += self._inc[i]
+
+        for i in (1, 2, 3):
+            d = self._des[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                novo = self._parabolico(i, d)
+                if not q[i - 1] < novo < q[i + 1]:
+                    novo = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = novo
+                pos[i] += d
+
+    def _parabolico(self, i: int, d: int) -> float:
+        q, n = self._q, self._pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def valor(self) -> Optional[float]:
+        if self.n == 0:
+            return None
+        if self._exatas:
+            # interpolação linear entre as amostras ordenadas (como numpy.percentile)
+            h = self.p * (len(self._exatas) - 1)
+            i = int(h)
+            j = min(i + 1, len(self._exatas) - 1)
+            return self._exatas[i] + (h - i) * (self._exatas[j] - self._exatas[i])
+        return self._q[2]
+
+
+class EstatisticaTrecho:
+    """Contagem, média/desvio (Welford), mín/máx e p50/p95 (P²) dos tempos de um trecho."""
+
+    def __init__(self) -> None:
+        self.n = 0
+        self._media = 0.0
+        self._m2 = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        self.ultimo: Optional[float] = None
+        self._p50 = QuantilP2(0.5)
+        self._p95 = QuantilP2(0.95)
+
+    def adicionar(self, duracao: float) -> None:
+        self.n += 1
+        delta = duracao - self._media
+        self._media += delta / self.n
+        self._m2 += delta * (duracao - self._media)
+        self.minimo = min(self.minimo, duracao)
+        self.maximo = max(self.maximo, duracao)
+        self.ultimo = duracao
+        self._p50.adicionar(duracao)
+        self._p95.adicionar(duracao)
+
+    def resumo(self) -> dict:
+        if self.n == 0:
+            return {"n": 0}
+        desvio = math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0
+        return {
+            "n": self.n,
+            "media_s": round(self._media, 3),
+            "desvio_s": round(desvio, 3),
+            "min_s": round(self.minimo, 3),
+            "max_s": round(self.maximo, 3),
+            "p50_s": round(self._p50.valor(), 3),
+            "p95_s": round(self._p95.valor(), 3),
+            "ultimo_s": round(self.ultimo, 3),
+        }
+
+
+class RastreioTransporte:
+    """
+    Produtos em transporte entre postos, indexados por trecho, destino e produto.
+
+    A chegada ao destino (leitura NFC no posto seguinte) é uma consulta ao
+    índice, e a duração do transporte entra nas estatísticas do trecho.
+    Chamado pelos workers dos dois postos do trecho: tudo sob uma trava.
+    """
+
+    def __init__(self) -> None:
+        self._trava = threading.Lock()
+        self._transitos: Dict[str, dict] = {}       # trecho -> info
+        self._por_destino: Dict[str, str] = {}      # destino -> trecho
+        self._por_produto: Dict[str, str] = {}      # produto -> trecho
+        self._estatisticas: Dict[str, EstatisticaTrecho] = {}
+
+    @staticmethod
+    def chave_trecho(origem_id: str, destino_id: str) -> str:
+        return f"{origem_id}->{destino_id}"
+
+    def iniciar(self, origem_id: str, destino_id: str, produto: str, inicio_ts: float, inicio_mono: float) -> str:
+        """
+        Registra a saída do produto. `inicio_ts` (epoch) vai para o front;
+        `inicio_mono` (relógio monotônico do evento) mede a duração.
+        """
+        trecho = self.chave_trecho(origem_id, destino_id)
+        with self._trava:
+            self._remover(trecho)
+            anterior = self._por_produto.get(produto)
+            if anterior is not None:
+                self._remover(anterior)
+            self._transitos[trecho] = {
+                "origem": origem_id,
+                "destino": destino_id,
+                "produto": produto,
+                "inicio_ts": inicio_ts,
+                "_inicio_mono": inicio_mono,
+            }
+            self._por_destino[destino_id] = trecho
+            self._por_produto[produto] = trecho
+        return trecho
+
+    def finalizar_por_destino(self, destino_id: str, fim_mono: float) -> Optional[Tuple[str, dict, float]]:
+        """Chegada ao destino: retorna (trecho, info, duração em s) ou None se não havia transporte."""
+        with self._trava:
+            trecho = self._por_destino.get(destino_id)
+            if trecho is None:
+                return None
+            info = self._remover(trecho)
+            duracao = max(0.0, fim_mono - info["_inicio_mono"])
+            est = self._estatisticas.get(trecho)
+            if est is None:
+                est = self._estatisticas[trecho] = EstatisticaTrecho()
+            est.adicionar(duracao)
+        return trecho, self._publico(info), duracao
+
+    def _remover(self, trecho: str) -> Optional[dict]:
+        # chamar com self._trava
+        info = self._transitos.pop(trecho, None)
+        if info is None:
+            return None
+        if self._por_destino.get(info["destino"]) == trecho:
+            del self._por_destino[info["destino"]]
+        if self._por_produto.get(info["produto"]) == trecho:
+            del self._por_produto[info["produto"]]
+        return info
+
+    @staticmethod
+    def _publico(info: dict) -> dict:
+        return {k: v for k, v in info.items() if not k.startswith("_")}
+
+    def em_transito(self, produto: str) -> Optional[dict]:
+        with self._trava:
+            trecho = self._por_produto.get(produto)
+            return self._publico(self._transitos[trecho]) if trecho is not None else None
+
+    def valores(self) -> List[dict]:
+        with self._trava:
+            return [self._publico(info) for info in self._transitos.values()]
+
+    def estatisticas(self) -> Dict[str, dict]:
+        with self._trava:
+            return {trecho: est.resumo() for trecho, est in self._estatisticas.items()}
+
+    def limpar(self, estatisticas: bool = False) -> None:
+        """Descarta os transportes em andamento (reset da produção); as estatísticas ficam, salvo pedido."""
+        with self._trava:
+            self._transitos.clear()
+            self._por_destino.clear()
+            self._por_produto.clear()
+            if estatisticas:
+                self._estatisticas.clear()
+
+    def __len__(self) -> int:
+        return len(self._transitos)
@@ -0,0 +1,124 @@
+# app/replay.py
+"""
+Replay de um turno gravado (MQTT_GRAVACAO=<arquivo>) em uma linha simulada.
+
+    python -m app.replay turno.mqttrec                 # tempo real (1x)
+    python -m app.replay turno.mqttrec --velocidade 20 # 20x
+    python -m app.replay turno.mqttrec --velocidade 0  # o mais rápido possível
+
+Gravações com LINHAS trazem o id da linha no tópico (L2/rastreio_nfc/...):
+--linha L2 reproduz só essa linha (sem o prefixo). Se a gravação tem uma
+única linha, ela é escolhida sozinha.
+
+Os CSVs/diários vão para uma pasta temporária e, sem --com-banco, nada é
+gravado no Postgres. Ao final imprime eventos/s e a latência por etapa
+(roteamento, fila, fsm, total), para comparar builds com o mesmo turno.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+from app.simulacao import formatar_resumo, montar_linha_simulada
+from auxiliares.relogio import RelogioVirtual
+from auxiliares.mqtt_outbox import outbox_para
+from auxiliares.gravador_mqtt import ler_gravacao
+
+
+# primeiro nível dos tópicos assinados pela linha padrão (sem prefixo de linha)
+RAIZES_TOPICOS = ("rastreio_nfc", "visao")
+
+
+def linhas_na_gravacao(registros) -> list:
+    """Ids de linha presentes na gravação ("" = linha padrão, tópicos sem prefixo)."""
+    ids = set()
+    for _, topico, _ in registros:
+        raiz, _, resto = topico.partition("/")
+        if raiz in RAIZES_TOPICOS:
+            ids.add("")
+        elif resto.split("/", 1)[0] in RAIZES_TOPICOS:
+            ids.add(raiz)
+    return sorted(ids)
+
+
+def selecionar_linha(registros, linha: str | None = None) -> list:
+    """Registros de uma linha, com o tópico sem o prefixo da linha."""
+    ids = linhas_na_gravacao(registros)
+    if linha is None:
+        if len(ids) > 1:
+            raise ValueError(f"Gravação com várias linhas {ids}: escolha uma com --linha.")
+        linha = ids[0] if ids else ""
+    if not linha:
+        return [r for r in registros if r[1].split("/", 1)[0] in RAIZES_TOPICOS]
+    prefixo = f"{linha}/"
+    return [(t, topico[len(prefixo):], payload) for t, topico, payload in registros if topico.startswith(prefixo)]
+
+
+def executar_replay(arquivo: str, velocidade: float = 1.0, n_postos: int | None = None,
+                    pasta: str | None = None, com_banco: bool = False, linha: str | None = None) -> dict:
+    registros = selecionar_linha(list(ler_gravacao(os.path.abspath(arquivo))), linha)
+    if not registros:
+        raise ValueError(f"Gravação vazia: {arquivo}" + (f" (linha {linha})" if linha else ""))
+    if n_postos is None and linha:
+        # postos da linha como declarados em LINHAS (se houver)
+        from app.linhas import ler_configuracao_linhas
+        n_postos = dict(ler_configuracao_linhas()).get(linha)
+
+    # sem espera, o tempo do turno é simulado (debounce da visão, cooldowns e tempos de ciclo)
+    relogio = RelogioVirtual() if velocidade <= 0 else None
+    linha = montar_linha_simulada(n_postos=n_postos, pasta=pasta, com_banco=com_banco, relogio=relogio)
+
+    duracao = linha.reproduzir(registros, velocidade)
+    outbox_para(linha.mqtt).drenar()
+
+    return {
+        "arquivo": arquivo,
+        "velocidade": velocidade,
+        "eventos": len(registros),
+        "duracao_gravada_s": registros[-1][0] - registros[0][0],
+        "duracao_replay_s": duracao,
+        "eventos_por_s": len(registros) / duracao if duracao > 0 else float("inf"),
+        "produtos_concluidos": linha.produtos_concluidos(),
+        "emits_socketio": linha.socketio.total_emitidos,
+        "bytes_socketio": linha.socketio.total_bytes,
+        "latencia": linha.medidor.resumo(),
+        "outbox_mqtt": outbox_para(linha.mqtt).estatisticas(),
+        "pasta": linha.pasta,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay de gravação MQTT em linha simulada.")
+    parser.add_argument("arquivo", help="arquivo gerado com MQTT_GRAVACAO")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="1 = tempo real, N = Nx, 0 = máximo")
+    parser.add_argument("--postos", type=int, default=None, help="último índice de posto (padrão: NUMERO_POSTOS)")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    parser.add_argument("--linha", default=None, help="id da linha em gravações com LINHAS (ex.: L2)")
+    parser.add_argument("--com-banco", action="store_true", help="grava linhas de produção no Postgres do .env")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    r = executar_replay(args.arquivo, args.velocidade, args.postos, args.pasta, args.com_banco, args.linha)
+
+    if args.json:
+        print(json.dumps(r, indent=2, ensure_ascii=False))
+        return 0
+
+    print(f"Arquivo:            {r['arquivo']}")
+    print(f"Eventos:            {r['eventos']}")
+    print(f"Duração gravada:    {r['duracao_gravada_s']:.1f}s")
+    print(f"Duração do replay:  {r['duracao_replay_s']:.2f}s (velocidade {r['velocidade']:g})")
+    print(f"Eventos/s:          {r['eventos_por_s']:.1f}")
+    print(f"Produtos concluídos:{r['produtos_concluidos']:>6}")
+    print(f"Emits Socket.IO:    {r['emits_socketio']} ({r['bytes_socketio'] / 1024:.1f} kB)")
+    o = r["outbox_mqtt"]
+    print(f"Comandos MQTT:      {o['publicados']} publicados de {o['enfileirados']} ({o['coalescidos']} coalescidos)")
+    print()
+    print(formatar_resumo(r["latencia"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
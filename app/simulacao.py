@@ -0,0 +1,394 @@
+# app/simulacao.py
+"""
+Linha simulada em processo: PostoSupervisor, Postos e roteador MQTT reais,
+com Socket.IO e broker MQTT falsos. Base do replay (app.replay) e dos
+benchmarks.
+
+montar_linha_simulada() precisa ser chamada antes de qualquer import de
+`auxiliares.*` no processo: NUMERO_POSTOS e a pasta de trabalho (CSVs e
+diários) são lidos no import dos módulos.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import date
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# Dublês de Socket.IO / MQTT / log de produção
+# -----------------------------------------------------------------------------
+class SocketIOSimulado:
+    """Aceita emits e conta por evento (quantidade e bytes do JSON que iria pelo websocket) e por sala."""
+
+    def __init__(self) -> None:
+        self.emitidos: Dict[str, int] = {}
+        self.bytes_emitidos: Dict[str, int] = {}
+        self.salas: Dict[Optional[str], int] = {}  # sala (None = todos) -> emits
+
+    def emit(self, evento, *args, **kwargs):
+        sala = kwargs.get("room")
+        self.salas[sala] = self.salas.get(sala, 0) + 1
+        self.emitidos[evento] = self.emitidos.get(evento, 0) + 1
+        tamanho = len(json.dumps(args[0], default=str)) if args else 0
+        self.bytes_emitidos[evento] = self.bytes_emitidos.get(evento, 0) + tamanho
+
+    def start_background_task(self, target, *args, **kwargs):
+        t = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        t.start()
+        return t
+
+    def sleep(self, segundos):
+        time.sleep(segundos)
+
+    @property
+    def total_emitidos(self) -> int:
+        return sum(self.emitidos.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.bytes_emitidos.values())
+
+
+def _topico_casa(assinatura: str, topico: str) -> bool:
+    a, t = assinatura.split("/"), topico.split("/")
+    for i, nivel in enumerate(a):
+        if nivel == "#":
+            return True
+        if i >= len(t) or (nivel != "+" and nivel != t[i]):
+            return False
+    return len(a) == len(t)
+
+
+class MqttSimulado:
+    """
+    Substituto do flask_mqtt.Mqtt e do broker: `publish` entrega a mensagem
+    ao handler on_message se o tópico casar com alguma assinatura.
+    """
+
+    def __init__(self) -> None:
+        self._on_connect = None
+        self._on_message = None
+        self._on_publish = None
+        self.assinaturas: List[str] = []
+        self.publicados = 0
+
+    def on_connect(self):
+        def deco(fn):
+            self._on_connect = fn
+            return fn
+        return deco
+
+    def on_message(self):
+        def deco(fn):
+            self._on_message = fn
+            return fn
+        return deco
+
+    def on_publish(self):
+        def deco(fn):
+            self._on_publish = fn
+            return fn
+        return deco
+
+    def subscribe(self, topico, qos=0):
+        if topico not in self.assinaturas:
+            self.assinaturas.append(topico)
+
+    def publish(self, topico, payload=None, qos=0, retain=False):
+        self.publicados += 1
+        mid = self.publicados
+        if any(_topico_casa(a, topico) for a in self.assinaturas):
+            self.entregar(topico, payload)
+        if self._on_publish:
+            self._on_publish(None, None, mid)
+        return 0, mid
+
+    def conectar(self):
+        if self._on_connect:
+            self._on_connect(None, None, None, 0)
+
+    def entregar(self, topico: str, payload) -> None:
+        if self._on_message is None:
+            return
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._on_message(None, None, SimpleNamespace(topic=topico, payload=payload or b""))
+
+
+class LogProducaoSimulado:
+    def criar(self, ordem_id, meta):
+        return None
+
+    def marcar_inicio(self, log_id):
+        pass
+
+    def finalizar(self, log_id, motivo):
+        pass
+
+
+# -----------------------------------------------------------------------------
+# Medição
+# -----------------------------------------------------------------------------
+class MedidorLatencia:
+    """Amostras de latência (segundos) por etapa."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._amostras: Dict[str, List[float]] = {}
+
+    def registrar(self, etapa: str, segundos: float) -> None:
+        with self._lock:
+            self._amostras.setdefault(etapa, []).append(segundos)
+
+    def contagem(self, etapa: str) -> int:
+        return len(self._amostras.get(etapa, ()))
+
+    def resumo(self) -> Dict[str, dict]:
+        with self._lock:
+            amostras = {k: np.asarray(v) for k, v in self._amostras.items()}
+        out = {}
+        for etapa, a in amostras.items():
+            if not len(a):
+                continue
+            out[etapa] = {
+                "n": int(len(a)),
+                "media_ms": float(a.mean() * 1000),
+                "p50_ms": float(np.percentile(a, 50) * 1000),
+                "p99_ms": float(np.percentile(a, 99) * 1000),
+                "max_ms": float(a.max() * 1000),
+            }
+        return out
+
+
+def formatar_resumo(resumo: Dict[str, dict]) -> str:
+    linhas = [f"{'etapa':<12}{'n':>9}{'média':>10}{'p50':>10}{'p99':>10}{'máx':>10}  (ms)"]
+    for etapa, r in resumo.items():
+        linhas.append(
+            f"{etapa:<12}{r['n']:>9}{r['media_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}"
+        )
+    return "\n".join(linhas)
+
+
+# -----------------------------------------------------------------------------
+# Linha simulada
+# -----------------------------------------------------------------------------
+class LinhaSimulada:
+    def __init__(self, supervisor, mqtt, socketio, state, roteador, medidor, pasta, relogio):
+        self.supervisor = supervisor
+        self.relogio = relogio
+        self.mqtt = mqtt
+        self.socketio = socketio
+        self.state = state
+        self.roteador = roteador
+        self.medidor = medidor
+        self.pasta = pasta
+        self._seq_produto = 0
+
+    @property
+    def n_postos(self) -> int:
+        return len(self.supervisor.postos)
+
+    def publicar(self, topico: str, payload: str) -> None:
+        self.mqtt.publish(topico, payload)
+
+    def aguardar(self) -> None:
+        """Espera as filas de eventos dos postos esvaziarem e envia o quadro de emits pendente."""
+        self.supervisor.aguardar_filas_eventos()
+        self.supervisor.emissor.descarregar()
+
+    def reproduzir(self, registros, velocidade: float = 1.0) -> float:
+        """
+        Entrega (t, tópico, payload) em ordem, respeitando os intervalos de `t`
+        divididos por `velocidade` (0 = sem espera). Com RelogioVirtual não há
+        espera: o relógio é levado até `t` antes de cada entrega, depois que os
+        postos processaram o que veio antes (o tempo que os workers leem é o do
+        evento e o replay é determinístico). Retorna a duração (parede) em
+        segundos, até as filas dos postos esvaziarem.
+        """
+        from auxiliares.configuracoes import cartao_palete
+        from auxiliares.relogio import RelogioVirtual
+
+        virtual = isinstance(self.relogio, RelogioVirtual)
+        sem_espera = virtual or velocidade <= 0
+        base_virtual = self.relogio.monotonic() if virtual else 0.0
+
+        inicio = time.perf_counter()
+        t0 = None
+        for t, topico, payload in registros:
+            if t0 is None:
+                t0 = t
+            if virtual:
+                alvo = base_virtual + (t - t0)
+                if alvo > self.relogio.monotonic():
+                    self.supervisor.aguardar_filas_eventos()
+                self.relogio.ajustar(alvo)
+            elif velocidade > 0:
+                espera = inicio + (t - t0) / velocidade - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+
+            partes = topico.split("/")
+            posto_id = partes[2] if len(partes) == 4 and partes[3] == "dispositivo" else None
+
+            if sem_espera:
+                # sem espera não existe o tempo de transporte entre postos: antes de uma
+                # leitura NFC, o posto anterior (e o último, que libera o palete) precisa
+                # ter processado o BD, como aconteceria na linha real
+                if posto_id and payload in cartao_palete:
+                    self._barreira_causal(posto_id)
+                # a visão é tratada na hora, os botões vão para a fila: o estado da
+                # visão só muda depois que o posto processou o que veio antes
+                elif len(partes) == 3 and partes[0] == "visao":
+                    fila = self.supervisor.filas_eventos.get(partes[1])
+                    if fila is not None:
+                        fila.aguardar()
+
+            # o BT1 do posto 0 é publicado pela rota de impressão, logo depois de associar o produto
+            if payload == "BT1" and posto_id == "posto_0":
+                # o operador vê o palete na tela antes de imprimir: a associação (fila do posto 0) já rodou
+                self.supervisor.filas_eventos["posto_0"].aguardar()
+                self.associar_produto_posto_0()
+
+            # roteiro sem prefixo; a linha põe o seu (linha padrão: nenhum)
+            self.mqtt.entregar(self.supervisor.topico(topico), payload)
+
+        self.aguardar()
+        return time.perf_counter() - inicio
+
+    def _barreira_causal(self, posto_id: str) -> None:
+        n = int(posto_id.split("_")[1])
+        anteriores = {f"posto_{n - 1}"} if n > 0 else {f"posto_{self.n_postos - 1}"}
+        for pid in anteriores:
+            fila = self.supervisor.filas_eventos.get(pid)
+            if fila is not None:
+                fila.aguardar()
+
+    def produtos_concluidos(self) -> int:
+        return self.supervisor.postos[f"posto_{self.n_postos - 1}"].contador_produtos
+
+    def associar_produto_posto_0(self) -> Optional[str]:
+        """
+        Faz o papel do botão de impressão do posto 0 (rota /comando imprime_produto):
+        associa um código de produto novo ao palete presente no posto 0.
+        """
+        import auxiliares.classes as classes
+
+        palete = self.supervisor.postos["posto_0"].get_palete_atual()
+        if not palete or classes.associacoes.palete_produto(palete) is not None:
+            return None
+        self._seq_produto = self._seq_produto % 999 + 1
+        dia = date.today().timetuple().tm_yday
+        produto = f"{dia:03d}CP01{self._seq_produto:03d}"
+        classes.associacoes.associa(palete, produto)
+        return produto
+
+
+def montar_linha_simulada(n_postos: Optional[int] = None, pasta: Optional[str] = None, com_banco: bool = False,
+                          relogio=None) -> LinhaSimulada:
+    """
+    n_postos: último índice de posto (mesma semântica de NUMERO_POSTOS).
+    pasta: diretório de trabalho (CSVs/diários); padrão: diretório temporário.
+    com_banco: grava as linhas de produção e o log no Postgres do .env.
+    relogio: ex. RelogioVirtual() para simular o turno sem esperar o tempo real.
+    """
+    from auxiliares.relogio import relogio_atual, usar_relogio
+    if relogio is not None:
+        usar_relogio(relogio)
+
+    if n_postos is not None:
+        os.environ["NUMERO_POSTOS"] = str(int(n_postos))
+    pasta = pasta or tempfile.mkdtemp(prefix="linha_simulada_")
+    os.makedirs(pasta, exist_ok=True)
+    os.chdir(pasta)
+
+    import auxiliares.posto_repo as posto_repo
+    if not com_banco:
+        posto_repo.desativar_gravacao()
+
+    from auxiliares.classes import inicializar_postos
+    from auxiliares.mqtt_handlers import configurar_mqtt_handlers
+    from app.supervisor import PostoSupervisor
+    from state import State
+    from vision_state import VisionStateStore
+
+    n = int(os.getenv("NUMERO_POSTOS", 2))
+    state = State(n)
+    mqtt = MqttSimulado()
+    socketio = SocketIOSimulado()
+    postos = inicializar_postos(mqtt)
+    supervisor = PostoSupervisor(
+        postos, socketio, mqtt,
+        state=state,
+        vision_state=VisionStateStore(),
+        log_repo=None if com_banco else LogProducaoSimulado(),
+    )
+    roteador = configurar_mqtt_handlers(mqtt, socketio, [supervisor])
+    mqtt.conectar()
+
+    medidor = MedidorLatencia()
+    _instrumentar(roteador, supervisor, medidor)
+
+    state.ligar_producao(por="simulacao", motivo="simulacao", ordem_codigo="SIMULACAO")
+    for p in postos.values():
+        p.ordem_producao_atual = "SIMULACAO"
+
+    return LinhaSimulada(supervisor, mqtt, socketio, state, roteador, medidor, pasta, relogio_atual())
+
+
+def _instrumentar(roteador, supervisor, medidor: MedidorLatencia) -> None:
+    """
+    Etapas medidas:
+      roteamento: decodificação + handlers do roteador (inclui visão e enfileiramento)
+      fila:       espera na fila do posto (enfileiramento -> início do processamento)
+      fsm:        gate + FSM do posto
+      total:      enfileiramento -> fim da FSM (fila + fsm)
+
+    Sempre em tempo de parede (perf_counter), mesmo com RelogioVirtual.
+    """
+    despachar = roteador.despachar
+
+    def despachar_medido(message):
+        t0 = time.perf_counter()
+        try:
+            return despachar(message)
+        finally:
+            medidor.registrar("roteamento", time.perf_counter() - t0)
+
+    roteador.despachar = despachar_medido
+
+    for fila in supervisor.filas_eventos.values():
+        _instrumentar_fila(fila, medidor)
+
+
+def _instrumentar_fila(fila, medidor: MedidorLatencia) -> None:
+    # a fila é FIFO: o instante de parede de cada enfileiramento sai na mesma ordem
+    entradas = deque()
+    enfileirar = fila.enfileirar
+    processar = fila._processar
+
+    def enfileirar_medido(payload, recebido_em=None):
+        entradas.append(time.perf_counter())
+        enfileirar(payload, recebido_em)
+
+    def processar_medido(payload, recebido_em):
+        t0 = time.perf_counter()
+        entrada = entradas.popleft() if entradas else t0
+        medidor.registrar("fila", t0 - entrada)
+        try:
+            return processar(payload, recebido_em)
+        finally:
+            fim = time.perf_counter()
+            medidor.registrar("fsm", fim - t0)
+            medidor.registrar("total", fim - entrada)
+
+    fila.enfileirar = enfileirar_medido
+    fila._processar = processar_medido
@@ -2,21 +2,41 @@
 from flask_socketio import join_room
 from flask import request
 
-def register_socketio_handlers(socketio, supervisor):
+def register_socketio_handlers(socketio, linhas):
+    # a tela informa a linha em cada evento ({"linha": "L2", ...}); sem linha = linha padrão
+    def _supervisor(data):
+        return linhas.obter((data or {}).get("linha"))
+
     @socketio.on("join_posto")
     def join_posto(data):
-        pid = data["posto"]                # ex: "posto_0"
-        join_room(f"posto:{pid}")          # cliente entra na sala do posto
+        supervisor = _supervisor(data)
+        if supervisor is None:
+            return
+        pid = data["posto"]                      # ex: "posto_0"
+        join_room(supervisor.sala_posto(pid))    # cliente entra na sala do posto
         snap = supervisor.get_snapshot(pid)
         if snap:
             socketio.emit("posto/state_snapshot", snap, room=request.sid)
 
+    @socketio.on("posto/request_snapshot")
+    def request_snapshot(data):
+        # cliente detectou buraco na sequência de posto/state_patch
+        supervisor = _supervisor(data)
+        snap = supervisor.get_snapshot(data["posto"]) if supervisor else None
+        if snap:
+            socketio.emit("posto/state_snapshot", snap, room=request.sid)
+
     @socketio.on("posto/command")
     def posto_command(data):
-        supervisor.command(data["posto"], data["cmd"], **(data.get("args") or {}))
+        supervisor = _supervisor(data)
+        if supervisor is not None:
+            supervisor.command(data["posto"], data["cmd"], **(data.get("args") or {}))
 
     @socketio.on("global/request_sync")
-    def handle_global_sync():
+    def handle_global_sync(data=None):
+        supervisor = _supervisor(data)
+        if supervisor is None:
+            return
         # Pede ao supervisor o estado atual de tudo
         dados = supervisor.get_global_status()
         # Devolve apenas para quem pediu (request.sid)
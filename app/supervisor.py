@@ -1,14 +1,28 @@
 # app/supervisor.py
+from contextlib import ExitStack, contextmanager
 from dataclasses import asdict
-import time
 import math # Importado para a lógica de projeção
 from typing import Optional
-from auxiliares.utils import posto_anterior, posto_proximo, posto_nome_para_id, salvar_dados_ordem, apagar_arquivos_sistema
+from auxiliares.utils import posto_nome_para_id, salvar_dados_ordem, apagar_arquivos_sistema, topico_da_linha, sala_posto, sala_linha
 from auxiliares.banco_post import consulta_funcionario_posto, Conectar_DB
 from auxiliares.log_producao_repo import LogProducaoRepo
+import json
+import os
 import logging
+import threading
+import uuid
 from auxiliares.db import get_sessionmaker, get_engine
 from auxiliares.models_ordens import OrdemProducao
+from auxiliares.mqtt_roteador import EventoMQTT
+from auxiliares.mqtt_outbox import outbox_para
+import auxiliares.classes as classes
+from auxiliares.posto_repo import drenar_filas
+from app.rastreio_rota import ProgressoRota
+from app.rastreio_transporte import RastreioTransporte
+from app.kpi_linha import KpiLinha
+from app.fila_eventos import FilaEventosPosto
+from app.agendador_emits import AgendadorEmits
+from auxiliares.relogio import relogio_atual
 from datetime import datetime
 
 # -----------------------------------------------------------------------------
@@ -24,13 +38,35 @@ logger = logging.getLogger(__name__)
 db_func = get_engine('funcionarios')  # deve retornar o engine
 SessionLocal = get_sessionmaker('funcionarios')
 
+_AUSENTE = object()
+
+def _mesclar_patch(anterior, novo):
+    """Dois patches do mesmo posto no mesmo quadro: campos mais novos vencem, `de` = primeiro seq."""
+    return {
+        "id": novo["id"],
+        "de": anterior.get("de", anterior["seq"]),
+        "seq": novo["seq"],
+        "campos": {**anterior["campos"], **novo["campos"]},
+    }
+
 class PostoSupervisor:
-    def __init__(self, postos, socketio, mqttc, state, vision_state=None):
+    def __init__(self, postos, socketio, mqttc, state, vision_state=None, log_repo=None, relogio=None, linha=""):
+        self.relogio = relogio or relogio_atual()
+        # linha "" = linha padrão: tópicos e salas sem prefixo, avisos gerais para todos os clientes
+        self.linha = linha
+        self.sala_geral = sala_linha(linha)
         self.postos = postos
         self.socketio = socketio
+        # estado vai por quadros (SOCKETIO_HZ); alertas pela faixa prioritária
+        self.emissor = AgendadorEmits(socketio)
         self.mqttc = mqttc
         self.vision_state = vision_state
         self._snapshots = {}
+        self._snapshot_dicts = {}  # posto_id -> (versao, dict serializado)
+        self._estado_enviado = {}  # posto_id -> (seq, documento enviado à sala do posto)
+        self._trava_estado = threading.Lock()
+        # callback(posto_id, seq, documento) a cada estado publicado; roda sob _trava_estado: não bloquear
+        self.ouvintes_estado = []
         self.operadores_ativos = {}
         self.state = state
         
@@ -43,14 +79,30 @@ class PostoSupervisor:
 
         self.state.notifica_armando_producao = self.notifica_armando_producao
 
+        # documento global versionado (global/request_sync e /api/status_global)
+        self._trava_global = threading.Lock()
+        self._versao_global = 0
+        self._doc_global = None        # dict montado para a versão atual
+        self._json_global = None       # (etag, bytes) da versão atual
+        self._boot_id = uuid.uuid4().hex[:8]  # ETag não colide entre reinícios
+        self.state.observar_producao(lambda status, versao: self._invalidar_global())
+
         self._bt2_reject_cooldown = {}  
 
-        self.log_repo = LogProducaoRepo(db_func)
+        self.log_repo = log_repo if log_repo is not None else LogProducaoRepo(db_func)
 
         self._ultima_producao_projetada = 0
         self.projecao_atual = "--"
-        self.transitos = {}
-
+        self._encerramento_agendado = False
+        # produtos em transporte, indexados por trecho/destino/produto, + estatísticas por trecho
+        self.transitos = RastreioTransporte()
+
+        # produto -> maior posto concluído (contíguo); reconstruído do histórico dos postos
+        self.progresso_rota = ProgressoRota()
+        self.progresso_rota.reconstruir(
+            self.postos[f"posto_{i}"].historico.produtos_completos()
+            for i in range(len(self.postos))
+        )
 
         for p in self.postos.values():
             p.on_change = self._on_change
@@ -58,8 +110,21 @@ class PostoSupervisor:
             p.transporte = self.transporte
             p.movimento_produto = self.movimento_produto
             p.trajetoria_correta = self.trajetoria_correta
+            p.produto_concluido = self.produto_concluido
+            p.tempo_registrado = self.tempo_registrado
             p.popup = self._criar_popup_do_posto(p.id_posto)
 
+        # KPIs incrementais (vazão, takt, gargalo); push para o supervisório a cada KPI_INTERVALO_S se mudou
+        self.kpi = KpiLinha(self.postos.keys(), relogio=self.relogio)
+        self._kpi_intervalo_s = float(os.getenv("KPI_INTERVALO_S", 2))
+        self.socketio.start_background_task(self._loop_kpi)
+
+        # uma fila ordenada + worker por posto (eventos de dispositivo)
+        self.filas_eventos = {
+            pid: FilaEventosPosto(pid, self._criar_processador_fila(pid), relogio=self.relogio)
+            for pid in self.postos
+        }
+
 
     def reset(self):
         logger.info("Resetando estado do Supervisor...")
@@ -73,21 +138,71 @@ class PostoSupervisor:
 
         self._snapshots.clear()
         self._bt2_reject_cooldown.clear()
+        self._ultima_producao_projetada = 0
+        self.projecao_atual = "--"
 
-        self.transitos.clear()
+        self.transitos.limpar()
+        self.progresso_rota.limpar()
+        self.kpi.limpar()
+        self._invalidar_global()
+
+        # eventos ainda na fila pertencem à produção que está sendo resetada
+        for fila in self.filas_eventos.values():
+            fila.descartar()
 
         # reset postos
-        for posto in self.postos.values():
-            posto.reset()
+        with self.travar_postos(), self.lote_notificacoes():
+            # associações palete<->produto são compartilhadas entre as linhas:
+            # solta os paletes dos produtos desta ordem
+            for produto in self.postos["posto_0"].historico.produtos():
+                classes.associacoes.desassocia(produto)
+            for posto in self.postos.values():
+                posto.reset()
      # -------------------------------------------------------------------------
      # ALERTA DIRECIONADO PARA UM POSTO (ROOM)
      # -------------------------------------------------------------------------
 
     def trajetoria_correta(self, produto: str, n_posto: int) -> bool:
-        for i in range(n_posto):
-            if not self.postos[f"posto_{i}"].produto_finalizado_nesse_posto(produto):
-                return False
-        return True
+        return self.progresso_rota.trajetoria_correta(produto, n_posto)
+
+    def produto_concluido(self, n_posto: int, produto: str, ts: Optional[float] = None):
+        # ts: instante de recepção do BD (relógio monotônico); None = agora
+        if not self.progresso_rota.registrar_conclusao(produto, n_posto):
+            logger.warning("Produto %s concluiu o posto_%d fora de ordem.", produto, n_posto)
+        if f"posto_{n_posto}" == self._ultimo_posto_id():
+            self.kpi.registrar_conclusao(ts=ts)
+
+    def tempo_registrado(self, posto_id: str, tipo_tempo: str, valor: float):
+        self.kpi.registrar_tempo(posto_id, tipo_tempo, valor)
+
+    def kpi_atual(self):
+        return self.kpi.resumo(meta=self.meta_producao)
+
+    def _loop_kpi(self):
+        versao_enviada = None
+        while True:
+            self.socketio.sleep(self._kpi_intervalo_s)
+            try:
+                if self.kpi.versao != versao_enviada:
+                    resumo = self.kpi_atual()
+                    versao_enviada = resumo["versao"]
+                    self.emissor.emitir("kpi/update", resumo, room=self.sala_geral)
+            except Exception as e:
+                logger.error("Falha ao enviar KPIs: %s", e)
+
+    def localizar_produto(self, produto: str):
+        """Onde está o produto na linha: posto em que está agora e último posto concluído."""
+        posto_atual = next(
+            (pid for pid, p in self.postos.items() if p.produto_atual == produto),
+            None
+        )
+        ultimo = self.progresso_rota.ultimo_posto_concluido(produto)
+        return {
+            "produto": produto,
+            "posto_atual": posto_atual,
+            "ultimo_posto_concluido": f"posto_{ultimo}" if ultimo is not None else None,
+            "finalizado": ultimo is not None and ultimo == len(self.postos) - 1,
+        }
 
     def _criar_popup_do_posto(self, posto_id: str):
         def popup(mensagem: str, cor: str = "#ff0000", tempo: int = 2500):
@@ -99,59 +214,44 @@ class PostoSupervisor:
             )
         return popup
 
-    def _chave_trecho(self, origem_id: str, destino_id: str) -> str:
-        return f"{origem_id}->{destino_id}"
-
-    def iniciar_transporte(self, origem_id: str, destino_id: str, produto: str):
+    def iniciar_transporte(self, origem_id: str, destino_id: str, produto: str, ts: Optional[float] = None):
         if not origem_id or not destino_id or not produto:
             return
 
-        chave = self._chave_trecho(origem_id, destino_id)
-
-        self.transitos[chave] = {
-            "origem": origem_id,
-            "destino": destino_id,
-            "produto": produto,
-            "inicio_ts": time.time()
-        }
+        inicio_mono = self.relogio.monotonic() if ts is None else ts
+        chave = self.transitos.iniciar(origem_id, destino_id, produto, self.relogio.agora(), inicio_mono)
+        self._invalidar_global()
 
-        self.socketio.emit("transporte/update", {
+        self.emissor.emitir("transporte/update", {
             "trecho": chave,
             "origem": origem_id,
             "destino": destino_id,
             "produto": produto,
             "em_transporte": True
-        })
+        }, room=self.sala_geral, chave=chave)
     
-    def finalizar_transporte_por_destino(self, destino_id: str):
-        chave_encontrada = None
-        dados = None
-
-        for chave, info in self.transitos.items():
-            if info["destino"] == destino_id:
-                chave_encontrada = chave
-                dados = info
-                break
-
-        if not chave_encontrada:
+    def finalizar_transporte_por_destino(self, destino_id: str, ts: Optional[float] = None):
+        fim_mono = self.relogio.monotonic() if ts is None else ts
+        chegada = self.transitos.finalizar_por_destino(destino_id, fim_mono)
+        if chegada is None:
             return
+        chave_encontrada, dados, _ = chegada
+        self._invalidar_global()
 
-        self.transitos.pop(chave_encontrada, None)
-
-        self.socketio.emit("transporte/update", {
+        self.emissor.emitir("transporte/update", {
             "trecho": chave_encontrada,
             "origem": dados["origem"],
             "destino": dados["destino"],
             "produto": dados["produto"],
             "em_transporte": False
-        })
+        }, room=self.sala_geral, chave=chave_encontrada)
 
-    def movimento_produto(self, evento, origem=None, destino=None, produto=None):
+    def movimento_produto(self, evento, origem=None, destino=None, produto=None, ts=None):
         if evento == "saida_para_transporte":
-            self.iniciar_transporte(origem, destino, produto)
+            self.iniciar_transporte(origem, destino, produto, ts)
 
         elif evento == "chegada_do_transporte":
-            self.finalizar_transporte_por_destino(destino)
+            self.finalizar_transporte_por_destino(destino, ts)
         
     def emit_alerta_posto(self, posto_id: str, mensagem: str, cor: str = "#ff0000", tempo: int = 2500):
         """
@@ -159,10 +259,10 @@ class PostoSupervisor:
         Ex: posto_id = 'posto_3'
         """
         try:
-            self.socketio.emit(
+            self.emissor.emitir_imediato(
                 "alerta_posto",
                 {"mensagem": mensagem, "cor": cor, "tempo": tempo},
-                room=f"posto:{posto_id}"
+                room=self.sala_posto(posto_id)
             )
         except Exception:
             pass
@@ -173,7 +273,7 @@ class PostoSupervisor:
             self.emit_alerta_posto(posto_id, mensagem, cor, tempo)
 
     def _alerta_bt2_bloqueado(self, posto_id: str):
-        now = time.time()
+        now = self.relogio.agora()
         last = self._bt2_reject_cooldown.get(posto_id, 0)
 
         # cooldown: 1.0s
@@ -216,18 +316,19 @@ class PostoSupervisor:
 
     def handle_mqtt_message(self, message):
         try:
-            topic = message.topic
-            payload_bytes = message.payload
-            payload = payload_bytes.decode() if isinstance(payload_bytes, (bytes, bytearray)) else str(payload_bytes)
+            evento = EventoMQTT.de_mensagem(message)
         except Exception as e:
             logger.error("Mensagem MQTT inválida: %s", e)
             return
-        
+        self.handle_evento_dispositivo(evento)
+
+    def handle_evento_dispositivo(self, evento: EventoMQTT):
+        """Handler do roteador MQTT para rastreio_nfc/+/+/dispositivo."""
         # Verificação que controla se a mensagem deve ser processada de acordo com o estado da produção
         if not self.state.producao_ligada():
             return
         
-        parts = topic.split("/")
+        parts = evento.partes
         if len(parts) != 4:
             return
 
@@ -245,24 +346,76 @@ class PostoSupervisor:
         
         #posto.controle_mqtt_camera(payload)
 
-        self.processar_evento_dispositivo(posto, payload)
+        # não processa aqui: carimbado na recepção, vai para a fila do posto
+        self.filas_eventos[dispositivo].enfileirar(evento.payload, evento.recebido_em)
 
-    def processar_evento_dispositivo(self, posto, payload: str):
+    def _criar_processador_fila(self, posto_id: str):
+        def processar(payload: str, recebido_em: float):
+            # a produção pode ter sido desligada enquanto o evento esperava na fila
+            if not self.state.producao_ligada():
+                return
+            self.processar_evento_dispositivo(self.postos[posto_id], payload, recebido_em)
+        return processar
+
+    def processar_evento_dispositivo(self, posto, payload: str, ts: Optional[float] = None):
         """
         ÚNICO lugar que entrega eventos do ESP32 para o Posto.
+        ts: instante de recepção (perf_counter); None = agora.
         """
 
-        # 🔒 trava de eventos (gate)
-        if self._evento_bloqueado(posto, payload):
-            return
-
-        # evento válido: entra na FSM normal
-        posto.tratamento_dispositivo(payload)
+        # o evento mexe no próprio posto e, no transporte, no posto anterior
+        envolvidos = [posto]
+        if posto.posto_anterior in self.postos:
+            envolvidos.append(self.postos[posto.posto_anterior])
+
+        with ExitStack() as stack:
+            # trava na ordem n -> n-1 (a mesma de travar_postos) antes de agrupar as notificações
+            for p in envolvidos:
+                stack.enter_context(p.trava)
+            stack.enter_context(self.lote_notificacoes(envolvidos))
+
+            # 🔒 trava de eventos (gate)
+            if self._evento_bloqueado(posto, payload):
+                return
+
+            # evento válido: entra na FSM normal
+            posto.tratamento_dispositivo(payload, ts)
+
+    def aguardar_filas_eventos(self):
+        """Bloqueia até as filas de eventos de todos os postos esvaziarem."""
+        for fila in self.filas_eventos.values():
+            fila.aguardar()
+
+    def profundidade_filas_eventos(self):
+        return {pid: fila.profundidade() for pid, fila in self.filas_eventos.items()}
+
+    @contextmanager
+    def travar_postos(self):
+        """Trava todos os postos (do último para o posto_0, mesma ordem do transporte)."""
+        with ExitStack() as stack:
+            for posto in reversed(list(self.postos.values())):
+                stack.enter_context(posto.trava)
+            yield
+
+    @contextmanager
+    def lote_notificacoes(self, postos=None):
+        """
+        Um evento de dispositivo pode mexer em mais de um posto (ex: BD + transporte).
+        Dentro deste bloco cada posto envia no máximo um snapshot, ao final do evento.
+        """
+        postos = list(self.postos.values()) if postos is None else sorted(postos, key=lambda p: p.n_posto)
+        with ExitStack() as stack:
+            # entra em ordem inversa para que os postos sejam liberados em ordem (posto_0 primeiro)
+            for posto in reversed(postos):
+                stack.enter_context(posto.lote_notificacoes())
+            yield
     
     def _enviar_stop_mqtt_delay(self, delay:int = 2):
-        time.sleep(delay)
+        # agendado na outbox: um Start posterior (nova ordem) substitui o Stop pendente.
+        # Se o processo sair antes (Stop/Restart no painel), _reiniciar e o atexit da
+        # outbox drenam a fila: o Stop é publicado.
         if self.mqttc:
-            self.mqttc.publish("ControleProducao_DD", "Stop")
+            outbox_para(self.mqttc).enviar(self.topico("ControleProducao_DD"), "Stop", atraso=delay, coalescer=True)
 
     def iniciar_producao(self, origem="sistema", ordem_codigo=None, meta_producao=0, modelo=None):
         if self.state.producao_ligada():
@@ -287,12 +440,12 @@ class PostoSupervisor:
 
         #Sinal Esteira Iniciada
         if self.mqttc:
-            self.mqttc.publish("ControleProducao_DD", "Start")
+            outbox_para(self.mqttc).enviar(self.topico("ControleProducao_DD"), "Start", coalescer=True)
 
         for posto in self.postos.values():
             posto.inicia_prod_tempo()
             posto.ordem_producao_atual=ordem_codigo
-            posto._notify()
+            posto._notify(forcar=True)
 
         self.emit_alerta_global("Atenção! Produção Iniciada!", cor="#00b377", tempo=3000)
         self.resetar_timer()
@@ -325,11 +478,13 @@ class PostoSupervisor:
 
         self.emit_alerta_global(mensagem="Produção Finalizada.", cor="#ff0000", tempo=5000)
 
-        salvar_dados_ordem(ordem_codigo)
-        apagar_arquivos_sistema()
+        # últimas linhas do banco (fechar_linha, tempo_ciclo...) antes de fechar a ordem
+        drenar_filas()
+        self.persistir_historicos()
+        salvar_dados_ordem(ordem_codigo, self.linha)
+        apagar_arquivos_sistema(self.linha)
 
-        if self.mqttc:
-            self.socketio.start_background_task(self._enviar_stop_mqtt_delay)
+        self._enviar_stop_mqtt_delay()
         
         self.state.desligar_producao(
             por="sistema",
@@ -338,6 +493,15 @@ class PostoSupervisor:
 
         self.reset()
 
+    def persistir_historicos(self):
+        """
+        Compacta o diário de cada posto no CSV consolidado.
+        Deve ser chamado antes de salvar/zipar os arquivos da ordem.
+        """
+        with self.travar_postos():
+            for posto in self.postos.values():
+                posto.salvarDadosLocais()
+
     # --- MÉTODOS AUXILIARES NOVOS ---
     def atualizar_operador_posto(self, posto_nome, dados_operador):
         """
@@ -345,6 +509,7 @@ class PostoSupervisor:
         Nunca deve quebrar o fluxo de check-in/check-out.
         """
         self.operadores_ativos[posto_nome] = dados_operador
+        self._invalidar_global()
         
         # ⭐ SINCRONIZA COM O POSTO
         if posto_nome in self.postos:
@@ -356,7 +521,7 @@ class PostoSupervisor:
                     dados_operador.get("foto")
                 )
 
-            self.postos[posto_nome]._notify()
+            self.postos[posto_nome]._notify(forcar=True)
 
         # 1) Atualiza prontidão no state (pode falhar por id fora do range, etc)
         try:
@@ -373,8 +538,8 @@ class PostoSupervisor:
 
         # 2) Emissões socket não podem derrubar
         try:
-            self.socketio.emit("posto/operador_changed", payload, room=f"posto:{posto_nome}")
-            self.socketio.emit("global/operador_update", payload)
+            self.emissor.emitir_imediato("posto/operador_changed", payload, room=self.sala_posto(posto_nome))
+            self.emissor.emitir_imediato("global/operador_update", payload, room=self.sala_geral)
         except Exception as e:
             logger.error("Falha ao emitir socket (%s): %r", posto_nome, e, exc_info=True)
 
@@ -388,7 +553,7 @@ class PostoSupervisor:
     def _get_current_time_ms(self):
         tempo_ms = self.timer_accumulated * 1000
         if self.timer_running and self.timer_start_ts:
-            delta = time.time() - self.timer_start_ts
+            delta = self.relogio.agora() - self.timer_start_ts
             tempo_ms += (delta * 1000)
         return tempo_ms
 
@@ -413,22 +578,25 @@ class PostoSupervisor:
         return texto
     
     def mudanca_estado(self, posto_id, novo_estado):
+        # vizinhos do próprio posto (cada linha tem sua quantidade de postos)
+        anterior = self.postos[posto_id].posto_anterior
+        proximo = self.postos[posto_id].posto_posterior
         # LÓGICA DE ATIVAÇÃO DE BATEDOR
         if posto_id == 'posto_0':
             if novo_estado == 0: # Entrou em Idle
                 try:
-                    self.socketio.emit(
+                    self.emissor.emitir_imediato(
                         "reset_campos_posto",
-                        room=f"posto:posto_0"
+                        room=self.sala_posto("posto_0")
                     )
                 except Exception:
                     print("[ERRO] - Falha ao emitir reset_campos_posto para o frontend.")
                     pass
             if novo_estado == 3: # Entrou em Espera
-                if self.postos[posto_proximo(posto_id)].get_estado() == 0: # Idle
+                if self.postos[proximo].get_estado() == 0: # Idle
                     self.command(posto_id, "ativa_batedor")
                     self.emit_alerta_posto(posto_id, f"Batedor do {self.postos[posto_id].nome_formatado} ativado", "#2563EB", 2500)
-                    self.socketio.emit("limpar_associacao", room=f"posto:posto_0")
+                    self.emissor.emitir_imediato("limpar_associacao", room=self.sala_posto("posto_0"))
                 else:
                     self.emit_alerta_posto(posto_id, f"Não foi possível ativar o batedor do {self.postos[posto_id].nome_formatado} porque o próximo posto não está em Idle.", "#ff0000", 2500)
         elif posto_id == self._ultimo_posto_id():
@@ -436,34 +604,48 @@ class PostoSupervisor:
                 self.command(posto_id, "ativa_batedor")
                 self.emit_alerta_posto(posto_id, f"Batedor do {self.postos[posto_id].nome_formatado} ativado", "#2563EB", 2500)
             elif novo_estado == 0: # Entrou em Idle
-                if self.postos[posto_anterior(posto_id)].get_estado() == 3: # Espera
-                    self.command(posto_anterior(posto_id), "ativa_batedor")
-                    self.emit_alerta_posto(posto_anterior(posto_id), f"Batedor do {self.postos[posto_anterior(posto_id)].nome_formatado} ativado pelo {self.postos[posto_id].nome_formatado}", "#2563EB", 2500)
+                if self.postos[anterior].get_estado() == 3: # Espera
+                    self.command(anterior, "ativa_batedor")
+                    self.emit_alerta_posto(anterior, f"Batedor do {self.postos[anterior].nome_formatado} ativado pelo {self.postos[posto_id].nome_formatado}", "#2563EB", 2500)
         else:
             if novo_estado == 3: # Entrou em Espera
-                if self.postos[posto_proximo(posto_id)].get_estado() == 0: # Idle
+                if self.postos[proximo].get_estado() == 0: # Idle
                     self.command(posto_id, "ativa_batedor")
                     self.emit_alerta_posto(posto_id, f"Batedor do {self.postos[posto_id].nome_formatado} ativado", "#2563EB", 2500)
                 else:
                     self.emit_alerta_posto(posto_id, f"Não foi possível ativar o batedor do {self.postos[posto_id].nome_formatado} porque o próximo posto não está em Idle.", "#ff0000", 2500)
             elif novo_estado == 0: # Entrou em Idle 
-                if self.postos[posto_anterior(posto_id)].get_estado() == 3: # Espera
-                    self.command(posto_anterior(posto_id), "ativa_batedor")
-                    self.emit_alerta_posto(posto_anterior(posto_id), f"Batedor do {self.postos[posto_anterior(posto_id)].nome_formatado} ativado pelo {self.postos[posto_id].nome_formatado}", "#2563EB", 2500)
+                if self.postos[anterior].get_estado() == 3: # Espera
+                    self.command(anterior, "ativa_batedor")
+                    self.emit_alerta_posto(anterior, f"Batedor do {self.postos[anterior].nome_formatado} ativado pelo {self.postos[posto_id].nome_formatado}", "#2563EB", 2500)
 
 
-    def transporte(self, posto_id):
-        logger.debug("Chamando transporte do %s → %s", posto_anterior(posto_id), posto_id)
-        self.postos[posto_id].calcula_transporte()
+    def transporte(self, posto_id, ts: Optional[float] = None):
+        logger.debug("Chamando transporte do %s → %s", self.postos[posto_id].posto_anterior, posto_id)
+        # chamado pelo worker do posto seguinte: trava também o posto de origem
+        with self.postos[posto_id].trava:
+            self.postos[posto_id].calcula_transporte(ts)
 
-    def _on_change(self, snap):
-        d = asdict(snap) 
-        
-        # --- CORREÇÃO DO ENUM (mantido) ---
-        if hasattr(snap.state, 'value'):
-            d["state"] = snap.state.value
-        else:
-            d["state"] = snap.state
+    def _snapshot_dict(self, snap):
+        """
+        asdict(snap) com o enum convertido, serializado uma única vez por versão
+        do snapshot. Retorna uma cópia rasa (quem chama acrescenta campos).
+        """
+        cache = self._snapshot_dicts.get(snap.id)
+        if cache is None or cache[0] != snap.versao:
+            d = asdict(snap)
+            # --- CORREÇÃO DO ENUM (mantido) ---
+            if hasattr(snap.state, 'value'):
+                d["state"] = snap.state.value
+            else:
+                d["state"] = snap.state
+            cache = (snap.versao, d)
+            self._snapshot_dicts[snap.id] = cache
+        return dict(cache[1])
+
+    def _documento_posto(self, snap):
+        """Documento completo que a tela do posto recebe (snapshot + operador + progresso)."""
+        d = self._snapshot_dict(snap)
 
         # ---------------------
         # ✅ INCLUI OPERADOR (pra não sumir no front)
@@ -486,9 +668,39 @@ class PostoSupervisor:
         d["producao_atual"] = snap.n_produtos
         d["meta_producao"] = self.meta_producao
         d["modelo"] = self.modelo_atual
+        return d
 
+    def _publicar_estado(self, posto_id, doc):
+        """
+        Protocolo versionado da sala do posto: o cliente recebe o documento
+        completo no join (posto/state_snapshot, com `seq`) e depois só os campos
+        alterados em posto/state_patch {id, seq, campos}. Patches mesclados no
+        mesmo quadro do agendador trazem também `de` (primeiro seq coberto).
+        Um buraco na sequência faz o cliente pedir posto/request_snapshot.
+        Retorna (seq, documento) do último estado enviado.
+        """
+        with self._trava_estado:
+            seq, anterior = self._estado_enviado.get(posto_id, (0, None))
+            if anterior is None:
+                campos = doc
+            else:
+                campos = {k: v for k, v in doc.items() if anterior.get(k, _AUSENTE) != v}
+                campos.update({k: None for k in anterior if k not in doc})
+            if not campos:
+                return seq, anterior
+            seq += 1
+            self._estado_enviado[posto_id] = (seq, doc)
+            for ouvinte in self.ouvintes_estado:
+                ouvinte(posto_id, seq, doc)
+            self.emissor.emitir(
+                "posto/state_patch", {"id": posto_id, "seq": seq, "campos": campos},
+                room=self.sala_posto(posto_id), mesclar=_mesclar_patch,
+            )
+            return seq, doc
+
+    def _on_change(self, snap):
         self._snapshots[snap.id] = snap  
-        self.socketio.emit("posto/state_changed", d, room=f"posto:{snap.id}") 
+        self._publicar_estado(snap.id, self._documento_posto(snap))
         
         # LÓGICA DE ATUALIZAÇÃO GLOBAL E FIM DE PRODUÇÃO
         if snap.id == self._ultimo_posto_id():
@@ -500,95 +712,136 @@ class PostoSupervisor:
                 projecao_str = self._calcular_projecao_str(tempo_atual, snap.n_produtos)
                 
                 self.projecao_atual = projecao_str
+                self._invalidar_global()
 
                 # Emite o evento de produção com a projeção calculada
-                self.socketio.emit("producao/update", {
+                self.emissor.emitir("producao/update", {
                     "atual": snap.n_produtos,
                     "meta": self.meta_producao,
                     "projecao": projecao_str
-                })
+                }, room=self.sala_geral)
 
 
-            if self.meta_producao > 0 and snap.n_produtos >= self.meta_producao: 
+            if self.meta_producao > 0 and snap.n_produtos >= self.meta_producao and not self._encerramento_agendado:
+                # _on_change roda no worker do posto com a trava dele: encerrar_producao
+                # trava todos os postos e drena as filas, então vai para outra tarefa
+                self._encerramento_agendado = True
+                self.socketio.start_background_task(self._encerrar_por_meta)
+
+    def _encerrar_por_meta(self):
+        try:
+            if self.state.producao_ligada():
                 self.encerrar_producao(motivo_encerra="meta atingida")
+        finally:
+            self._encerramento_agendado = False
       
 
     def iniciar_timer(self, meta):
         self.meta_producao = meta
+        self._invalidar_global()
         if not self.timer_running:
             self.timer_running = True
-            self.socketio.emit("producao/control", {"meta_producao": meta})
-            self.socketio.emit("timer/control", {"action": "start"})
-            self.timer_start_ts = time.time()
+            self.emissor.emitir_imediato("producao/control", {"meta_producao": meta}, room=self.sala_geral)
+            self.emissor.emitir_imediato("timer/control", {"action": "start"}, room=self.sala_geral)
+            self.timer_start_ts = self.relogio.agora()
+            self._invalidar_global()
 
     def parar_timer(self):
         if self.timer_running:
             self.timer_running = False
-            self.socketio.emit("timer/control", {"action": "stop"})
+            self.emissor.emitir_imediato("timer/control", {"action": "stop"}, room=self.sala_geral)
             if self.timer_start_ts:
-                delta = time.time() - self.timer_start_ts
+                delta = self.relogio.agora() - self.timer_start_ts
                 self.timer_accumulated += delta
             self.timer_start_ts = None
+            self._invalidar_global()
             
     def resetar_timer(self):
-        self.socketio.emit("timer/control", {"action": "restart"})
+        self.emissor.emitir_imediato("timer/control", {"action": "restart"}, room=self.sala_geral)
         self.timer_running = False
         self.timer_start_ts = None
         self.timer_accumulated = 0
+        self._invalidar_global()
 
     def get_global_status(self):
         """ Retorna um dicionário com TUDO que o front precisa ao dar F5 """
-        
-        # 1. Calcular tempo decorrido atual
-        tempo_ms = self._get_current_time_ms()
+        # documento em cache; só o cronômetro é calculado na hora
+        return {**self.documento_global(), "timer_ms": self._get_current_time_ms()}
 
-        # 2. Pegar produção do último posto
+    def _invalidar_global(self):
+        with self._trava_global:
+            self._versao_global += 1
+            self._doc_global = None
+            self._json_global = None
+
+    def documento_global(self):
+        """
+        Estado global versionado, montado uma vez por versão. Não traz timer_ms
+        (muda a cada instante): o cronômetro vai como base + início, e
+        timer_ms = timer_base_ms + (agora - timer_inicio_ms) enquanto timer_running.
+        """
+        with self._trava_global:
+            if self._doc_global is None:
+                self._doc_global = self._montar_documento_global()
+            return self._doc_global
+
+    def documento_global_json(self):
+        """(etag, bytes JSON) do documento global, serializado uma vez por versão."""
+        with self._trava_global:
+            if self._json_global is None:
+                if self._doc_global is None:
+                    self._doc_global = self._montar_documento_global()
+                corpo = json.dumps(self._doc_global, default=str, ensure_ascii=False).encode("utf-8")
+                self._json_global = (f"{self._boot_id}-{self._versao_global}", corpo)
+            return self._json_global
+
+    def _montar_documento_global(self):
+        # chamar com self._trava_global
+        # Pegar produção do último posto
         ultimo_id = self._ultimo_posto_id()
         prod_atual = 0
         if ultimo_id in self._snapshots:
             prod_atual = self._snapshots[ultimo_id].n_produtos
         elif ultimo_id in self.postos:
             prod_atual = self.postos[ultimo_id].contador_produtos
-            
-        # 3. NOVO: Calcular projeção aqui para enviar no sync inicial
-        projecao_str = self.projecao_atual
 
         return {
+            "versao": self._versao_global,
             "meta": self.meta_producao,
             "producao_atual": prod_atual,
-            "projecao": projecao_str, # <--- Enviando a projeção pronta
-            "timer_ms": tempo_ms,
+            "projecao": self.projecao_atual, # <--- Enviando a projeção pronta
             "timer_running": self.timer_running,
-            "operadores": self.operadores_ativos,
+            "timer_base_ms": self.timer_accumulated * 1000,
+            "timer_inicio_ms": self.timer_start_ts * 1000 if self.timer_running and self.timer_start_ts else None,
+            "operadores": dict(self.operadores_ativos),
             "order_id": self.state.get_ordem_atual(),
-            "transportes": list(self.transitos.values())
+            "transportes": self.transitos.valores()
         }
 
+    def sala_posto(self, posto_id):
+        return sala_posto(self.linha, posto_id)
+
+    def topico(self, topico):
+        return topico_da_linha(self.linha, topico)
+
     def _ultimo_posto_id(self):
         idx = len(self.postos) - 1
         return f"posto_{idx}"
     
     def get_snapshot(self, posto_id): 
-        snap = self._snapshots.get(posto_id) 
-        
-        if not snap and posto_id in self.postos:
+        if posto_id in self.postos:
+            # snapshot em cache no posto (reconstruído só quando algo muda)
             snap = self.postos[posto_id].snapshot()
+        else:
+            snap = self._snapshots.get(posto_id)
 
         if not snap: 
             return None 
         
-        d = asdict(snap) 
-        
-        if hasattr(snap.state, 'value'):
-            d["state"] = snap.state.value
-        else:
-            d["state"] = snap.state
-        
-        # ✅ INCLUI OPERADOR NO SNAPSHOT (F5 / join)
-        d["operador"] = self.operadores_ativos.get(posto_id)
-        d["operador_online"] = (d["operador"] is not None)
-
-        return d
+        # ✅ documento completo com operador e progresso (F5 / join)
+        # se algo mudou desde o último patch, a sala recebe o patch antes deste snapshot
+        seq, d = self._publicar_estado(posto_id, self._documento_posto(snap))
+        return {**d, "seq": seq}
 
     def command(self, posto_id, cmd, **kwargs): 
         if posto_id in self.postos:
@@ -1,8 +1,9 @@
+from typing import Optional
+
 from sqlalchemy import Column, String, Integer, DateTime, Date, Numeric, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from auxiliares.banco_post import Conectar_DB
-from auxiliares.configuracoes import ultimo_posto_bios
 from auxiliares.utils import agora_sp
 
 
@@ -27,7 +28,8 @@ def inicializa_Base_assoc():
     # Fim da sintaxe para a criação da tabela caso não existam.
     Base.metadata.create_all(bind=db)
 
-def inicializa_funcionario():
+def inicializa_funcionario(ultimo_posto: Optional[int] = None):
+    """Modelos de funcionários; com `ultimo_posto`, cadastra posto_0 .. posto_<ultimo_posto>."""
     engine = Conectar_DB('funcionarios')
     Base = declarative_base()
 
@@ -62,13 +64,14 @@ def inicializa_funcionario():
 
     # cria a tabela se não existir (não apaga dados existentes)
     Base.metadata.create_all(bind=engine)
+    if ultimo_posto is None:
+        return Funcionario, Posto, SessaoTrabalho
+
     SessionLocal = sessionmaker(bind=engine)
     session = SessionLocal()
 
-    qtd_postos = ultimo_posto_bios
-
     try:
-        for i in range(0, qtd_postos + 1):
+        for i in range(0, ultimo_posto + 1):
             nome = f"posto_{i}"
             existente = session.query(Posto).filter_by(nome=nome).first()
             if not existente:
@@ -3,6 +3,7 @@ from flask import current_app, render_template, request, jsonify, url_for, flash
 from sqlalchemy import delete
 from auxiliares.banco_post import Conectar_DB
 from auxiliares.associacao import inicializa_funcionario
+from app.linhas import supervisor_da_requisicao
 from sqlalchemy.orm import sessionmaker
 from threading import Event
 import logging
@@ -17,7 +18,11 @@ Funcionario, Posto, SessaoTrabalho = inicializa_funcionario()
 db = Conectar_DB('funcionarios')  # deve retornar o engine
 SessionLocal = sessionmaker(bind=db)
 
-def rehidratar_operadores(supervisor):
+def _linhas_com_posto(linhas, posto_nome):
+    """As tabelas de funcionários são indexadas só pelo nome do posto: vale para toda linha que o tem."""
+    return [supervisor for supervisor in linhas if posto_nome in supervisor.postos]
+
+def rehidratar_operadores(linhas):
     session = SessionLocal()
     try:
         # todas as sessões ativas (um por posto, idealmente)
@@ -35,11 +40,12 @@ def rehidratar_operadores(supervisor):
             if not func:
                 continue
 
-            supervisor.atualizar_operador_posto(s.posto_nome, {
-                "id": func.id,
-                "nome": func.nome,
-                "foto": func.imagem_path
-            })
+            for supervisor in _linhas_com_posto(linhas, s.posto_nome):
+                supervisor.atualizar_operador_posto(s.posto_nome, {
+                    "id": func.id,
+                    "nome": func.nome,
+                    "foto": func.imagem_path
+                })
 
         print(f"✅ Rehidratação concluída: {len(sessoes_ativas)} sessões ativas.")
     except Exception as e:
@@ -50,7 +56,7 @@ def rehidratar_operadores(supervisor):
 SESSION_TIMEOUT_SECONDS = 60
 SESSION_CHECK_INTERVAL_SECONDS = 6
 
-def expirar_sessoes_loop(supervisor):
+def expirar_sessoes_loop(linhas):
     while True:
         session = SessionLocal()
 
@@ -78,10 +84,11 @@ def expirar_sessoes_loop(supervisor):
                 except Exception as e:
                     print("Falha ao calcular duração da sessão expirada:", e)
 
-                try:
-                    supervisor.atualizar_operador_posto(s.posto_nome, None)
-                except Exception as e:
-                    print("Falha atualizar supervisor:", e)
+                for supervisor in _linhas_com_posto(linhas, s.posto_nome):
+                    try:
+                        supervisor.atualizar_operador_posto(s.posto_nome, None)
+                    except Exception as e:
+                        print("Falha atualizar supervisor:", e)
 
             session.commit()
 
@@ -94,12 +101,15 @@ def expirar_sessoes_loop(supervisor):
 
         time.sleep(SESSION_CHECK_INTERVAL_SECONDS)
 
-def rotas_funcionarios(app, mqttc, socketio, supervisor):
-    
-    rehidratar_operadores(supervisor)
+def rotas_funcionarios(app, mqttc, socketio, linhas):
+
+    def _linha():
+        return supervisor_da_requisicao(linhas)
+
+    rehidratar_operadores(linhas)
     threading.Thread(
         target=expirar_sessoes_loop,
-        args=(supervisor,),
+        args=(linhas,),
         daemon=True
     ).start()
 
@@ -216,6 +226,7 @@ def rotas_funcionarios(app, mqttc, socketio, supervisor):
         tag = data.get('tag')
         posto_nome = data.get('posto')
         acao = data.get('acao') # "entrada" ou "saida"
+        supervisor = _linha()
 
         session = SessionLocal()
         agora = datetime.now()
@@ -357,6 +368,7 @@ def rotas_funcionarios(app, mqttc, socketio, supervisor):
         data = request.get_json(silent=True) or {}
         posto_nome = data.get("posto")
         tag = data.get("tag")
+        supervisor = _linha()
 
         session = SessionLocal()
         agora = datetime.now()
@@ -15,9 +15,13 @@ from sqlalchemy.orm import sessionmaker
 
 from auxiliares.banco_post import Conectar_DB
 from auxiliares.models_ordens import OrdemProducao, inicializa_ordens
+from app.linhas import supervisor_da_requisicao
 
 
-def rotas_ordens(app, mqttc, socketio, supervisor):
+def rotas_ordens(app, mqttc, socketio, linhas):
+    def _linha():
+        return supervisor_da_requisicao(linhas)
+
     # ✅ Por enquanto: usa o MESMO Postgres do sistema (mock)
     # (mais tarde você pode trocar para outro banco/schema sem mudar o front)
     engine = Conectar_DB("funcionarios")
@@ -26,6 +30,9 @@ def rotas_ordens(app, mqttc, socketio, supervisor):
 
     @app.route("/ordens", methods=["GET", "POST"])
     def ordens():
+        # as OPs são da planta; a linha só é mantida na navegação
+        supervisor = _linha()
+        voltar = url_for("ordens", linha=supervisor.linha or None)
         if request.method == "POST":
             codigo_op = (request.form.get("codigo_op") or "").strip()
             produto = (request.form.get("produto") or "").strip()
@@ -41,23 +48,23 @@ def rotas_ordens(app, mqttc, socketio, supervisor):
             # validações simples
             if not codigo_op:
                 flash("Código da OP é obrigatório.", "error")
-                return redirect(url_for("ordens"))
+                return redirect(voltar)
             if not produto:
                 flash("Produto é obrigatório.", "error")
-                return redirect(url_for("ordens"))
+                return redirect(voltar)
             if meta < 0:
                 flash("Meta inválida (use um número inteiro >= 0).", "error")
-                return redirect(url_for("ordens"))
+                return redirect(voltar)
             if status not in {"ABERTA", "EM_EXECUCAO", "FINALIZADA"}:
                 flash("Status inválido.", "error")
-                return redirect(url_for("ordens"))
+                return redirect(voltar)
 
             session = SessionLocal()
             try:
                 existe = session.query(OrdemProducao).filter_by(codigo_op=codigo_op).first()
                 if existe:
                     flash(f"A OP {codigo_op} já existe.", "error")
-                    return redirect(url_for("ordens"))
+                    return redirect(voltar)
 
                 now = datetime.now()
                 op = OrdemProducao(
@@ -78,7 +85,7 @@ def rotas_ordens(app, mqttc, socketio, supervisor):
             finally:
                 session.close()
 
-            return redirect(url_for("ordens"))
+            return redirect(voltar)
 
         # GET -> listar
         session = SessionLocal()
@@ -91,22 +98,23 @@ def rotas_ordens(app, mqttc, socketio, supervisor):
         finally:
             session.close()
 
-        return render_template("ordens.html", ops=ops)
+        return render_template("ordens.html", ops=ops, linha_id=supervisor.linha)
 
     @app.route("/ordens/deletar/<int:op_id>", methods=["POST"])
     def deletar_op(op_id: int):
+        voltar = url_for("ordens", linha=_linha().linha or None)
         # Mesma lógica do cadastro de funcionários: senha admin opcional
         senha = (request.form.get("senha_confirmacao") or "").strip()
         if senha and senha != current_app.config.get("ADMIN_DELETE_PASSWORD", "1234"):
             flash("Senha de exclusão inválida.", "error")
-            return redirect(url_for("ordens"))
+            return redirect(voltar)
 
         session = SessionLocal()
         try:
             op = session.query(OrdemProducao).get(op_id)
             if not op:
                 flash("OP não encontrada.", "error")
-                return redirect(url_for("ordens"))
+                return redirect(voltar)
 
             session.delete(op)
             session.commit()
@@ -117,4 +125,4 @@ def rotas_ordens(app, mqttc, socketio, supervisor):
         finally:
             session.close()
 
-        return redirect(url_for("ordens"))
+        return redirect(voltar)
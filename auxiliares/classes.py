@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import csv
 import os
 import logging
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
@@ -10,13 +12,18 @@ from typing import Dict, Optional, List
 import pandas as pd
 
 from auxiliares.configuracoes import ultimo_posto_bios, cartao_palete
-from auxiliares.utils import verifica_palete_nfc, verifica_cod_produto
+from auxiliares.utils import verifica_palete_nfc, verifica_cod_produto, topico_da_linha, prefixo_arquivos_linha
 from auxiliares.banco_post import inserir_dados, consulta_funcionario_posto  # noqa: F401  # mantido para uso futuroF
 from auxiliares.utils import imprime_qrcode, gera_codigo_produto
 from auxiliares.posto_repo import criar_linha_aberta, atualizar_tempo_db, atualizar_produto_db, fechar_linha
+from auxiliares.diario import DiarioAppend, valor_ou_none
+from auxiliares.historico_ciclos import HistoricoCiclos, COLS_POSTO
+from auxiliares.relogio import relogio_atual
+from auxiliares.mqtt_outbox import outbox_para
 
+from contextlib import contextmanager
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Optional
 from flask import current_app
 
@@ -30,7 +37,7 @@ class PostoState(Enum):
     BD = 4
 
 
-@dataclass
+@dataclass(frozen=True)
 class PostoSnapshot:
     id: str
     state: PostoState
@@ -47,6 +54,7 @@ class PostoSnapshot:
     last_update_ts: float
     funcionario_nome: Optional[str]
     funcionario_imagem: Optional[str]
+    versao: int = 0
 
 # -----------------------------------------------------------------------------
 # LOGGING
@@ -69,19 +77,14 @@ logger = logging.getLogger(__name__)
 DATA_DIR = Path(".")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# Colunas padrão dos DataFrames
+# Colunas padrão dos DataFrames (COLS_POSTO vem de historico_ciclos)
 COLS_ASSOC = ["produto", "palete", "horario"]
-COLS_POSTO = [
-    "produto",
-    "arrival_time",
-    "tempo_preparo",
-    "tempo_montagem",
-    "tempo_espera",
-    "tempo_transferencia",
-    "tempo_ciclo",
-    "ordem_producao",
-    "hora",
-]
+
+# Registros do diário do posto:
+#   N,<linha>              -> nova linha de histórico
+#   S,<linha>,<campo>,<v>  -> campo alterado
+DIARIO_NOVA_LINHA = "N"
+DIARIO_SET = "S"
 
 # -----------------------------------------------------------------------------
 # FUNÇÕES DE CONTROLE DE PRODUÇÃO
@@ -94,88 +97,157 @@ def verifica_estado_producao() -> bool:
 # INICIALIZAÇÃO DOS POSTOS
 # -----------------------------------------------------------------------------
 
-def inicializar_postos(mqttc) -> None:
+def inicializar_postos(mqttc, linha: str = "", ultimo_posto: Optional[int] = None) -> Dict[str, "Posto"]:
+    """Postos posto_0..posto_<ultimo_posto> da linha (padrão: NUMERO_POSTOS, linha sem prefixo)."""
+    if ultimo_posto is None:
+        ultimo_posto = int(os.getenv('NUMERO_POSTOS', 2))
     postos: Dict[str, "Posto"] = {}
-    for i in range(int(os.getenv('NUMERO_POSTOS', 2)) + 1):
+    for i in range(ultimo_posto + 1):
         nome = f"posto_{i}"
-        postos[nome] = Posto(nome, mqttc)
-    logger.info("Postos inicializados: %s", ", ".join(postos.keys()))
+        postos[nome] = Posto(nome, mqttc, linha=linha, ultimo_posto=ultimo_posto)
+    logger.info("Postos inicializados%s: %s", f" ({linha})" if linha else "", ", ".join(postos.keys()))
     return postos
 # -----------------------------------------------------------------------------
 # TABELA DE ASSOCIAÇÃO PRODUTO↔PALETE
 # -----------------------------------------------------------------------------
 class Tabela_Assoc:
+    """
+    Associações palete <-> produto em memória (dicionários nos dois sentidos).
+
+    Persistência:
+    - `<nome>.journal.csv`: diário append-only (A = associa, D = desassocia);
+    - `<nome>.csv`: snapshot das associações vigentes, reescrito a cada
+      `limite_compactacao` registros do diário (o diário é então truncado);
+    - `historico_<nome>.csv`: histórico completo de associações (somente apêndice).
+    """
+
     def __init__(self, entrada: str):
         self.nome = entrada.lower()
         self.csvPath = DATA_DIR / f"{self.nome}.csv"
         self.histPath = DATA_DIR / f"historico_{self.nome}.csv"
-        self.df_assoc = self.carregarDados()
+        self.diario = DiarioAppend(DATA_DIR / f"{self.nome}.journal.csv", limite_compactacao=200)
 
-    def carregarDados(self) -> pd.DataFrame:
+        # palete -> [(produto, horario, seq), ...] na ordem de associação (o último vale)
+        self._por_palete: Dict[str, List[tuple]] = {}
+        # produto -> [palete, ...]
+        self._por_produto: Dict[str, List[str]] = {}
+        # seq -> (palete, produto, horario): ordem de inserção, usada no snapshot
+        self._ordem: Dict[int, tuple] = {}
+        self._seq = 0
+        self.carregarDados()
+
+    # ------------------------------------------------------------------
+    # Índices em memória
+    # ------------------------------------------------------------------
+    def _indexar(self, palete: str, produto: str, horario: Optional[str]) -> None:
+        self._seq += 1
+        self._por_palete.setdefault(palete, []).append((produto, horario, self._seq))
+        self._por_produto.setdefault(produto, []).append(palete)
+        self._ordem[self._seq] = (palete, produto, horario)
+
+    def _desindexar(self, produto: str) -> bool:
+        paletes = self._por_produto.pop(produto, None)
+        if not paletes:
+            return False
+        for palete in set(paletes):
+            restantes = []
+            for assoc in self._por_palete.get(palete, []):
+                if assoc[0] == produto:
+                    self._ordem.pop(assoc[2], None)
+                else:
+                    restantes.append(assoc)
+            if restantes:
+                self._por_palete[palete] = restantes
+            else:
+                self._por_palete.pop(palete, None)
+        return True
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+    def carregarDados(self) -> None:
         if self.csvPath.exists():
             logger.info("[%s] Carregando dados locais de associações.", self.nome)
             try:
-                df = pd.read_csv(self.csvPath)
+                with open(self.csvPath, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        palete, produto = row.get("palete"), row.get("produto")
+                        if palete and produto:
+                            self._indexar(palete, produto, row.get("horario") or None)
             except Exception as e:
                 logger.error("[%s] Erro ao ler %s: %s", self.nome, self.csvPath, e)
-                df = pd.DataFrame(columns=COLS_ASSOC)
         else:
             logger.warning("[%s] Dados locais não encontrados (iniciando vazio).", self.nome)
-            df = pd.DataFrame(columns=COLS_ASSOC)
-        # garante colunas e tipos básicos
-        for col in COLS_ASSOC:
-            if col not in df.columns:
-                df[col] = pd.Series(dtype="object")
-        return df
+
+        n_registros = 0
+        for reg in self.diario.registros():
+            n_registros += 1
+            try:
+                if reg[0] == "A":
+                    self._indexar(reg[1], reg[2], valor_ou_none(reg[3]))
+                elif reg[0] == "D":
+                    self._desindexar(reg[1])
+            except IndexError:
+                logger.error("[%s] Registro inválido no diário %r", self.nome, reg)
+        self.diario.registros_pendentes = n_registros
 
     def salvarDadosLocais(self) -> None:
+        """Snapshot das associações vigentes; descarta o diário."""
+        tmp = self.csvPath.with_suffix(".csv.tmp")
         try:
-            self.df_assoc.to_csv(self.csvPath, index=False)
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(COLS_ASSOC)
+                # ordem de inserção: o snapshot reproduz a tabela como foi montada
+                for palete, produto, horario in self._ordem.values():
+                    writer.writerow([produto, palete, horario or ""])
+            os.replace(tmp, self.csvPath)
+            self.diario.truncar()
             logger.info("[%s] Dados de associações salvos.", self.nome)
         except Exception as e:
             logger.error("[%s] Falha ao salvar %s: %s", self.nome, self.csvPath, e)
 
+    def _registrar_diario(self, *campos) -> None:
+        self.diario.anexar(*campos)
+        if self.diario.precisa_compactar():
+            self.salvarDadosLocais()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
     def paletes_assoc(self) -> List[str]:
-        if "palete" not in self.df_assoc:
-            return []
-        return [p for p in self.df_assoc["palete"].dropna().astype(str).tolist()]
+        return list(self._por_palete.keys())
 
     def associa(self, palete: str, produto: str) -> None:
         horario = datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
-        dado = pd.DataFrame([
-            {"palete": palete, "produto": produto, "horario": horario}
-        ])
 
         # apêndice no histórico (com cabeçalho somente se o arquivo ainda não existir)
         try:
             header = not self.histPath.exists()
-            dado.to_csv(self.histPath, index=False, mode="a", header=header)
+            with open(self.histPath, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if header:
+                    writer.writerow(["palete", "produto", "horario"])
+                writer.writerow([palete, produto, horario])
         except Exception as e:
             logger.error("[%s] Erro ao escrever histórico %s: %s", self.nome, self.histPath, e)
 
-        self.df_assoc = pd.concat([self.df_assoc, dado], ignore_index=True)
-        self.salvarDadosLocais()
+        self._indexar(palete, produto, horario)
+        self._registrar_diario("A", palete, produto, horario)
 
     def desassocia(self, produto: str) -> None:
-        if "produto" not in self.df_assoc:
-            return
-        self.df_assoc = self.df_assoc[self.df_assoc["produto"] != produto].reset_index(drop=True)
-        self.salvarDadosLocais()
+        if self._desindexar(produto):
+            self._registrar_diario("D", produto)
 
     def palete_produto(self, palete: str) -> Optional[str]:
-        if self.df_assoc.empty:
-            return None
-        resultado = self.df_assoc[self.df_assoc["palete"] == palete]
-        if resultado.empty:
+        assocs = self._por_palete.get(palete)
+        if not assocs:
             return None
         # retorna o ÚLTIMO produto associado ao palete
-        try:
-            return resultado.tail(1)["produto"].astype(str).iloc[0]
-        except Exception:
-            return None
+        return str(assocs[-1][0])
     
     def palete_associado(self, palete: str) -> bool:
-        return palete in self.paletes_assoc()
+        return palete in self._por_palete
 
 
 associacoes = Tabela_Assoc("associacoes")
@@ -185,20 +257,30 @@ associacoes = Tabela_Assoc("associacoes")
 # CLASSE POSTO
 # -----------------------------------------------------------------------------
 class Posto:
-    def __init__(self, posto: str, mqttc) -> None:
+    # Atributos que compõem o PostoSnapshot: quem os altera marca `_snapshot_sujo`
+    # (produto_atual, palete_atual, maquina_estado, maquina_estado_anterior,
+    #  contador_produtos, funcionario_nome, funcionario_imagem)
+
+    def __init__(self, posto: str, mqttc, relogio=None, linha: str = "", ultimo_posto: Optional[int] = None) -> None:
+        self.relogio = relogio or relogio_atual()
         self.id_posto = posto
         self.n_posto = int(posto.split("_")[1])
+        # linha "" = linha padrão (tópicos, arquivos e chave no banco sem prefixo)
+        self.linha = linha
+        self.ultimo_posto = ultimo_posto_bios if ultimo_posto is None else ultimo_posto
+        self.chave = f"{linha}/{posto}" if linha else posto  # coluna `posto` em producao_ciclos
         self.nome_formatado = f"Posto {self.n_posto}"
         self.posto_anterior: Optional[str] = f"posto_{self.n_posto - 1}" if self.n_posto > 0 else None
         self.posto_posterior: Optional[str] = (
-            f"posto_{self.n_posto + 1}" if self.n_posto < ultimo_posto_bios else None
+            f"posto_{self.n_posto + 1}" if self.n_posto < self.ultimo_posto else None
         )
 
-        self.nome = posto.upper()
+        self.nome = prefixo_arquivos_linha(linha) + posto.upper()
         self.csvPath = DATA_DIR / f"{self.nome}.csv"
         self.XlsPath = DATA_DIR / f"{self.nome}.xlsx"
+        self.diario = DiarioAppend(DATA_DIR / f"{self.nome}.journal.csv")
 
-        self.df_historico = self.carregarDados()
+        self.historico = self.carregarDados()
         self.produto_atual: Optional[str] = None
         self.palete_atual: Optional[str] = None
 
@@ -216,9 +298,20 @@ class Posto:
         self.transporte = None # callback opcional
         self.movimento_produto = None # callback opcional
         self.trajetoria_correta = None # callback opcional
+        self.produto_concluido = None # callback opcional
+        self.tempo_registrado = None # callback opcional (posto, tipo_tempo, valor)
         self.popup = None # callback opcional
         
-        self._last_update = time.time()
+        self._last_update = self.relogio.agora()
+        # lote de notificações: dentro do lote, _notify só marca pendência
+        self._lote_nivel = 0
+        self._notificacao_pendente = False
+        self._notificacao_forcada = False
+        # cache do snapshot: reconstruído só quando um campo de origem muda
+        self._snapshot_sujo = True
+        self._snapshot_cache: Optional[PostoSnapshot] = None
+        self._snapshot_hist_versao = -1
+        self._versao_notificada = -1
 
         self.funcionario_nome = None
         self.funcionario_imagem = None
@@ -228,6 +321,10 @@ class Posto:
 
         self.ordem_producao_atual = None
 
+        # trava do estado do posto: segurada pelo worker da fila de eventos do posto.
+        # Ordem de aquisição: posto_n pode travar posto_(n-1) (transporte), nunca o contrário.
+        self.trava = threading.RLock()
+
     def reset(self):
         logger.info("[%s] Resetando estado do posto.", self.nome)
 
@@ -248,30 +345,39 @@ class Posto:
         self.db_row_id_ultima = None
 
         self.ordem_producao_atual = None
-        
+
+        # histórico da ordem encerrada (já salvo e apagado por apagar_arquivos_sistema):
+        # sem isso as linhas antigas voltariam no CSV/zip da próxima ordem
+        self.diario.truncar()
+        self.historico = HistoricoCiclos()
+        self._snapshot_sujo = True
+
         self._notify()
     
     def insert_produto(self, produto):
         if verifica_cod_produto(produto):
             self.produto_atual = produto
+            self._snapshot_sujo = True
             self._notify()
         else:
             print(f"[ERRO] - Erro ao tentar associar produto ao posto {self.id_posto}")
 
     def set_palete_atual(self, palete):
         self.palete_atual = palete
+        self._snapshot_sujo = True
 
     def get_palete_atual(self):
         return self.palete_atual
         
     def add_funcionario(self, nome, imagem):
         self.funcionario_nome = nome
-        self.funcionario_imagem = imagem  
+        self.funcionario_imagem = imagem
+        self._snapshot_sujo = True
     # ------------------------------------------------------------------
     # Registro de linha (início de montagem)
     # ------------------------------------------------------------------
     def inicia_prod_tempo(self):
-        self.timestamp['BD'] = time.perf_counter()
+        self.timestamp['BD'] = self.relogio.monotonic()
 
     def inicia_montagem(self, arrival: float) -> None:
         nova_linha = {
@@ -283,33 +389,39 @@ class Posto:
             "tempo_transferencia": None,
             "tempo_ciclo": None,
             "ordem_producao": self.ordem_producao_atual,
-            "hora": datetime.now().strftime("%d/%m/%Y, %H:%M:%S"),
+            "hora": datetime.fromtimestamp(self.relogio.agora()).strftime("%d/%m/%Y, %H:%M:%S"),
         }
-        self.df_historico = pd.concat([self.df_historico, pd.DataFrame([nova_linha])], ignore_index=True)
-        self.salvarDadosLocais()
-        
+        idx = self.historico.nova_linha(nova_linha)
+        self._registrar_diario(
+            [(DIARIO_NOVA_LINHA, idx)]
+            + [(DIARIO_SET, idx, col, v) for col, v in nova_linha.items() if v is not None]
+        )
+
         if self.db_row_id_atual is None:
             self.db_row_id_atual = criar_linha_aberta(
-                self.id_posto,
+                self.chave,
                 palete=self.palete_atual
             )
 
     def atualizar_tempo(self, produto: Optional[str], tipo_tempo: str, valor: float) -> None:
         valor = float(valor)
         if produto is not None:
-            if produto not in self.df_historico["produto"].astype(str).values:
+            linhas = self.historico.indices_produto(produto)
+            if not linhas:
                 logger.info("[%s] Produto %s não encontrado, associando à última linha.", self.nome, produto)
                 self.atualiza_produto(produto)
-            self.df_historico.loc[self.df_historico["produto"].astype(str) == str(produto), tipo_tempo] = round(valor, 2)
-            self.salvarDadosLocais()
+                linhas = self.historico.indices_produto(produto)
+            for idx in linhas:
+                self.historico.set(idx, tipo_tempo, round(valor, 2))
+            self._registrar_diario((DIARIO_SET, idx, tipo_tempo, round(valor, 2)) for idx in linhas)
             logger.info("[%s] %s do produto %s atualizado (%.2fs)", self.nome, tipo_tempo, produto, valor)
         else:
-            if len(self.df_historico) == 0:
+            idx = self.historico.ultimo_idx
+            if idx is None:
                 logger.warning("[%s] Nenhum registro ativo para atualizar.", self.nome)
                 return
-            idx = self.df_historico.index[-1]
-            self.df_historico.at[idx, tipo_tempo] = round(valor, 2)
-            self.salvarDadosLocais()
+            self.historico.set(idx, tipo_tempo, round(valor, 2))
+            self._registrar_diario([(DIARIO_SET, idx, tipo_tempo, round(valor, 2))])
             logger.info("[%s] %s atualizado (%.2fs).", self.nome, tipo_tempo, valor)
 
         row_id = self.db_row_id_atual
@@ -317,33 +429,36 @@ class Posto:
             row_id = self.db_row_id_ultima
 
         if row_id is not None:
-            atualizar_tempo_db(self.id_posto, row_id, tipo_tempo, valor)
+            atualizar_tempo_db(self.chave, row_id, tipo_tempo, valor)
+
+        if callable(self.tempo_registrado):
+            self.tempo_registrado(self.id_posto, tipo_tempo, valor)
 
     def atualiza_produto(self, produto: str) -> None:
-        if len(self.df_historico) == 0:
+        idx = self.historico.ultimo_idx
+        if idx is None:
             logger.warning("[%s] Nenhuma linha para associar produto.", self.nome)
             return
-        idx = self.df_historico.index[-1]
-        self.df_historico.at[idx, "produto"] = str(produto)
-        self.salvarDadosLocais()
+        self.historico.set(idx, "produto", str(produto))
+        self._registrar_diario([(DIARIO_SET, idx, "produto", str(produto))])
         logger.info("[%s] Produto %s associado à linha %d.", self.nome, produto, idx)
 
         if self.db_row_id_atual is not None:
-            atualizar_produto_db(self.id_posto, self.db_row_id_atual, produto, self.palete_atual, self.ordem_producao_atual)
+            atualizar_produto_db(self.chave, self.db_row_id_atual, produto, self.palete_atual, self.ordem_producao_atual)
 
 
     # ------------------------------------------------------------------
     # Cálculos de tempos
     # ------------------------------------------------------------------
-    def calcula_transporte(self) -> None:
-        if self.n_posto < ultimo_posto_bios:
+    def calcula_transporte(self, ts: Optional[float] = None) -> None:
+        if self.n_posto < self.ultimo_posto:
             if self.BD_backup is None:
                 logger.debug("[%s] Sem BD_backup anterior; transporte não calculado.", self.nome)
                 return
-            self.BS_posterior = time.perf_counter()
+            self.BS_posterior = self.relogio.monotonic() if ts is None else ts
             transporte = round(self.BS_posterior - self.BD_backup, 2)
             self.atualizar_tempo(self.produto_atual, "tempo_transferencia", transporte)
-        elif self.n_posto == ultimo_posto_bios:
+        elif self.n_posto == self.ultimo_posto:
             self.atualizar_tempo(self.produto_atual, "tempo_transferencia", 0.0)
         else:
             logger.error("[%s] Posto inválido para transporte.", self.nome)
@@ -355,11 +470,11 @@ class Posto:
             self.atualizar_tempo(self.produto_atual, "tempo_ciclo", tempo_ciclo)
 
     def calcular_tempo_ciclo(self, idx: Optional[int] = None) -> Optional[float]:
-        if self.df_historico.empty:
+        if self.historico.vazio:
             logger.warning("[%s] Nenhum dado disponível para cálculo.", self.nome)
             return None
         if idx is None:
-            idx = self.df_historico.index[-1]
+            idx = self.historico.ultimo_idx
 
         campos_tempos = [
             "arrival_time",
@@ -371,12 +486,9 @@ class Posto:
 
         valores: List[float] = []
         for c in campos_tempos:
-            v = self.df_historico.at[idx, c]
-            if pd.notna(v):
-                try:
-                    valores.append(float(v))
-                except Exception:
-                    logger.debug("[%s] Valor não numérico em %s (linha %d): %r", self.nome, c, idx, v)
+            v = self.historico.get(idx, c)
+            if v is not None:
+                valores.append(v)
 
         if not valores:
             logger.info("[%s] Nenhum tempo válido para somar (linha %d).", self.nome, idx)
@@ -388,9 +500,11 @@ class Posto:
     # ------------------------------------------------------------------
     # Tratamento de mensagens do dispositivo
     # ------------------------------------------------------------------
-    def tratamento_dispositivo(self, payload: str) -> None:
+    def tratamento_dispositivo(self, payload: str, ts: Optional[float] = None) -> None:
+        # ts: instante (perf_counter) em que a mensagem chegou; None = agora
+        agora = self.relogio.monotonic() if ts is None else ts
         if payload in self.timestamp:
-            self.timestamp[payload] = time.perf_counter()
+            self.timestamp[payload] = agora
 
             if payload == "BS":
                 # BS permanece compatível mas não aciona o fluxo principal (agora via NFC PLT).
@@ -415,6 +529,7 @@ class Posto:
                 logger.info("[%s] - ESTADO 4 - BD", self.nome)
                 if self.produto_atual is None:
                     self.produto_atual = associacoes.palete_produto(self.palete_atual)
+                    self._snapshot_sujo = True
                 espera = round(self.timestamp["BD"] - self.timestamp["BT2"], 2)
                 self.atualizar_tempo(self.produto_atual, "tempo_espera", espera)
 
@@ -423,13 +538,16 @@ class Posto:
                     if prod is not None:
                         self.atualiza_produto(prod)
 
-                if self.id_posto == f"posto_{ultimo_posto_bios}":
-                    self.calcula_transporte()
+                if self.n_posto == self.ultimo_posto:
+                    self.calcula_transporte(agora)
                     if self.produto_atual is not None:
                         associacoes.desassocia(self.produto_atual)
 
+                if callable(self.produto_concluido) and self.produto_finalizado_nesse_posto(self.produto_atual):
+                    self.produto_concluido(self.n_posto, self.produto_atual, agora)
+
                 if self.db_row_id_atual is not None:
-                    fechar_linha(self.id_posto, self.db_row_id_atual)
+                    fechar_linha(self.chave, self.db_row_id_atual)
                     self.db_row_id_ultima = self.db_row_id_atual
                     self.db_row_id_atual = None
 
@@ -438,13 +556,15 @@ class Posto:
                         evento="saida_para_transporte",
                         origem=self.id_posto,
                         destino=self.posto_posterior,
-                        produto=self.produto_atual
+                        produto=self.produto_atual,
+                        ts=agora
                     )
 
                 self.produto_atual = None
                 self.palete_atual = None
-                self.BD_backup = time.perf_counter()
+                self.BD_backup = agora
                 self.contador_produtos += 1
+                self._snapshot_sujo = True
                 self.atualizar_estado(0)
                 return
 
@@ -475,11 +595,11 @@ class Posto:
                 # Tratamento de palete NFC substitui BS
                 if self.posto_anterior is not None:
                     logger.debug("Chamando transporte do %s → %s via NFC-palete", self.posto_anterior, self.id_posto)
-                    self.transporte(self.posto_anterior)
+                    self.transporte(self.posto_anterior, agora)
 
                 if self.maquina_estado == 0:
                     logger.info("[%s] - ESTADO 1 - NFC palete (substitui BS)", self.nome)
-                    self.timestamp["BS"] = time.perf_counter()
+                    self.timestamp["BS"] = agora
                     arrival = 0.0
                     if self.timestamp.get("BD") is not None:
                         arrival = round(self.timestamp["BS"] - self.timestamp["BD"], 2)
@@ -489,11 +609,13 @@ class Posto:
                 if callable(self.movimento_produto) and self.posto_anterior is not None:
                     self.movimento_produto(
                         evento="chegada_do_transporte",
-                        destino=self.id_posto
+                        destino=self.id_posto,
+                        ts=agora
                     )
 
                 if self.id_posto == "posto_0":
                     self.palete_atual = palete_lido
+                    self._snapshot_sujo = True
                     self._notify()
                 else:
                     self.tratamento_palete(palete_lido)
@@ -507,6 +629,7 @@ class Posto:
         if produto_lido and verifica_cod_produto(produto_lido):
             self.palete_atual = palete
             self.produto_atual = produto_lido
+            self._snapshot_sujo = True
             self.atualiza_produto(self.produto_atual)
         else:
             logger.warning("[%s] - %s não foi associado a um produto válido.", self.nome, palete)
@@ -514,7 +637,7 @@ class Posto:
     # ------------------------------------------------------------------
     # Persistência
     # ------------------------------------------------------------------
-    def carregarDados(self) -> pd.DataFrame:
+    def carregarDados(self) -> HistoricoCiclos:
         if self.csvPath.exists():
             logger.info("[%s] Carregando dados locais do posto.", self.nome)
             try:
@@ -526,13 +649,41 @@ class Posto:
             logger.warning("[%s] Dados locais não encontrados (iniciando vazio).", self.nome)
             df = pd.DataFrame(columns=COLS_POSTO)
 
-        # garante colunas
-        for col in COLS_POSTO:
-            if col not in df.columns:
-                df[col] = pd.Series(dtype="object")
-        return df
+        historico = HistoricoCiclos.from_dataframe(df)
+        self._reaplicar_diario(historico)
+        return historico
 
-    def montagem_completa(self, df: pd.DataFrame, codigo_produto: str) -> bool:
+    def _reaplicar_diario(self, historico: HistoricoCiclos) -> None:
+        """
+        Reaplica sobre o CSV consolidado as alterações anexadas ao diário desde a
+        última compactação (recuperação após queda do processo).
+        Os registros são idempotentes: reaplicar um diário já compactado não duplica linhas.
+        """
+        n_registros = 0
+        for reg in self.diario.registros():
+            n_registros += 1
+            try:
+                if reg[0] == DIARIO_NOVA_LINHA:
+                    if int(reg[1]) == len(historico):
+                        historico.nova_linha()
+                elif reg[0] == DIARIO_SET:
+                    idx, campo, valor = int(reg[1]), reg[2], valor_ou_none(reg[3])
+                    if idx < len(historico) and campo in COLS_POSTO:
+                        historico.set(idx, campo, valor)
+            except (IndexError, ValueError) as e:
+                logger.error("[%s] Registro inválido no diário %r: %s", self.nome, reg, e)
+
+        self.diario.registros_pendentes = n_registros
+        if n_registros:
+            logger.info("[%s] %d registros reaplicados do diário.", self.nome, n_registros)
+
+    def _registrar_diario(self, registros) -> None:
+        """Anexa alterações ao diário (O(1)) e compacta quando o diário cresce demais."""
+        self.diario.anexar_varios(registros)
+        if self.diario.precisa_compactar():
+            self.salvarDadosLocais()
+
+    def montagem_completa(self, historico: HistoricoCiclos, codigo_produto: str) -> bool:
         """
         Verifica se a linha do produto está preenchida até 'tempo_espera'.
 
@@ -542,39 +693,25 @@ class Posto:
         - tempo_preparo
         - tempo_montagem
         - tempo_espera
-        """
-
-        COLS_OBRIGATORIAS = [
-            "produto",
-            "arrival_time",
-            "tempo_preparo",
-            "tempo_montagem",
-            "tempo_espera",
-        ]
-
-        df_prod = df[df["produto"] == codigo_produto]
-
-        if df_prod.empty:
-            return False
-
-        linha = df_prod.iloc[-1]
-
-        for col in COLS_OBRIGATORIAS:
-            valor = linha[col]
 
-            if pd.isna(valor) or valor == "":
-                return False
-
-        return True
+        O histórico mantém o conjunto de produtos completos a cada escrita,
+        então a consulta é O(1).
+        """
+        return historico.produto_completo(codigo_produto)
     
     def produto_finalizado_nesse_posto(self, produto: str) -> bool:
-        return self.montagem_completa(self.df_historico, produto)
+        return self.montagem_completa(self.historico, produto)
 
     def salvarDadosLocais(self) -> None:
+        """Compactação: reescreve o CSV consolidado e descarta o diário."""
+        tmp = self.csvPath.with_suffix(".csv.tmp")
         try:
-            self.df_historico.to_csv(self.csvPath, index=False)
+            df = self.historico.to_dataframe()
+            df.to_csv(tmp, index=False)
+            os.replace(tmp, self.csvPath)
             # Opcional: exportar para Excel (custo de IO alto). Descomente se necessário.
-            # self.df_historico.to_excel(self.XlsPath, index=False)
+            # df.to_excel(self.XlsPath, index=False)
+            self.diario.truncar()
             logger.debug("[%s] Dados salvos em %s.", self.nome, self.csvPath)
         except Exception as e:
             logger.error("[%s] Falha ao salvar %s: %s", self.nome, self.csvPath, e)
@@ -587,6 +724,7 @@ class Posto:
     def atualizar_estado(self, estado: int) -> None:
         self.maquina_estado_anterior = self.maquina_estado
         self.maquina_estado = estado
+        self._snapshot_sujo = True
 
         if estado == 0:
             print('[INFO] - ESTADO 0')
@@ -612,14 +750,22 @@ class Posto:
                 logger.error(f"Erro ao notificar mudança de estado no {self.id_posto}: {e}", exc_info=True)
         self._notify()
 
+    @property
+    def versao_snapshot(self) -> int:
+        """Versão monotônica do snapshot (muda somente quando o conteúdo muda)."""
+        return self.snapshot().versao
+
     def snapshot(self) -> PostoSnapshot:
-        idx = self.df_historico.index[-1] if len(self.df_historico) else None
+        cache = self._snapshot_cache
+        if cache is not None and not self._snapshot_sujo and self._snapshot_hist_versao == self.historico.versao:
+            return cache
+
+        idx = self.historico.ultimo_idx
         def getv(col):
-            if idx is None or col not in self.df_historico.columns:
+            if idx is None:
                 return None
-            val = self.df_historico.at[idx, col]
-            return float(val) if pd.notna(val) else None
-        return PostoSnapshot(
+            return self.historico.get(idx, col)
+        novo = PostoSnapshot(
             id=self.id_posto,
             state=self._state_enum(),
             produto=self.produto_atual,
@@ -632,32 +778,74 @@ class Posto:
             t_espera=getv("tempo_espera"),
             t_transf=getv("tempo_transferencia"),
             t_ciclo=getv("tempo_ciclo"),
-            last_update_ts=time.time(),
+            last_update_ts=self.relogio.agora(),
             funcionario_nome = self.funcionario_nome,
-            funcionario_imagem = self.funcionario_imagem
+            funcionario_imagem = self.funcionario_imagem,
+            versao=cache.versao + 1 if cache is not None else 1,
         )
+        self._snapshot_sujo = False
+        self._snapshot_hist_versao = self.historico.versao
+
+        # a escrita no histórico pode não ter tocado a última linha: mantém a versão
+        if cache is not None and replace(novo, last_update_ts=cache.last_update_ts, versao=cache.versao) == cache:
+            return cache
+        self._snapshot_cache = novo
+        return novo
 
-    def _notify(self):
-        self._last_update = time.time()
+    @contextmanager
+    def lote_notificacoes(self):
+        """
+        Agrupa as notificações disparadas dentro do bloco: no máximo um snapshot
+        é montado e enviado ao sair do lote mais externo.
+        """
+        self._lote_nivel += 1
+        try:
+            yield
+        finally:
+            self._lote_nivel -= 1
+            if self._lote_nivel == 0 and self._notificacao_pendente:
+                forcar = self._notificacao_forcada
+                self._notificacao_pendente = False
+                self._notificacao_forcada = False
+                self._notify(forcar=forcar)
+
+    def _notify(self, forcar: bool = False):
+        """
+        Envia o snapshot ao on_change somente se ele mudou desde o último envio.
+        `forcar=True` reenvia mesmo sem mudança (ex: meta/operador do supervisor mudaram).
+        """
+        self._last_update = self.relogio.agora()
+        if self._lote_nivel > 0:
+            self._notificacao_pendente = True
+            self._notificacao_forcada = self._notificacao_forcada or forcar
+            return
+        snap = self.snapshot()
+        if not forcar and snap.versao == self._versao_notificada:
+            return
+        self._versao_notificada = snap.versao
         if callable(self.on_change):
             try:
-                self.on_change(self.snapshot())
+                self.on_change(snap)
             except Exception:
                 pass
 
+    def _topico(self, topico: str) -> str:
+        return topico_da_linha(self.linha, topico)
+
+    # comandos vão pela outbox: não bloqueiam a FSM; são ações, cada um é publicado (sem coalescer)
     def ativa_batedor(self):
         if self.mqttc:
-            self.mqttc.publish(f"rastreio_nfc/raspberry/{self.id_posto}/sistema", "batedor")
+            outbox_para(self.mqttc).enviar(self._topico(f"rastreio_nfc/raspberry/{self.id_posto}/sistema"), "batedor")
         return
 
     def ativa_camera(self):
         if self.mqttc:
-            self.mqttc.publish(f"sistema/camera/{self.id_posto}", "restart")
+            outbox_para(self.mqttc).enviar(self._topico(f"sistema/camera/{self.id_posto}"), "restart")
         return
 
     def desativa_camera(self):
         if self.mqttc:
-            self.mqttc.publish(f"sistema/camera/{self.id_posto}", "stop")
+            outbox_para(self.mqttc).enviar(self._topico(f"sistema/camera/{self.id_posto}"), "stop")
         return
     
     def controle_mqtt_camera(self, payload):
@@ -1,19 +1,25 @@
 from flask import render_template, jsonify
 from auxiliares.db import get_sessionmaker
 from auxiliares.models_log_producao import LogProducao
+from auxiliares.posto_models import CicloProducao
 from auxiliares.associacao import inicializa_funcionario
-from sqlalchemy import text
+from sqlalchemy import text, func, select
 from sqlalchemy.orm import joinedload
 
 Funcionario, Posto, SessaoTrabalho = inicializa_funcionario()
 
 SessionLocal = get_sessionmaker('funcionarios')
+SessionProducao = get_sessionmaker('producao')
 
 
 def _dt(v):
     return v.isoformat() if v else None
 
 
+def _float(v):
+    return float(v) if v is not None else None
+
+
 def rotas_dashboard(app):
 
     @app.route("/dashboard_producao")
@@ -164,4 +170,43 @@ def rotas_dashboard(app):
             return jsonify({"operadores": total})
 
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    @app.route("/api/balanceamento_linha/<ordem>")
+    def api_balanceamento_linha(ordem):
+        # uma varredura do índice (ordem_producao, produto) na tabela única de ciclos
+        session = SessionProducao()
+
+        try:
+            result = session.execute(
+                select(
+                    CicloProducao.posto,
+                    func.count(CicloProducao.id).label("produtos"),
+                    func.avg(CicloProducao.tempo_preparo).label("tempo_preparo"),
+                    func.avg(CicloProducao.tempo_montagem).label("tempo_montagem"),
+                    func.avg(CicloProducao.tempo_espera).label("tempo_espera"),
+                    func.avg(CicloProducao.tempo_transferencia).label("tempo_transferencia"),
+                    func.avg(CicloProducao.tempo_ciclo).label("tempo_ciclo"),
+                )
+                .where(CicloProducao.ordem_producao == str(ordem), CicloProducao.aberta.is_(False))
+                .group_by(CicloProducao.posto)
+                .order_by(CicloProducao.posto)
+            )
+
+            dados = []
+
+            for row in result:
+                dados.append({
+                    "posto": row.posto,
+                    "produtos": int(row.produtos),
+                    "tempo_preparo": _float(row.tempo_preparo),
+                    "tempo_montagem": _float(row.tempo_montagem),
+                    "tempo_espera": _float(row.tempo_espera),
+                    "tempo_transferencia": _float(row.tempo_transferencia),
+                    "tempo_ciclo": _float(row.tempo_ciclo),
+                })
+
+            return jsonify(dados)
+
+        finally:
+            session.close()
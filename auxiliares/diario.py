@@ -0,0 +1,128 @@
+# auxiliares/diario.py
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import weakref
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# diários com arquivo aberto (fechar_diarios_removidos)
+_ABERTOS: "weakref.WeakSet[DiarioAppend]" = weakref.WeakSet()
+
+
+class DiarioAppend:
+    """
+    Diário (journal) append-only em CSV.
+
+    Cada alteração é anexada como um registro (uma linha do arquivo), então o
+    custo de escrita por evento é O(1). Quem usa o diário é responsável por
+    reescrever o arquivo consolidado e chamar `truncar()` (compactação) quando
+    `precisa_compactar()` indicar ou quando a ordem for encerrada.
+
+    Valores None são gravados como string vazia.
+    """
+
+    def __init__(self, caminho: Path, limite_compactacao: int = 500) -> None:
+        self.caminho = Path(caminho)
+        self.limite_compactacao = int(limite_compactacao)
+        self.registros_pendentes = 0
+        self._arquivo = None
+        self._writer = None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def registros(self) -> Iterator[List[str]]:
+        """Itera os registros gravados desde a última compactação."""
+        if not self.caminho.exists():
+            return
+        try:
+            with open(self.caminho, newline="", encoding="utf-8") as f:
+                for linha in csv.reader(f):
+                    if linha:
+                        yield linha
+        except Exception as e:
+            logger.error("Erro ao ler diário %s: %s", self.caminho, e)
+
+    def contar_registros(self) -> int:
+        self.registros_pendentes = sum(1 for _ in self.registros())
+        return self.registros_pendentes
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def anexar(self, *campos) -> None:
+        self.anexar_varios([campos])
+
+    def anexar_varios(self, registros: Iterable[Sequence]) -> None:
+        try:
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho, "a", newline="", encoding="utf-8")
+                self._writer = csv.writer(self._arquivo)
+                _ABERTOS.add(self)
+            n = 0
+            for campos in registros:
+                self._writer.writerow(["" if c is None else c for c in campos])
+                n += 1
+            self._arquivo.flush()
+            self.registros_pendentes += n
+        except Exception as e:
+            logger.error("Falha ao anexar no diário %s: %s", self.caminho, e)
+            self.fechar()
+
+    def precisa_compactar(self) -> bool:
+        return self.registros_pendentes >= self.limite_compactacao
+
+    def truncar(self) -> None:
+        """Descarta o diário (chamar somente depois de salvar o consolidado)."""
+        self.fechar()
+        try:
+            self.caminho.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error("Falha ao truncar diário %s: %s", self.caminho, e)
+        self.registros_pendentes = 0
+
+    def arquivo_removido(self) -> bool:
+        """O arquivo aberto não é mais o do caminho (apagado ou substituído por fora)."""
+        if self._arquivo is None:
+            return False
+        try:
+            aberto = os.fstat(self._arquivo.fileno())
+            atual = os.stat(self.caminho)
+        except (OSError, ValueError):   # caminho apagado ou descritor inválido
+            return True
+        return (aberto.st_dev, aberto.st_ino) != (atual.st_dev, atual.st_ino)
+
+    def fechar(self) -> None:
+        _ABERTOS.discard(self)
+        if self._arquivo is not None:
+            try:
+                self._arquivo.close()
+            except OSError:
+                pass
+        self._arquivo = None
+        self._writer = None
+
+
+def fechar_diarios_removidos() -> int:
+    """
+    Fecha os diários cujo arquivo foi apagado por fora (ex: apagar_arquivos_sistema);
+    o próximo registro recria o arquivo. Chamar depois de remover arquivos, em vez de
+    conferir o caminho a cada registro. Retorna quantos foram fechados.
+    """
+    n = 0
+    for diario in list(_ABERTOS):
+        if diario.arquivo_removido():
+            diario.fechar()
+            diario.registros_pendentes = 0
+            n += 1
+    return n
+
+
+def valor_ou_none(texto: Optional[str]) -> Optional[str]:
+    """Converte o campo lido do diário de volta (string vazia → None)."""
+    return None if texto is None or texto == "" else texto
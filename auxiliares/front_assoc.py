@@ -1,13 +1,36 @@
+import logging
+
 from auxiliares.utils import verifica_palete_nfc, cartao_palete
 import auxiliares.classes as classes
-from auxiliares.configuracoes import ultimo_posto_bios
 
+logger = logging.getLogger(__name__)
+
+
+def _associar_palete_posto_0(palete, socketio, supervisor):
+    posto = supervisor.postos['posto_0']
+    with posto.trava:
+        if classes.associacoes.palete_produto(palete) is not None:
+            logger.warning("[posto_0] Palete NFC %s associado a produto. Ignorando.", palete)
+            socketio.emit('aviso_ao_operador_assoc', {'mensagem': f"Palete {palete} já associado a um produto da produção.", 'cor': "#dc3545", 'tempo': None}, room=supervisor.sala_geral)
+            return
+        posto.set_palete_atual(palete)
 
-def front_mqtt_assoc(message, socketio, state, supervisor):
-    # Separa a mensagem em topico e payload
-    topic = message.topic
-    payload = message.payload.decode()
-    topicos = topic.split("/")
+    socketio.emit('palete_detectado', {'palete': palete}, room=supervisor.sala_geral)
+    socketio.emit(
+        "aviso_ao_operador_assoc",
+        {
+            "mensagem": "Pressione o botão de impressão de Tag para iniciar o Checklist de Componentes.",
+            "cor": "#202CEB",
+            "tempo": None
+        },
+        room=supervisor.sala_posto("posto_0")
+    )
+
+
+def front_mqtt_assoc(evento, socketio, state, supervisor):
+    # evento já vem decodificado pelo roteador MQTT (EventoMQTT)
+    payload = evento.payload
+    topicos = evento.partes
 
     if len(topicos) != 4:
         return
@@ -18,37 +41,24 @@ def front_mqtt_assoc(message, socketio, state, supervisor):
         if verifica_palete_nfc(payload):
             if state.producao_ligada():
                 palete = cartao_palete[payload]
-
-                if classes.associacoes.palete_produto(palete) is not None:
-                    logger.warning("[%s] Palete NFC %s associado a produto. Ignorando.", dispositivo, palete)
-                    socketio.emit('aviso_ao_operador_assoc', {'mensagem': f"Palete {palete} já associado a um produto da produção.", 'cor': "#dc3545", 'tempo': None})
-                    return
-
-                supervisor.postos['posto_0'].set_palete_atual(palete)
-
-                socketio.emit('palete_detectado', {'palete': palete})
-                socketio.emit(
-                    "aviso_ao_operador_assoc",
-                    {
-                        "mensagem": "Pressione o botão de impressão de Tag para iniciar o Checklist de Componentes.",
-                        "cor": "#202CEB",
-                        "tempo": None
-                    },
-                    room=f"posto:posto_0"
+                # na fila do posto 0, depois dos BT/BD já recebidos: um BD ainda na fila
+                # procura o produto do palete anterior, não o deste
+                supervisor.filas_eventos['posto_0'].executar(
+                    lambda: _associar_palete_posto_0(palete, socketio, supervisor)
                 )
                 return
             elif state.producao_armada():
-                socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção armada. Retire o palete do Posto 0 e Espere o início da produção.", 'cor': "#ffc107", 'tempo': None})
+                socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção armada. Retire o palete do Posto 0 e Espere o início da produção.", 'cor': "#ffc107", 'tempo': None}, room=supervisor.sala_geral)
                 return
             else:
-                socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção não iniciada. Retire o palete do Posto 0 e Espere o início da produção.", 'cor': "#dc3545", 'tempo': None})
+                socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção não iniciada. Retire o palete do Posto 0 e Espere o início da produção.", 'cor': "#dc3545", 'tempo': None}, room=supervisor.sala_geral)
                 return
         elif payload == "BD" and not state.producao_ligada():
-            socketio.emit("fechar_popup",room=f"posto:posto_0")
+            socketio.emit("fechar_popup",room=supervisor.sala_posto("posto_0"))
         elif payload in ["BS", "BT1", "BT2", "BD"]:
             return
         else:
-            socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Achou que eu tava brincando é?", 'cor': "#2fcce0", 'tempo': 3000})
+            socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Achou que eu tava brincando é?", 'cor': "#2fcce0", 'tempo': 3000}, room=supervisor.sala_geral)
             return
     else:
         return
\ No newline at end of file
@@ -0,0 +1,90 @@
+# auxiliares/gravador_mqtt.py
+"""
+Gravação binária das mensagens MQTT consumidas pela aplicação.
+
+Formato do arquivo:
+    cabeçalho: MAGICO (8 bytes) + epoch do início da gravação (double)
+    registro:  <t: double> <len tópico: uint16> <len payload: uint32> <tópico> <payload>
+
+`t` é o deslocamento em segundos desde o início da gravação, medido com o
+mesmo perf_counter que carimba o EventoMQTT na recepção.
+"""
+from __future__ import annotations
+
+import logging
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b"MQTTREC\x01"
+_CABECALHO = struct.Struct("<d")
+_REGISTRO = struct.Struct("<dHI")
+
+
+class GravadorMQTT:
+    """Grava cada EventoMQTT recebido (usado como observador do RoteadorMQTT)."""
+
+    INTERVALO_FLUSH = 1.0
+
+    def __init__(self, caminho) -> None:
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._arquivo = open(self.caminho, "wb")
+        self._arquivo.write(MAGICO + _CABECALHO.pack(time.time()))
+        self._t0 = time.perf_counter()
+        self._ultimo_flush = self._t0
+        self.registros = 0
+        logger.info("Gravando mensagens MQTT em %s", self.caminho)
+
+    def gravar(self, evento) -> None:
+        topico = evento.topico.encode("utf-8")
+        payload = evento.payload.encode("utf-8")
+        t = evento.recebido_em - self._t0
+        with self._lock:
+            if self._arquivo is None:
+                return
+            self._arquivo.write(_REGISTRO.pack(t, len(topico), len(payload)) + topico + payload)
+            self.registros += 1
+            agora = time.perf_counter()
+            if agora - self._ultimo_flush >= self.INTERVALO_FLUSH:
+                self._arquivo.flush()
+                self._ultimo_flush = agora
+
+    def __call__(self, evento) -> None:
+        self.gravar(evento)
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+def ler_gravacao(caminho) -> Iterator[Tuple[float, str, str]]:
+    """Itera (t, tópico, payload) de um arquivo gerado pelo GravadorMQTT."""
+    with open(caminho, "rb") as f:
+        if f.read(len(MAGICO)) != MAGICO:
+            raise ValueError(f"{caminho} não é uma gravação MQTT")
+        f.read(_CABECALHO.size)
+        while True:
+            cab = f.read(_REGISTRO.size)
+            if len(cab) < _REGISTRO.size:
+                return  # fim (ou registro truncado no fim do arquivo)
+            t, n_topico, n_payload = _REGISTRO.unpack(cab)
+            corpo = f.read(n_topico + n_payload)
+            if len(corpo) < n_topico + n_payload:
+                return
+            yield t, corpo[:n_topico].decode("utf-8"), corpo[n_topico:].decode("utf-8")
+
+
+def inicio_gravacao(caminho) -> float:
+    """Epoch (time.time) em que a gravação começou."""
+    with open(caminho, "rb") as f:
+        if f.read(len(MAGICO)) != MAGICO:
+            raise ValueError(f"{caminho} não é uma gravação MQTT")
+        return _CABECALHO.unpack(f.read(_CABECALHO.size))[0]
@@ -0,0 +1,187 @@
+# auxiliares/historico_ciclos.py
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+# Colunas padrão do histórico do posto (mesma ordem do CSV)
+COLS_POSTO = [
+    "produto",
+    "arrival_time",
+    "tempo_preparo",
+    "tempo_montagem",
+    "tempo_espera",
+    "tempo_transferencia",
+    "tempo_ciclo",
+    "ordem_producao",
+    "hora",
+]
+# Colunas numéricas (armazenadas em float64, None <-> NaN)
+COLS_POSTO_TEMPOS = (
+    "arrival_time",
+    "tempo_preparo",
+    "tempo_montagem",
+    "tempo_espera",
+    "tempo_transferencia",
+    "tempo_ciclo",
+)
+COLS_POSTO_TEXTO = ("produto", "ordem_producao", "hora")
+# Campos que precisam estar preenchidos para a montagem do produto ser considerada completa
+COLS_MONTAGEM_COMPLETA = (
+    "produto",
+    "arrival_time",
+    "tempo_preparo",
+    "tempo_montagem",
+    "tempo_espera",
+)
+
+_IDX_TEMPO: Dict[str, int] = {c: i for i, c in enumerate(COLS_POSTO_TEMPOS)}
+
+
+class HistoricoCiclos:
+    """
+    Histórico de ciclos de um posto em colunas pré-alocadas.
+
+    - tempos em uma matriz NumPy (linhas x colunas de tempo) com crescimento
+      amortizado (dobra a capacidade quando enche), sem copiar a cada linha nova;
+    - colunas de texto em listas Python;
+    - acesso à última linha e leitura/escrita escalar em O(1).
+
+    `versao` é incrementada a cada escrita (permite a quem lê saber se algo mudou).
+
+    Mantém também um índice produto -> linhas e o conjunto de produtos com
+    montagem completa (última linha do produto preenchida até 'tempo_espera'),
+    atualizados a cada escrita, para que buscas por produto sejam O(1).
+
+    O DataFrame só é montado em `to_dataframe()` (persistência/relatórios).
+    """
+
+    __slots__ = ("_n", "_tempos", "_texto", "_linhas_produto", "_completos", "versao")
+
+    def __init__(self, capacidade: int = 256) -> None:
+        self._n = 0
+        self._tempos = np.full((max(1, int(capacidade)), len(COLS_POSTO_TEMPOS)), np.nan)
+        self._texto: Dict[str, List[Optional[str]]] = {c: [] for c in COLS_POSTO_TEXTO}
+        self._linhas_produto: Dict[str, List[int]] = {}
+        self._completos: Set[str] = set()
+        self.versao = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def vazio(self) -> bool:
+        return self._n == 0
+
+    @property
+    def ultimo_idx(self) -> Optional[int]:
+        return self._n - 1 if self._n else None
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def _garantir_capacidade(self) -> None:
+        if self._n < len(self._tempos):
+            return
+        novo = np.full((len(self._tempos) * 2, len(COLS_POSTO_TEMPOS)), np.nan)
+        novo[: self._n] = self._tempos[: self._n]
+        self._tempos = novo
+
+    def nova_linha(self, valores: Optional[dict] = None) -> int:
+        self._garantir_capacidade()
+        idx = self._n
+        self._n += 1
+        for lista in self._texto.values():
+            lista.append(None)
+        self.versao += 1
+        for col, valor in (valores or {}).items():
+            self.set(idx, col, valor)
+        return idx
+
+    def set(self, idx: int, col: str, valor) -> None:
+        if not 0 <= idx < self._n:
+            raise IndexError(f"Linha {idx} fora do histórico ({self._n} linhas).")
+        self.versao += 1
+        j = _IDX_TEMPO.get(col)
+        if j is not None:
+            self._tempos[idx, j] = np.nan if valor is None else float(valor)
+        elif col == "produto":
+            self._mover_produto(idx, None if valor is None else str(valor))
+        else:
+            self._texto[col][idx] = None if valor is None else str(valor)
+
+        if col in COLS_MONTAGEM_COMPLETA:
+            self._reavaliar_completo(self._texto["produto"][idx])
+
+    def _mover_produto(self, idx: int, novo: Optional[str]) -> None:
+        antigo = self._texto["produto"][idx]
+        if antigo == novo:
+            return
+        self._texto["produto"][idx] = novo
+        if antigo is not None:
+            linhas = self._linhas_produto.get(antigo, [])
+            if idx in linhas:
+                linhas.remove(idx)
+            if not linhas:
+                self._linhas_produto.pop(antigo, None)
+            self._reavaliar_completo(antigo)
+        if novo is not None:
+            linhas = self._linhas_produto.setdefault(novo, [])
+            linhas.append(idx)
+            linhas.sort()
+
+    def _reavaliar_completo(self, produto: Optional[str]) -> None:
+        if produto is None:
+            return
+        linhas = self._linhas_produto.get(produto)
+        idx = linhas[-1] if linhas else None
+        if idx is not None and all(self.get(idx, c) not in (None, "") for c in COLS_MONTAGEM_COMPLETA):
+            self._completos.add(produto)
+        else:
+            self._completos.discard(produto)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def get(self, idx: int, col: str):
+        j = _IDX_TEMPO.get(col)
+        if j is not None:
+            v = float(self._tempos[idx, j])
+            return None if math.isnan(v) else v
+        return self._texto[col][idx]
+
+    def linha(self, idx: int) -> dict:
+        return {col: self.get(idx, col) for col in COLS_POSTO}
+
+    def indices_produto(self, produto: str) -> List[int]:
+        return list(self._linhas_produto.get(str(produto), ()))
+
+    def produto_completo(self, produto: Optional[str]) -> bool:
+        return produto is not None and str(produto) in self._completos
+
+    def produtos_completos(self) -> Set[str]:
+        return set(self._completos)
+
+    def produtos(self) -> Set[str]:
+        return set(self._linhas_produto)
+
+    # ------------------------------------------------------------------
+    # Conversão (somente persistência / relatórios)
+    # ------------------------------------------------------------------
+    def to_dataframe(self) -> pd.DataFrame:
+        dados = {}
+        for col in COLS_POSTO:
+            j = _IDX_TEMPO.get(col)
+            dados[col] = self._tempos[: self._n, j].copy() if j is not None else list(self._texto[col])
+        return pd.DataFrame(dados, columns=COLS_POSTO)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "HistoricoCiclos":
+        hist = cls(capacidade=max(256, len(df) * 2))
+        colunas = [c for c in COLS_POSTO if c in df.columns]
+        for registro in df[colunas].to_dict("records"):
+            hist.nova_linha({c: (None if pd.isna(v) else v) for c, v in registro.items()})
+        return hist
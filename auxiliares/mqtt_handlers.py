@@ -1,29 +1,68 @@
+import atexit
+import os
+from dataclasses import replace
+
 from auxiliares.front_assoc import front_mqtt_assoc
+from auxiliares.gravador_mqtt import GravadorMQTT
+from auxiliares.mqtt_roteador import RoteadorMQTT
+from auxiliares.mqtt_outbox import outbox_para
+
+TOPICO_DISPOSITIVO = "rastreio_nfc/+/+/dispositivo"  # ex: rastreio_nfc/esp32/posto_0/dispositivo
+TOPICO_VISAO = "visao/+/estado"                       # ex: visao/posto_0/estado  payload: FINALIZADO
+
+def _sem_prefixo_linha(handler):
+    """O id da linha é o primeiro nível do tópico: os handlers recebem o tópico sem ele."""
+    def despachar(evento):
+        partes = evento.partes[1:]
+        handler(replace(evento, topico="/".join(partes), partes=partes))
+    return despachar
+
+
+def registrar_linha(roteador, socketio, supervisor):
+    """Rotas de uma linha (tópicos com o prefixo da linha, se houver)."""
+    def rota(padrao, handler, nome):
+        if supervisor.linha:
+            roteador.registrar(supervisor.topico(padrao), _sem_prefixo_linha(handler), f"{nome} [{supervisor.linha}]")
+        else:
+            roteador.registrar(padrao, handler, nome)
+
+    # a ordem de registro é a ordem de execução para um mesmo tópico
+    rota(
+        TOPICO_DISPOSITIVO,
+        lambda evento: front_mqtt_assoc(evento, socketio, supervisor.state, supervisor),
+        "Front Assoc",
+    )
+    rota(TOPICO_DISPOSITIVO, supervisor.handle_evento_dispositivo, "Supervisor")
+    rota(TOPICO_VISAO, supervisor.vision_state.handle_evento_vision, "VisionState")
+
+
+def configurar_mqtt_handlers(mqtt, socketio, linhas):
+    """Um roteador e uma conexão MQTT para todas as linhas (supervisores em `linhas`)."""
+    linhas = list(linhas)
+    roteador = RoteadorMQTT()
+    for supervisor in linhas:
+        registrar_linha(roteador, socketio, supervisor)
+
+    # MQTT_GRAVACAO=<arquivo>: grava o turno para replay (python -m app.replay <arquivo>)
+    caminho_gravacao = os.getenv("MQTT_GRAVACAO")
+    if caminho_gravacao:
+        gravador = GravadorMQTT(caminho_gravacao)
+        roteador.observadores.append(gravador)
+        atexit.register(gravador.fechar)
 
-def configurar_mqtt_handlers(mqtt, socketio, supervisor, state):
     @mqtt.on_connect()
     def handle_connect(client, userdata, flags, rc):
         print("Conectado ao broker MQTT.")
-        mqtt.subscribe("#")
-        mqtt.publish(f"ControleProducao_DD", f"Stop")
+        roteador.assinar(mqtt)
+        for supervisor in linhas:
+            outbox_para(mqtt).enviar(supervisor.topico("ControleProducao_DD"), "Stop", coalescer=True)
 
     @mqtt.on_message()
     def handle_mqtt_message(client, userdata, message):
-        try:
-            front_mqtt_assoc(message, socketio, state, supervisor)
-        except Exception as e:
-            print(f"[MQTT] - Front Assoc: {e}")
-
-        try:
-            topic = getattr(message, "topic", "") or ""
-            if topic.startswith("visao/") and topic.endswith("/estado"):
-                # Ex: visao/posto_0/estado  payload: FINALIZADO
-                supervisor.vision_state.handle_mqtt_message_vision(message)
-                return
-        except Exception as e:
-            print(f"[MQTT] - VisionState: {e}")
-        
-        #try:
-        supervisor.handle_mqtt_message(message)
-        #except Exception as e:
-            #print(f"[MQTT] - Supervisor: {e}")
+        roteador.despachar(message)
+
+    @mqtt.on_publish()
+    def handle_mqtt_publish(client, userdata, mid):
+        outbox_para(mqtt).confirmar(mid)
+
+    return roteador
@@ -0,0 +1,198 @@
+# auxiliares/mqtt_outbox.py
+"""
+Caixa de saída dos comandos MQTT (câmera, batedor, esteira).
+
+A FSM dos postos e o supervisor não chamam mais mqttc.publish direto:
+registram o comando aqui e seguem. Um worker publica em segundo plano.
+
+- Coalescência (opt-in, `coalescer=True`): só para tópicos de estado
+  idempotentes (ex: ControleProducao_DD Start/Stop). Um comando novo para um
+  tópico que ainda tem comando pendente substitui o anterior (o mais novo
+  vence). Comandos de ação (batedor, restart/stop da câmera) nunca são
+  mesclados: cada enviar() vira uma publicação, na ordem.
+- Atraso: `enviar(..., atraso=2)` agenda o comando (ex: Stop da esteira após
+  o fim da produção). Com coalescência, um comando posterior ao mesmo tópico
+  o substitui.
+- Ack: publish() do flask_mqtt retorna (rc, mid); o mid fica aguardando o
+  on_publish do cliente (`confirmar`). rc != 0 (ex: sem conexão) volta para a
+  fila com backoff, a não ser que já exista um comando mais novo no tópico
+  coalescido.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+JANELA_PADRAO_S = 0.2
+
+
+class OutboxMQTT:
+    MAX_SEM_ACK = 1024
+
+    def __init__(self, mqttc, janela_s: float = JANELA_PADRAO_S, max_tentativas: int = 5):
+        self.mqttc = mqttc
+        self.janela_s = janela_s
+        self.max_tentativas = max_tentativas
+        self._cond = threading.Condition()
+        # chave -> [tópico, payload, qos, retain, prazo, tentativas]
+        # chave = tópico (coalescido) ou (tópico, seq) (cada comando é publicado)
+        self._pendentes = OrderedDict()
+        self._seq = itertools.count()
+        self._sem_ack = OrderedDict()     # mid -> (tópico, payload, enviado_em)
+        self._acks_antecipados = OrderedDict()  # mid confirmado antes do publish() retornar
+        self._em_voo = 0
+        self._contadores = {
+            "enfileirados": 0, "coalescidos": 0, "publicados": 0,
+            "confirmados": 0, "falhas": 0, "descartados": 0,
+        }
+        self._ack_max_s = 0.0
+        self._t = threading.Thread(target=self._run, daemon=True, name="outbox_mqtt")
+        self._t.start()
+
+    # ------------------------------------------------------------------
+    # Produção (chamado pela FSM / supervisor; nunca bloqueia no broker)
+    # ------------------------------------------------------------------
+    def enviar(self, topico: str, payload, atraso: float = 0.0, qos: int = 0, retain: bool = False,
+               coalescer: bool = False) -> None:
+        agora = time.monotonic()
+        with self._cond:
+            self._contadores["enfileirados"] += 1
+            if not coalescer:
+                # ação: publicada assim que vence o atraso, sem esperar a janela
+                self._pendentes[(topico, next(self._seq))] = [topico, payload, qos, retain, agora + atraso, 0]
+                self._cond.notify()
+                return
+            prazo = agora + atraso + self.janela_s
+            atual = self._pendentes.pop(topico, None)
+            if atual is not None:
+                self._contadores["coalescidos"] += 1
+                # comando imediato não espera mais que o pendente; agendado respeita o próprio atraso
+                if atraso <= 0:
+                    prazo = min(atual[4], prazo)
+            self._pendentes[topico] = [topico, payload, qos, retain, prazo, 0]
+            self._cond.notify()
+
+    def confirmar(self, mid) -> None:
+        """Callback on_publish do cliente MQTT."""
+        with self._cond:
+            item = self._sem_ack.pop(mid, None)
+            if item is None:
+                # o loop do paho pode confirmar antes de _publicar registrar o mid
+                self._acks_antecipados[mid] = True
+                while len(self._acks_antecipados) > self.MAX_SEM_ACK:
+                    self._acks_antecipados.popitem(last=False)
+                return
+            self._contadores["confirmados"] += 1
+            self._ack_max_s = max(self._ack_max_s, time.monotonic() - item[2])
+
+    def profundidade(self) -> dict:
+        with self._cond:
+            return {"pendentes": len(self._pendentes), "em_voo": self._em_voo, "sem_ack": len(self._sem_ack)}
+
+    def estatisticas(self) -> dict:
+        with self._cond:
+            return {
+                **self._contadores,
+                "pendentes": len(self._pendentes),
+                "sem_ack": len(self._sem_ack),
+                "ack_max_ms": round(self._ack_max_s * 1000.0, 1),
+                "topicos_pendentes": [item[0] for item in self._pendentes.values()],
+            }
+
+    def drenar(self, timeout: float = 5.0) -> bool:
+        """Espera a fila esvaziar (inclusive comandos agendados). False se estourar o timeout."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._pendentes or self._em_voo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(min(restante, 0.2))
+        return True
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                lote = self._proximos_lote()
+                self._em_voo = len(lote)
+
+            for chave, (topico, payload, qos, retain, _, tentativas) in lote:
+                self._publicar(chave, topico, payload, qos, retain, tentativas)
+
+            with self._cond:
+                self._em_voo = 0
+                self._cond.notify_all()
+
+    def _proximos_lote(self):
+        """Bloqueia (com o lock) até haver comando vencido; retira e devolve os vencidos."""
+        while True:
+            agora = time.monotonic()
+            vencidos = [chave for chave, item in self._pendentes.items() if item[4] <= agora]
+            if vencidos:
+                return [(chave, self._pendentes.pop(chave)) for chave in vencidos]
+            if self._pendentes:
+                self._cond.wait(min(item[4] for item in self._pendentes.values()) - agora)
+            else:
+                self._cond.wait()
+
+    def _publicar(self, chave, topico, payload, qos, retain, tentativas):
+        try:
+            resultado = self.mqttc.publish(topico, payload, qos=qos, retain=retain)
+            rc, mid = resultado if resultado else (0, None)
+        except Exception:
+            logger.exception("[OutboxMQTT] Erro publicando %s=%s", topico, payload)
+            rc, mid = -1, None
+
+        with self._cond:
+            if rc == 0:
+                self._contadores["publicados"] += 1
+                if mid is not None and self._acks_antecipados.pop(mid, None):
+                    self._contadores["confirmados"] += 1
+                elif mid is not None:
+                    self._sem_ack[mid] = (topico, payload, time.monotonic())
+                    while len(self._sem_ack) > self.MAX_SEM_ACK:
+                        self._sem_ack.popitem(last=False)
+                return
+
+            self._contadores["falhas"] += 1
+            if chave in self._pendentes:
+                # já existe um comando mais novo para o tópico coalescido: este ficou obsoleto
+                return
+            if tentativas + 1 >= self.max_tentativas:
+                self._contadores["descartados"] += 1
+                logger.error("[OutboxMQTT] Falha definitiva: %s=%s descartado após %d tentativas.",
+                             topico, payload, self.max_tentativas)
+                return
+            # backoff simples: 0.5s, 1s, 2s, 4s...
+            espera = min(0.5 * (2 ** tentativas), 10.0)
+            self._pendentes[chave] = [topico, payload, qos, retain, time.monotonic() + espera, tentativas + 1]
+            self._cond.notify()
+
+
+# id(cliente MQTT) -> OutboxMQTT (criado sob demanda)
+_OUTBOXES = {}
+_OUTBOXES_LOCK = threading.Lock()
+
+
+def outbox_para(mqttc) -> OutboxMQTT:
+    """Outbox único por cliente MQTT (postos e supervisor compartilham)."""
+    outbox = _OUTBOXES.get(id(mqttc))
+    if outbox is None:
+        with _OUTBOXES_LOCK:
+            outbox = _OUTBOXES.get(id(mqttc))
+            if outbox is None:
+                outbox = OutboxMQTT(mqttc)
+                _OUTBOXES[id(mqttc)] = outbox
+                # o worker é daemon: na saída do processo (reiniciar_sistema) publica o que
+                # ainda está na fila, inclusive o Stop agendado da esteira
+                atexit.register(outbox.drenar, 5.0)
+    return outbox
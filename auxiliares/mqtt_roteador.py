@@ -0,0 +1,113 @@
+# auxiliares/mqtt_roteador.py
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from auxiliares.relogio import relogio_atual
+
+logger = logging.getLogger(__name__)
+
+CURINGA = "+"
+
+
+@dataclass(frozen=True)
+class EventoMQTT:
+    """
+    Mensagem MQTT já decodificada (uma única vez, na entrada).
+    Todos os handlers recebem o mesmo objeto.
+    """
+    topico: str
+    partes: Tuple[str, ...]
+    payload: str
+    recebido_em: float = field(default_factory=lambda: relogio_atual().monotonic())
+
+    @classmethod
+    def de_mensagem(cls, message) -> "EventoMQTT":
+        topico = getattr(message, "topic", "") or ""
+        payload = getattr(message, "payload", b"")
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode(errors="ignore")
+        return cls(topico, tuple(topico.split("/")), str(payload))
+
+
+class RoteadorMQTT:
+    """
+    Tabela de despacho tópico -> handlers.
+
+    Cada padrão é pré-compilado em níveis (`+` casa exatamente um nível; `#`
+    não é suportado de propósito, para que as assinaturas fiquem restritas ao
+    que é consumido). O resultado do casamento é memorizado por tópico, já
+    que o conjunto de tópicos da planta é pequeno e fixo.
+    """
+
+    MAX_CACHE = 1024
+
+    def __init__(self) -> None:
+        # n_niveis -> [(niveis, nome, handler)]
+        self._rotas: Dict[int, List[Tuple[Tuple[str, ...], str, Callable]]] = {}
+        self._padroes: List[str] = []
+        self._cache: Dict[str, Tuple[Tuple[str, Callable], ...]] = {}
+        # chamados com cada evento que tem ao menos um handler (ex: GravadorMQTT)
+        self.observadores: List[Callable[[EventoMQTT], None]] = []
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+    def registrar(self, padrao: str, handler: Callable[[EventoMQTT], None], nome: str | None = None) -> None:
+        niveis = tuple(padrao.split("/"))
+        if "#" in niveis:
+            raise ValueError(f"Padrão MQTT com '#' não suportado: {padrao}")
+        self._rotas.setdefault(len(niveis), []).append((niveis, nome or padrao, handler))
+        if padrao not in self._padroes:
+            self._padroes.append(padrao)
+        self._cache.clear()
+
+    def rota(self, padrao: str, nome: str | None = None):
+        """Decorator equivalente a `registrar`."""
+        def deco(fn):
+            self.registrar(padrao, fn, nome)
+            return fn
+        return deco
+
+    def padroes(self) -> List[str]:
+        return list(self._padroes)
+
+    def assinar(self, mqtt) -> None:
+        for padrao in self._padroes:
+            mqtt.subscribe(padrao)
+
+    # ------------------------------------------------------------------
+    # Despacho
+    # ------------------------------------------------------------------
+    def handlers_para(self, topico: str, partes: Tuple[str, ...] | None = None):
+        handlers = self._cache.get(topico)
+        if handlers is None:
+            partes = partes if partes is not None else tuple(topico.split("/"))
+            handlers = tuple(
+                (nome, handler)
+                for niveis, nome, handler in self._rotas.get(len(partes), ())
+                if all(n == CURINGA or n == p for n, p in zip(niveis, partes))
+            )
+            if len(self._cache) >= self.MAX_CACHE:
+                self._cache.clear()
+            self._cache[topico] = handlers
+        return handlers
+
+    def despachar(self, message) -> int:
+        """Decodifica a mensagem uma vez e chama os handlers na ordem de registro."""
+        evento = message if isinstance(message, EventoMQTT) else EventoMQTT.de_mensagem(message)
+        handlers = self.handlers_para(evento.topico, evento.partes)
+        if handlers:
+            for observador in self.observadores:
+                try:
+                    observador(evento)
+                except Exception:
+                    logger.exception("[MQTT] - Observador falhou em %s", evento.topico)
+        for nome, handler in handlers:
+            try:
+                handler(evento)
+            except Exception:
+                logger.exception("[MQTT] - %s falhou em %s", nome, evento.topico)
+        return len(handlers)
@@ -1,32 +1,101 @@
+import os
+from datetime import date, datetime
+
 from auxiliares.db_base_prod import BaseProd
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Index, inspect, text
+
+# Particionamento mensal (RANGE por criado_em) da tabela de ciclos. Só Postgres.
+PRODUCAO_PARTICIONADA = bool(int(os.getenv("PRODUCAO_PARTICIONADA", "0")))
+
+TABELA_CICLOS = "producao_ciclos"
+
+
+class CicloProducao(BaseProd):
+    """
+    Tabela fato única de ciclos de produção (uma linha por produto por posto).
+    Substitui as tabelas dinâmicas posto_0, posto_1, ...
+    """
+    __tablename__ = TABELA_CICLOS
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    posto = Column(String(40), nullable=False)
+    produto = Column(String(80), nullable=True)
+    palete = Column(String(80), nullable=True)
+    ordem_producao = Column(String(80), nullable=True)
+
+    tempo_preparo = Column(Float, nullable=True)
+    tempo_montagem = Column(Float, nullable=True)
+    tempo_espera = Column(Float, nullable=True)
+    tempo_transferencia = Column(Float, nullable=True)
+    tempo_ciclo = Column(Float, nullable=True)
+
+    aberta = Column(Boolean, nullable=False, default=True)
+
+    # com particionamento a chave de partição precisa fazer parte da PK
+    criado_em = Column(DateTime, nullable=False, default=datetime.now, primary_key=PRODUCAO_PARTICIONADA)
 
+    __table_args__ = (
+        Index("ix_producao_ciclos_posto_ordem_produto", "posto", "ordem_producao", "produto"),
+        Index("ix_producao_ciclos_ordem_produto", "ordem_producao", "produto"),
+        Index("ix_producao_ciclos_criado_em", "criado_em", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (criado_em)"} if PRODUCAO_PARTICIONADA else {},
+    )
 
-def make_posto_model(table_name: str):
 
-    class_name = f"PostoHistorico_{table_name}"
+def _inicio_mes(d: date) -> date:
+    return date(d.year, d.month, 1)
 
-    return type(
-        class_name,
-        (BaseProd,),
-        {
-            "__tablename__": table_name,
+def _proximo_mes(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
 
-            "id": Column(Integer, primary_key=True, autoincrement=True),
+def nome_particao(d: date) -> str:
+    return f"{TABELA_CICLOS}_{d.year:04d}_{d.month:02d}"
 
-            "produto": Column(String(80), nullable=True),
-            "palete": Column(String(80), nullable=True),
-            "ordem_producao": Column(String(80), nullable=True),
+def garantir_particao(engine, d: date) -> None:
+    """Cria (se não existir) a partição mensal que contém a data `d`."""
+    if not PRODUCAO_PARTICIONADA:
+        return
+    inicio = _inicio_mes(d)
+    fim = _proximo_mes(inicio)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{nome_particao(inicio)}" PARTITION OF "{TABELA_CICLOS}" '
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+        ))
 
-            "tempo_preparo": Column(Float, nullable=True),
-            "tempo_montagem": Column(Float, nullable=True),
-            "tempo_espera": Column(Float, nullable=True),
-            "tempo_transferencia": Column(Float, nullable=True),
-            "tempo_ciclo": Column(Float, nullable=True),
+def init_tabela_ciclos(engine) -> None:
+    BaseProd.metadata.create_all(bind=engine)
+    if PRODUCAO_PARTICIONADA:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{TABELA_CICLOS}_default" PARTITION OF "{TABELA_CICLOS}" DEFAULT'
+            ))
+        hoje = date.today()
+        garantir_particao(engine, hoje)
+        garantir_particao(engine, _proximo_mes(hoje))
 
-            "aberta": Column(Boolean, nullable=False, default=True),
 
-            "criado_em": Column(DateTime, default=datetime.now),
-        }
-    )
\ No newline at end of file
+def migrar_tabelas_legadas(engine, postos) -> int:
+    """
+    Copia as tabelas antigas por posto (posto_0, posto_1, ...) para producao_ciclos
+    e renomeia cada uma para <nome>_legado, para a migração não rodar duas vezes.
+    Retorna o número de tabelas migradas.
+    """
+    existentes = set(inspect(engine).get_table_names())
+    migradas = 0
+    for nome in postos:
+        if nome not in existentes:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'INSERT INTO "{TABELA_CICLOS}" '
+                "(posto, produto, palete, ordem_producao, tempo_preparo, tempo_montagem, "
+                "tempo_espera, tempo_transferencia, tempo_ciclo, aberta, criado_em) "
+                "SELECT :posto, produto, palete, ordem_producao, tempo_preparo, tempo_montagem, "
+                "tempo_espera, tempo_transferencia, tempo_ciclo, aberta, COALESCE(criado_em, CURRENT_TIMESTAMP) "
+                f'FROM "{nome}" ORDER BY id'
+            ), {"posto": nome})
+            conn.execute(text(f'ALTER TABLE "{nome}" RENAME TO "{nome}_legado"'))
+        migradas += 1
+    return migradas
@@ -1,76 +1,290 @@
 # auxiliares/posto_repo.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import update
 from sqlalchemy.orm import sessionmaker
 from auxiliares.banco_post import Conectar_DB
-from auxiliares.configuracoes import ultimo_posto_bios
-from auxiliares.posto_models import make_posto_model
-from auxiliares.db_base_prod import BaseProd
+from auxiliares.posto_models import (
+    CicloProducao,
+    garantir_particao,
+    init_tabela_ciclos,
+    migrar_tabelas_legadas,
+)
 
 DB_PRODUCAO = "producao"  # banco separado (não usar 'funcionarios')
 
 engine_producao = Conectar_DB(DB_PRODUCAO)  # usa seu Conectar_DB :contentReference[oaicite:2]{index=2}
 SessionProducao = sessionmaker(bind=engine_producao)
 
-# dict: 'posto_0' -> ModelClass
-POSTO_MODELS = {}
+CAMPOS_TEMPO = {"tempo_preparo", "tempo_montagem", "tempo_espera", "tempo_transferencia", "tempo_ciclo"}
+
+# meses (ano, mes) cuja partição já foi garantida neste processo
+_PARTICOES_OK = set()
+_PARTICOES_LOCK = threading.Lock()
+
+def init_postos_models(ultimo_posto: int):
+    # tabela única producao_ciclos (+ partições, se habilitado)
+    init_tabela_ciclos(engine_producao)
+
+    # tabelas antigas posto_0 .. posto_<ultimo_posto> são copiadas uma única vez
+    legadas = [f"posto_{i}" for i in range(ultimo_posto + 1)]
+    migradas = migrar_tabelas_legadas(engine_producao, legadas)
+    if migradas:
+        print(f"[PostoRepo] {migradas} tabela(s) por posto migrada(s) para producao_ciclos.")
+
+def _garantir_particao(momento: datetime) -> None:
+    chave = (momento.year, momento.month)
+    if chave in _PARTICOES_OK:
+        return
+    with _PARTICOES_LOCK:
+        if chave not in _PARTICOES_OK:
+            garantir_particao(engine_producao, momento.date())
+            _PARTICOES_OK.add(chave)
+
+
+class EscritorPosto:
+    """
+    Fila write-behind ordenada de um posto.
+
+    As funções deste módulo não tocam no banco: registram os campos da linha em
+    `_pendentes` (handle -> campos) e retornam na hora. Um worker por posto
+    drena a fila em ordem de handle; todas as alterações acumuladas de uma
+    mesma linha viram um único INSERT (linha nova) ou UPDATE, e o lote inteiro
+    vai em uma transação. Em caso de erro o lote volta para a fila (sob as
+    alterações mais novas) e é tentado de novo com backoff.
+
+    Só vira INSERT o handle criado por `nova_linha` que ainda não foi gravado.
+    O mapa handle -> id guarda no máximo MAX_IDS_CONHECIDOS linhas fechadas
+    (o posto só volta a atualizar a última); linhas abertas nunca são
+    esquecidas. Atualização de um handle desconhecido é descartada com aviso.
+    """
+
+    MAX_IDS_CONHECIDOS = 256
+
+    def __init__(self, posto_nome: str, max_retries: int = 5):
+        self.posto_nome = posto_nome
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._pendentes = OrderedDict()   # handle -> dict de campos (mesclados)
+        self._ids_db = OrderedDict()      # handle -> (id, criado_em) da linha no banco
+        self._a_inserir = set()           # handles de nova_linha ainda sem INSERT
+        self._abertos = set()             # handles gravados e ainda não fechados
+        self._proximo_handle = 1
+        self._em_voo = 0
+        self._t = threading.Thread(target=self._run, daemon=True, name=f"escritor_{posto_nome}")
+        self._t.start()
+
+    # ------------------------------------------------------------------
+    # Produção (chamado pela FSM do posto; nunca bloqueia no banco)
+    # ------------------------------------------------------------------
+    def nova_linha(self, **campos) -> int:
+        with self._cond:
+            handle = self._proximo_handle
+            self._proximo_handle += 1
+            self._pendentes[handle] = dict(campos)
+            self._a_inserir.add(handle)
+            self._cond.notify()
+        return handle
+
+    def atualizar(self, handle: int, **campos) -> None:
+        with self._cond:
+            self._pendentes.setdefault(handle, {}).update(campos)
+            self._cond.notify()
+
+    def profundidade(self) -> dict:
+        with self._cond:
+            return {"pendentes": len(self._pendentes), "em_voo": self._em_voo}
+
+    def drenar(self, timeout: float = 5.0) -> bool:
+        """Espera a fila esvaziar. Retorna False se estourar o timeout."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._pendentes or self._em_voo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(min(restante, 0.2))
+        return True
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pendentes:
+                    self._cond.wait()
+                lote = self._pendentes
+                self._pendentes = OrderedDict()
+                self._em_voo = len(lote)
+
+            # max_retries = total de tentativas do lote
+            ok = False
+            attempt = 0
+            while not ok and attempt < self.max_retries:
+                attempt += 1
+                try:
+                    self._gravar(lote)
+                    ok = True
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        print(f"[PostoRepo] ERRO gravando {self.posto_nome} (tentativa {attempt}/{self.max_retries}): {e}")
+                        break
+                    # backoff simples: 0.5s, 1s, 2s, 4s...
+                    wait = min(0.5 * (2 ** (attempt - 1)), 10.0)
+                    print(f"[PostoRepo] ERRO gravando {self.posto_nome} (tentativa {attempt}/{self.max_retries}): {e} | retry em {wait:.1f}s")
+                    time.sleep(wait)
+                    lote = self._mesclar_com_novos(lote)
+
+            if not ok:
+                print(f"[PostoRepo] FALHA DEFINITIVA: {len(lote)} linha(s) do {self.posto_nome} descartadas após {self.max_retries} tentativas.")
 
-def init_postos_models():
-    for i in range(ultimo_posto_bios + 1):
-        nome = f"posto_{i}"
-        POSTO_MODELS[nome] = make_posto_model(nome)
+            with self._cond:
+                self._em_voo = 0
+                self._cond.notify_all()
+
+    def _mesclar_com_novos(self, lote):
+        """Junta ao lote que falhou o que chegou enquanto ele estava em voo (o mais novo vence)."""
+        with self._cond:
+            novos = self._pendentes
+            self._pendentes = OrderedDict()
+            for handle, campos in novos.items():
+                lote.setdefault(handle, {}).update(campos)
+            self._em_voo = len(lote)
+        return lote
+
+    def _gravar(self, lote):
+        Model = CicloProducao
+        with self._cond:
+            a_inserir = self._a_inserir.intersection(lote)
+        session = SessionProducao()
+        try:
+            inseridas = []
+            for handle, campos in lote.items():
+                chave = self._ids_db.get(handle)
+                if chave is None and handle not in a_inserir:
+                    print(f"[PostoRepo] {self.posto_nome}: linha {handle} desconhecida, atualização descartada: {campos}")
+                    continue
+                if chave is None:
+                    criado_em = datetime.now()
+                    _garantir_particao(criado_em)
+                    row = Model(**{"aberta": True, **campos, "posto": self.posto_nome, "criado_em": criado_em})
+                    session.add(row)
+                    inseridas.append((handle, row))
+                elif campos:
+                    row_id, criado_em = chave
+                    # criado_em no WHERE permite o Postgres podar as partições
+                    session.execute(
+                        update(Model)
+                        .where(Model.id == row_id, Model.criado_em == criado_em)
+                        .values(**campos)
+                    )
+            session.flush()
+            novos_ids = [(handle, (int(row.id), row.criado_em)) for handle, row in inseridas]
+            session.commit()
+        finally:
+            session.close()
+
+        with self._cond:
+            self._a_inserir.difference_update(a_inserir)
+        for handle, chave in novos_ids:
+            self._ids_db[handle] = chave
+            self._abertos.add(handle)
+        for handle, campos in lote.items():
+            if campos.get("aberta") is False:
+                self._abertos.discard(handle)
+
+        excesso = len(self._ids_db) - self.MAX_IDS_CONHECIDOS
+        if excesso > 0:
+            fechados = [h for h in self._ids_db if h not in self._abertos][:excesso]
+            for handle in fechados:
+                del self._ids_db[handle]
+
+
+class EscritorNulo:
+    """Escritor que descarta tudo (simulação / replay sem banco)."""
+
+    def __init__(self, posto_nome: str):
+        self.posto_nome = posto_nome
+        self._proximo_handle = 1
+
+    def nova_linha(self, **campos) -> int:
+        handle = self._proximo_handle
+        self._proximo_handle += 1
+        return handle
+
+    def atualizar(self, handle: int, **campos) -> None:
+        pass
+
+    def profundidade(self) -> dict:
+        return {"pendentes": 0, "em_voo": 0}
+
+    def drenar(self, timeout: float = 5.0) -> bool:
+        return True
+
+
+# dict: 'posto_0' -> EscritorPosto (criado sob demanda)
+_ESCRITORES = {}
+_ESCRITORES_LOCK = threading.Lock()
+_GRAVACAO_ATIVA = True
+
+def desativar_gravacao() -> None:
+    """Linhas de produção deixam de ir para o banco (usar antes de criar os postos)."""
+    global _GRAVACAO_ATIVA
+    _GRAVACAO_ATIVA = False
+
+def _escritor(posto_nome: str) -> EscritorPosto:
+    escritor = _ESCRITORES.get(posto_nome)
+    if escritor is None:
+        with _ESCRITORES_LOCK:
+            escritor = _ESCRITORES.get(posto_nome)
+            if escritor is None:
+                escritor = EscritorPosto(posto_nome) if _GRAVACAO_ATIVA else EscritorNulo(posto_nome)
+                _ESCRITORES[posto_nome] = escritor
+    return escritor
+
+def profundidade_fila() -> dict:
+    """Profundidade da fila write-behind por posto."""
+    return {nome: e.profundidade() for nome, e in list(_ESCRITORES.items())}
+
+def drenar_filas(timeout: float = 5.0) -> bool:
+    """
+    Espera as filas de todos os postos esvaziarem (prazo total `timeout`).
+    Chamar antes de encerrar a ordem ou sair do processo: os workers são daemon.
+    """
+    limite = time.monotonic() + timeout
+    pendentes = []
+    for nome, escritor in list(_ESCRITORES.items()):
+        if not escritor.drenar(max(0.0, limite - time.monotonic())):
+            pendentes.append(nome)
+    if pendentes:
+        print(f"[PostoRepo] Timeout ({timeout:.1f}s) drenando as filas: {profundidade_fila()}")
+    return not pendentes
 
-    # cria todas as tabelas definidas no Base
-    BaseProd.metadata.create_all(bind=engine_producao)
 
 def criar_linha_aberta(posto_nome: str, palete: str | None = None) -> int:
-    Model = POSTO_MODELS[posto_nome]
-    session = SessionProducao()
-    try:
-        row = Model(produto=None, palete=palete, aberta=True)
-        session.add(row)
-        session.commit()
-        session.refresh(row)
-        return int(row.id)
-    finally:
-        session.close()
+    """Retorna um handle local da linha (o id do banco é resolvido pelo worker)."""
+    return _escritor(posto_nome).nova_linha(produto=None, palete=palete, aberta=True)
 
 def atualizar_produto_db(posto_nome: str, row_id: int, produto: str, palete: str | None, ordem: str):
-    Model = POSTO_MODELS[posto_nome]
-    session = SessionProducao()
-    try:
-        row = session.get(Model, row_id)
-        if not row:
-            return
-        row.produto = str(produto)
-        row.palete = str(palete)
-        row.ordem_producao = str(ordem)
-        session.commit()
-    finally:
-        session.close()
+    _escritor(posto_nome).atualizar(
+        row_id,
+        produto=str(produto),
+        palete=str(palete),
+        ordem_producao=str(ordem),
+    )
 
 def atualizar_tempo_db(posto_nome: str, row_id: int, campo: str, valor: float):
     """
     campo deve ser um desses:
     tempo_preparo, tempo_montagem, tempo_espera, tempo_transferencia, tempo_ciclo
     """
-    Model = POSTO_MODELS[posto_nome]
-    session = SessionProducao()
-    try:
-        row = session.get(Model, row_id)
-        if not row:
-            return
-        setattr(row, campo, float(valor))
-        session.commit()
-    finally:
-        session.close()
+    if campo not in CAMPOS_TEMPO:
+        return
+    _escritor(posto_nome).atualizar(row_id, **{campo: float(valor)})
 
 def fechar_linha(posto_nome: str, row_id: int):
-    Model = POSTO_MODELS[posto_nome]
-    session = SessionProducao()
-    try:
-        row = session.get(Model, row_id)
-        if not row:
-            return
-        row.aberta = False
-        session.commit()
-    finally:
-        session.close()
\ No newline at end of file
+    _escritor(posto_nome).atualizar(row_id, aberta=False)
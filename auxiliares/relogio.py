@@ -0,0 +1,72 @@
+# auxiliares/relogio.py
+"""
+Relógio injetável.
+
+Posto, VisionStateStore, PostoSupervisor e as filas de eventos leem o tempo
+por aqui em vez de chamar time.perf_counter()/time.time() direto:
+
+- monotonic(): base dos tempos de ciclo (equivale a perf_counter);
+- agora():     epoch, para TTL/debounce/cooldown e timer da produção.
+
+Em produção usa-se o RelogioReal. Simulações e testes trocam pelo
+RelogioVirtual (usar_relogio) antes de criar os objetos, e avançam o tempo
+à mão: um turno inteiro roda em segundos e o resultado é determinístico.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+
+class RelogioReal:
+    def monotonic(self) -> float:
+        return time.perf_counter()
+
+    def agora(self) -> float:
+        return time.time()
+
+    def dormir(self, segundos: float) -> None:
+        time.sleep(segundos)
+
+
+class RelogioVirtual:
+    """Tempo que só anda quando alguém manda (avancar/ajustar/dormir)."""
+
+    def __init__(self, epoch_inicial: float | None = None) -> None:
+        self._lock = threading.Lock()
+        self._t = 0.0
+        self._epoch0 = time.time() if epoch_inicial is None else float(epoch_inicial)
+
+    def monotonic(self) -> float:
+        return self._t
+
+    def agora(self) -> float:
+        return self._epoch0 + self._t
+
+    def dormir(self, segundos: float) -> None:
+        self.avancar(segundos)
+
+    def avancar(self, segundos: float) -> float:
+        with self._lock:
+            self._t += max(0.0, float(segundos))
+            return self._t
+
+    def ajustar(self, t: float) -> float:
+        """Leva o relógio até `t` (segundos desde a criação). Nunca volta no tempo."""
+        with self._lock:
+            if t > self._t:
+                self._t = float(t)
+            return self._t
+
+
+_relogio = RelogioReal()
+
+
+def relogio_atual():
+    return _relogio
+
+
+def usar_relogio(relogio) -> None:
+    """Troca o relógio padrão do processo (usar antes de criar postos/supervisor)."""
+    global _relogio
+    _relogio = relogio
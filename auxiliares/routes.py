@@ -1,6 +1,6 @@
 import pandas as pd
 from flask import render_template, request, jsonify, url_for, flash, redirect
-from auxiliares.utils import imprime_qrcode, gera_codigo_produto, verifica_cod_produto, memoriza_produto, reiniciar_produtos, reiniciar_sistema, posto_nome_para_id
+from auxiliares.utils import imprime_qrcode, gera_codigo_produto, verifica_cod_produto, memoriza_produto, reiniciar_produtos, reiniciar_sistema, posto_nome_para_id, salvar_dados_ordem, apagar_arquivos_sistema
 from auxiliares.banco_post import verifica_conexao_banco, Conectar_DB, inserir_dados, consulta_paletes
 from auxiliares.associacao import inicializa_funcionario
 from auxiliares.models_ordens import OrdemProducao
@@ -11,8 +11,10 @@ from time import sleep
 import auxiliares.classes as classes
 from threading import Event
 from auxiliares.configuracoes import cartao_palete
-from auxiliares.configuracoes import ultimo_posto_bios
 from auxiliares.db import get_sessionmaker, get_engine
+from auxiliares.posto_repo import profundidade_fila, drenar_filas
+from auxiliares.mqtt_outbox import outbox_para
+from app.linhas import supervisor_da_requisicao
 evento_resposta = Event()
 import numpy as np
 from dotenv import load_dotenv
@@ -29,7 +31,29 @@ Funcionario, Posto, SessaoTrabalho = inicializa_funcionario()
 db = get_engine('funcionarios')  # deve retornar o engine
 SessionLocal = get_sessionmaker('funcionarios')
 
-def configurar_rotas(app, mqttc, socketio, supervisor):
+def configurar_rotas(app, mqttc, socketio, linhas):
+    def _linha():
+        return supervisor_da_requisicao(linhas)
+
+    def _reiniciar(supervisor, ordem_codigo="Default", debug=False):
+        """
+        Linha padrão: reinicia o processo (reiniciar_sistema). Com várias linhas
+        as outras seguem produzindo: fecha só os arquivos e o estado desta.
+        """
+        # filas write-behind do banco e outbox MQTT (Stop da esteira): os workers
+        # são daemon e morrem no sys.exit
+        drenar_filas()
+        if mqttc is not None and not outbox_para(mqttc).drenar():
+            print("[Outbox] Timeout publicando os comandos MQTT pendentes antes do reinício.")
+        if not supervisor.linha:
+            reiniciar_sistema(id=ordem_codigo, debug=debug)
+            return
+        if not debug:
+            salvar_dados_ordem(ordem_codigo, supervisor.linha)
+        apagar_arquivos_sistema(supervisor.linha)
+        supervisor.state.desligar_producao(por="painel_controle", motivo="reinício da linha")
+        supervisor.reset()
+
     @app.route("/ping")
     def ping():
         return jsonify({"status": "ok"}), 200
@@ -43,6 +67,7 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
     #Rota para enviar comandos do Raspberry
     @app.route("/comando", methods=['POST'])
     def comando():
+        supervisor = _linha()
         if supervisor.state.producao_ligada():
             dados = request.get_json(silent=True)
             comando = dados.get('comando')
@@ -58,7 +83,8 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
                             'mensagem': "Nenhum palete presente no posto 0.",
                             'cor': "#ffc107",
                             'tempo': 2000
-                        }
+                        },
+                        room=supervisor.sala_geral
                     )
                     return "Sem palete"
 
@@ -67,11 +93,11 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
                 if not debug_mode:
                     imprime_qrcode(produto)
 
-                mqttc.publish(f"rastreio_nfc/esp32/posto_0/dispositivo", "BT1")
+                mqttc.publish(supervisor.topico("rastreio_nfc/esp32/posto_0/dispositivo"), "BT1")
 
                 socketio.emit(
                     "fechar_popup",
-                    room=f"posto:posto_0"
+                    room=supervisor.sala_posto("posto_0")
                 )
                 
                 
@@ -94,11 +120,11 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
                 socketio.emit("produto_associado", {
                     "produto": produto,
                     "palete": palete
-                })
+                }, room=supervisor.sala_geral)
 
                 return f"Produto {produto} associado ao palete {palete}"
         else:
-            socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção não inciada. Não foi processado nenhum comando.", 'cor': "#dc3545", 'tempo': 3000})
+            socketio.emit('aviso_ao_operador_assoc', {'mensagem': "Produção não inciada. Não foi processado nenhum comando.", 'cor': "#dc3545", 'tempo': 3000}, room=supervisor.sala_geral)
             return f"Produção não inciada. Não foi processado nenhum comando."
     """
     @socketio.on('campo_palete')
@@ -117,10 +143,23 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
     #Rota para o acesso da interface de controle
     @app.route("/api/q_postos", methods=["GET"])
     def quantidade_postos():
-        return jsonify({"q_postos": ultimo_posto_bios})
+        return jsonify({"q_postos": len(_linha().postos) - 1})
+
+    @app.route("/api/linhas")
+    def listar_linhas():
+        return jsonify([
+            {
+                "id": supervisor.linha,
+                "q_postos": len(supervisor.postos) - 1,
+                "status": supervisor.state.get_producao_status(),
+                "ordem": supervisor.state.get_ordem_atual(),
+            }
+            for supervisor in linhas
+        ]), 200
 
     @app.route("/controle", methods=["GET", "POST"])
     def painel_controle():
+        supervisor = _linha()
         session = SessionLocal()
 
         if request.method == "POST":
@@ -140,7 +179,7 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
 
                 sleep(1)
 
-                return redirect(url_for("painel_controle"))
+                return redirect(url_for("painel_controle", linha=supervisor.linha or None))
 
             postos = session.query(Posto).order_by(Posto.id).all()
 
@@ -163,7 +202,7 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
                 #flash("Não é permitido selecionar o mesmo funcionário para mais de um posto.", "error")
                 socketio.emit('aviso_lista_func', {'mensagem': "Não é permitido selecionar o mesmo funcionário para mais de um posto.", 'cor': "#dc3545", 'tempo': 1000})
                 sleep(1)
-                return redirect(url_for("painel_controle"))
+                return redirect(url_for("painel_controle", linha=supervisor.linha or None))
 
             try:
                 # 3) Primeiro: limpa todos os funcionarios dos postos
@@ -188,7 +227,7 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
             finally:
                 session.close()
 
-            return redirect(url_for("painel_controle"))
+            return redirect(url_for("painel_controle", linha=supervisor.linha or None))
 
         # GET → carrega dados normalmente
         funcionarios = session.query(Funcionario).order_by(Funcionario.nome).all()
@@ -204,19 +243,21 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
             funcionarios=funcionarios,
             postos=postos,
             ops=ops_abertas,
-            ordem_atual=supervisor.state.get_ordem_atual()
+            ordem_atual=supervisor.state.get_ordem_atual(),
+            linha_id=supervisor.linha
         )
 
     @app.route('/supervisorio')
     def supervisorio():
-        from auxiliares.configuracoes import ultimo_posto_bios
-        return render_template('supervisorio.html', num_postos=ultimo_posto_bios+1)
+        supervisor = _linha()
+        return render_template('supervisorio.html', num_postos=len(supervisor.postos), linha_id=supervisor.linha)
     
     # Função controlada pela interface de controle.
     @app.route('/enviar', methods=['POST'])
     def enviar_dados():
         # Dados coletados do JS
         dados = request.get_json()
+        supervisor = _linha()
 
         if dados and dados['tipo'] == 'comando':
             comando = dados['mensagem']
@@ -277,11 +318,12 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
             elif comando == 'Restart':
                 ordem_codigo = dados.get("ordem")
                 supervisor.resetar_timer()
+                supervisor.persistir_historicos()
                 if not ordem_codigo:
-                    reiniciar_sistema(debug=True)
+                    _reiniciar(supervisor, debug=True)
                     return jsonify(status='sucesso', mensagem='Sistema reiniciado. Sem salvar arquivos'), 200
                 else:
-                    reiniciar_sistema(id=ordem_codigo, debug=True)
+                    _reiniciar(supervisor, ordem_codigo, debug=True)
                 return jsonify(status='sucesso', mensagem=f'Sistema reiniciado. Salvando arquivos da Ordem {ordem_codigo}'), 200
             
             elif comando == 'Stop':
@@ -307,9 +349,10 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
                         session.close()
 
                 supervisor.state.desligar_producao(por="painel_controle", motivo="stop manual")
-                mqttc.publish("ControleProducao_DD", "Stop")
+                outbox_para(mqttc).enviar(supervisor.topico("ControleProducao_DD"), "Stop", coalescer=True)
 
-                reiniciar_sistema(id=ordem_codigo, debug=debug_mode)
+                supervisor.persistir_historicos()
+                _reiniciar(supervisor, ordem_codigo, debug=debug_mode)
 
                 return jsonify(status='sucesso', mensagem='Produção encerrada'), 200
             
@@ -319,12 +362,59 @@ def configurar_rotas(app, mqttc, socketio, supervisor):
         else:
             return jsonify(status='erro', mensagem='Tipo de dados inválido.'), 400
 
+    @app.route("/api/posto_repo/fila")
+    def fila_posto_repo():
+        return jsonify(profundidade_fila()), 200
+
+    @app.route("/api/status_global")
+    def status_global():
+        # ETag = versão do documento global: polling com If-None-Match custa um 304
+        etag, corpo = _linha().documento_global_json()
+        resposta = app.response_class(corpo, mimetype="application/json")
+        resposta.set_etag(etag)
+        resposta.headers["Cache-Control"] = "no-cache"
+        return resposta.make_conditional(request)
+
+    @app.route("/api/transporte")
+    def transporte_em_andamento():
+        return jsonify(_linha().transitos.valores()), 200
+
+    @app.route("/api/transporte/estatisticas")
+    def transporte_estatisticas():
+        # por trecho: n, média, desvio, mín/máx, p50/p95 (P²) e último tempo de transporte
+        return jsonify(_linha().transitos.estatisticas()), 200
+
+    @app.route("/api/kpi")
+    def kpi_linha():
+        return jsonify(_linha().kpi_atual()), 200
+
+    @app.route("/api/mqtt/outbox")
+    def outbox_mqtt():
+        return jsonify(outbox_para(mqttc).estatisticas()), 200
+
+    @app.route("/api/visao/estatisticas")
+    @app.route("/api/visao/<posto>/estatisticas")
+    def estatisticas_visao(posto=None):
+        # ?janela=<s> limita o cálculo aos últimos segundos; ?limiar_flap=<s>
+        janela = request.args.get("janela", type=float)
+        limiar = request.args.get("limiar_flap", default=1.0, type=float)
+        supervisor = _linha()
+        vision = supervisor.vision_state
+        if posto is not None:
+            return jsonify(vision.estatisticas(posto, janela, limiar)), 200
+        return jsonify({p: vision.estatisticas(p, janela, limiar) for p in supervisor.postos}), 200
+
+    @app.route("/api/produto/<produto>/localizacao")
+    def localizacao_produto(produto):
+        return jsonify(_linha().localizar_produto(produto)), 200
+
     @app.route("/posto/<int:posto_id>")
     def posto_operador(posto_id):
-        if posto_id >= ultimo_posto_bios + 1:
+        supervisor = _linha()
+        if posto_id >= len(supervisor.postos):
             return "Posto inválido.", 404
 
         if posto_id == 0:
-            return render_template("posto0.html", posto_id=posto_id)
+            return render_template("posto0.html", posto_id=posto_id, linha_id=supervisor.linha)
 
-        return render_template("posto.html", posto_id=posto_id)
\ No newline at end of file
+        return render_template("posto.html", posto_id=posto_id, linha_id=supervisor.linha)
\ No newline at end of file
@@ -1,33 +1,65 @@
 from auxiliares.classes import verifica_estado_producao
-from auxiliares.configuracoes import ultimo_posto_bios
 import auxiliares.classes as classes
 from auxiliares.utils import verifica_cod_produto
 from datetime import datetime
 from time import sleep
+import os
+import threading
 
+from flask import request
+from flask_socketio import join_room
 
-def configurar_socketio_handlers(socketio, supervisor):
 
-    # cliente conectou
+def configurar_socketio_handlers(socketio, linhas, keepalive=True):
+
+    # status da produção: push só na transição OFF/ARMED/ON + keepalive espaçado.
+    # Leitura e emit sob a mesma trava: os clientes nunca recebem uma versão mais velha depois de uma nova.
+    trava_status = threading.Lock()
+    keepalive_s = float(os.getenv("STATUS_KEEPALIVE_S", 30))
+
+    def emitir_status_producao(supervisor, room=None):
+        # room=None: clientes da linha (todos, na linha padrão)
+        room = room or supervisor.sala_geral
+        with trava_status:
+            status, versao = supervisor.state.get_producao_status_versionado()
+            dados = {"status": status, "versao": versao}
+            try:
+                if room is None:
+                    socketio.emit("atualiza_status_producao", dados)
+                else:
+                    socketio.emit("atualiza_status_producao", dados, room=room)
+            except Exception as e:
+                print("Erro ao enviar status:", e)
+
+    for supervisor in linhas:
+        supervisor.state.observar_producao(
+            lambda status, versao, supervisor=supervisor: emitir_status_producao(supervisor)
+        )
+
+    # cliente conectou (io({auth: {linha}}) escolhe a linha; sem linha = linha padrão)
     @socketio.on('connect')
-    def handle_connect():
+    def handle_connect(auth=None):
         print("Cliente conectado!")
+        supervisor = linhas.obter((auth or {}).get("linha"))
+        if supervisor is None:
+            return
+        if supervisor.sala_geral:
+            join_room(supervisor.sala_geral)
+        # quem chega depois recebe o valor atual na hora
+        emitir_status_producao(supervisor, room=request.sid)
 
     # cliente desconectou
     @socketio.on('disconnect')
     def on_disconnect():
         print("Cliente desconectado")
 
-    # envia status da produção periodicamente
+    # keepalive (cobre um push perdido); as mudanças vão pelo observar_producao
     def enviar_status_producao_periodicamente():
         while True:
-            try:
-                socketio.emit("atualiza_status_producao", {
-                    "status": supervisor.state.get_producao_status()
-                })
-            except Exception as e:
-                print("Erro ao enviar status:", e)
-
-            socketio.sleep(1)
+            socketio.sleep(keepalive_s)
+            for supervisor in linhas:
+                emitir_status_producao(supervisor)
 
-    socketio.start_background_task(enviar_status_producao_periodicamente)
\ No newline at end of file
+    # workers web (PAPEL_WORKER=web): o keepalive sai só do principal, pela fila do Socket.IO
+    if keepalive:
+        socketio.start_background_task(enviar_status_producao_periodicamente)
@@ -14,7 +14,8 @@ import zipfile
 
 from dotenv import load_dotenv
 
-from auxiliares.configuracoes import cartao_palete, ultimo_posto_bios
+from auxiliares.configuracoes import cartao_palete
+from auxiliares.diario import fechar_diarios_removidos
 
 # -----------------------------------------------------------------------------
 # ENV / PATHS
@@ -161,7 +162,34 @@ def reiniciar_produtos() -> None:
             except OSError as e:
                 logger.exception("Erro ao remover %s: %s", path, e)
 
-def salvar_dados_ordem(id: str) -> None:
+def _arquivos_sistema(linha: str = "") -> list:
+    """
+    Arquivos de trabalho da produção. Com `linha`, só os da linha
+    (`<LINHA>_POSTO_n.csv` ...): associações e contagem de produtos são
+    compartilhadas entre as linhas e ficam.
+    """
+    if linha:
+        prefixo = prefixo_arquivos_linha(linha)
+        padroes = [
+            os.path.join(PROJECT_DIR, f"{prefixo}*.csv"),
+            os.path.join(PROJECT_DIR, f"{prefixo}*.xlsx"),
+        ]
+    else:
+        padroes = [
+            os.path.join(PROJECT_DIR, "*.csv"),
+            os.path.join(PROJECT_DIR, "*.xlsx"),
+            os.path.join(PROJECT_DIR, "objetos_memory", "*.xlsx"),
+            os.path.join(PROJECT_DIR, "auxiliares", "*.xlsx"),
+            os.path.join(PROJECT_DIR, "auxiliares", "*.csv"),
+            os.path.join(PROJECT_DIR, "objetos_memory", "*.pkl"),
+        ]
+
+    arquivos = []
+    for p in padroes:
+        arquivos.extend(glob.glob(p))
+    return arquivos
+
+def salvar_dados_ordem(id: str, linha: str = "") -> None:
 
     agora = datetime.now()
 
@@ -174,21 +202,10 @@ def salvar_dados_ordem(id: str) -> None:
     os.makedirs(pasta_base, exist_ok=True)
 
     # nome do zip
-    nome_zip = f"{id}_{horario}.zip"
+    nome_zip = f"{linha}_{id}_{horario}.zip" if linha else f"{id}_{horario}.zip"
     caminho_zip = os.path.join(pasta_base, nome_zip)
 
-    padroes = [
-        os.path.join(PROJECT_DIR, "*.csv"),
-        os.path.join(PROJECT_DIR, "*.xlsx"),
-        os.path.join(PROJECT_DIR, "objetos_memory", "*.xlsx"),
-        os.path.join(PROJECT_DIR, "auxiliares", "*.xlsx"),
-        os.path.join(PROJECT_DIR, "auxiliares", "*.csv"),
-        os.path.join(PROJECT_DIR, "objetos_memory", "*.pkl"),
-    ]
-
-    arquivos = []
-    for p in padroes:
-        arquivos.extend(glob.glob(p))
+    arquivos = _arquivos_sistema(linha)
 
     try:
         with zipfile.ZipFile(caminho_zip, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
@@ -202,24 +219,12 @@ def salvar_dados_ordem(id: str) -> None:
                 print(f"Adicionado ao zip: {arquivo}")
 
         print(f"\n📦 Backup compactado criado: {caminho_zip}")
-
     except Exception as e:
         logger.exception("Erro ao gerar zip: %s", e)
         print(f"Erro ao gerar zip: {e}")
 
-def apagar_arquivos_sistema() -> None:
-    padroes = [
-        os.path.join(PROJECT_DIR, "*.csv"),
-        os.path.join(PROJECT_DIR, "*.xlsx"),
-        os.path.join(PROJECT_DIR, "objetos_memory", "*.xlsx"),
-        os.path.join(PROJECT_DIR, "auxiliares", "*.xlsx"),
-        os.path.join(PROJECT_DIR, "auxiliares", "*.csv"),
-        os.path.join(PROJECT_DIR, "objetos_memory", "*.pkl"),
-    ]
-
-    arquivos = []
-    for p in padroes:
-        arquivos.extend(glob.glob(p))
+def apagar_arquivos_sistema(linha: str = "") -> None:
+    arquivos = _arquivos_sistema(linha)
     
     for arquivo in arquivos:
         try:
@@ -228,8 +233,12 @@ def apagar_arquivos_sistema() -> None:
         except OSError as e:
             logger.exception("Erro ao remover %s: %s", arquivo, e)
             print(f"Erro ao remover {arquivo}: {e}")
-    
-    reiniciar_produtos()
+
+    # diários abertos sobre arquivos removidos: reabrem no próximo registro
+    fechar_diarios_removidos()
+
+    if not linha:
+        reiniciar_produtos()
 
 def reiniciar_sistema(id: str = "Default", debug: bool = False) -> None:
 
@@ -359,6 +368,30 @@ def apaga_ultimo_produto_txt() -> None:
         logger.exception("Erro ao apagar último produto em %s: %s", ARQUIVO_PRODUTOS, e)
 
 
+# -----------------------------------------------------------------------------
+# LINHAS (várias linhas de produção no mesmo processo)
+# A linha padrão (id "") mantém tópicos, salas e arquivos sem prefixo.
+# -----------------------------------------------------------------------------
+def topico_da_linha(linha: str, topico: str) -> str:
+    """Ex: ("L2", "sistema/camera/posto_1") -> "L2/sistema/camera/posto_1"."""
+    return f"{linha}/{topico}" if linha else topico
+
+
+def sala_posto(linha: str, posto_id: str) -> str:
+    """Sala Socket.IO da tela de um posto."""
+    return f"{linha}:posto:{posto_id}" if linha else f"posto:{posto_id}"
+
+
+def sala_linha(linha: str) -> Optional[str]:
+    """Sala dos avisos gerais da linha (None = todos os clientes, linha padrão)."""
+    return f"linha:{linha}" if linha else None
+
+
+def prefixo_arquivos_linha(linha: str) -> str:
+    """Prefixo dos CSVs/diários dos postos da linha (ex: L2_POSTO_1.csv)."""
+    return f"{linha.upper()}_" if linha else ""
+
+
 def separar_posto(s: str) -> Tuple[str, int]:
     letras, numero = s.split("_")
     return f"{letras}_", int(numero)
@@ -380,9 +413,9 @@ def posto_anterior(posto_id: str) -> Optional[str]:
     return f"{letras}{numero - 1}"
 
 
-def posto_proximo(posto_id: str) -> Optional[str]:
+def posto_proximo(posto_id: str, ultimo_posto: int) -> Optional[str]:
     """
-    Dado o ID de um posto, retorna o ID do próximo posto.
+    Dado o ID de um posto e o último posto da linha, retorna o ID do próximo posto.
     Ex: "posto_3" -> "posto_4" (se existir)
     """
     try:
@@ -391,7 +424,7 @@ def posto_proximo(posto_id: str) -> Optional[str]:
         return None
 
     numero_proximo = numero + 1
-    if numero_proximo > ultimo_posto_bios:
+    if numero_proximo > ultimo_posto:
         return None
 
     return f"{letras}{numero_proximo}"
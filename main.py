@@ -14,17 +14,14 @@ from auxiliares.dashboard_producao import rotas_dashboard
 from auxiliares.cadastro_ordens import rotas_ordens
 from auxiliares.mqtt_handlers import configurar_mqtt_handlers
 from auxiliares.socketio_handlers import configurar_socketio_handlers
-from auxiliares.associacao import inicializa_Base_assoc
-from auxiliares.classes import inicializar_postos
+from auxiliares.associacao import inicializa_Base_assoc, inicializa_funcionario
 import auxiliares.classes as classes
-from app.supervisor import PostoSupervisor
+from app.linhas import RegistroLinhas, ler_configuracao_linhas, montar_linha
+from app.estado_compartilhado import LinhaRemota, PublicadorEstado, armazem_para, restringir_rotas_web
 from app.socketio_gateway import register_socketio_handlers
-from state import State
 from auxiliares.posto_repo import init_postos_models
 from auxiliares.utils import formatar_posto
 
-from vision_state import VisionStateStore
-
 load_dotenv()
 
 def create_app():
@@ -35,6 +32,9 @@ def create_app():
 
     @app.after_request
     def disable_cache(response):
+        # rotas com validação própria (ETag) definem o Cache-Control
+        if "ETag" in response.headers:
+            return response
         response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
@@ -54,25 +54,57 @@ def create_app():
     app.config['MQTT_CLIENT_ID'] = os.getenv('MQTT_CLIENT_ID')
     app.config['ADMIN_DELETE_PASSWORD'] = os.getenv("ADMIN_DELETE_PASSWORD", "1234")
 
-    app.state = State(int(os.getenv('NUMERO_POSTOS', 2)))
-
-    vision_state = VisionStateStore()
+    # Vários workers (opcional): PAPEL_WORKER=principal (MQTT + FSMs, padrão) ou web
+    # (só Socket.IO/leitura); estado das linhas no ESTADO_COMPARTILHADO_URL e
+    # emits entre workers pela fila SOCKETIO_MESSAGE_QUEUE (ex.: redis://...)
+    papel = os.getenv("PAPEL_WORKER", "principal")
+    url_estado = os.getenv("ESTADO_COMPARTILHADO_URL")
+    if papel not in ("principal", "web"):
+        raise ValueError(f"PAPEL_WORKER inválido: {papel}")
+    if papel == "web" and not url_estado:
+        raise ValueError("PAPEL_WORKER=web precisa de ESTADO_COMPARTILHADO_URL.")
+    armazem = armazem_para(url_estado) if url_estado else None
 
     # Inicialização de extensões
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet",
+                        message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE") or None)
+
+    if papel == "web":
+        linhas = RegistroLinhas()
+        for linha_id, ultimo_posto in ler_configuracao_linhas():
+            linhas.registrar(LinhaRemota(armazem, linha_id, ultimo_posto))
+        app.linhas = linhas
+        restringir_rotas_web(app)
+        configurar_rotas(app, None, socketio, linhas)
+        configurar_socketio_handlers(socketio, linhas, keepalive=False)
+        register_socketio_handlers(socketio, linhas)
+        return app, socketio
+
     mqtt = Mqtt()
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
-    init_postos_models()
-    postos = inicializar_postos(mqtt)
-    supervisor = PostoSupervisor(postos, socketio, mqtt, state=app.state, vision_state=vision_state)
+
+    # Uma ou mais linhas (LINHAS="L1:3,L2:5"); conexão MQTT, Socket.IO e banco compartilhados
+    linhas = RegistroLinhas()
+    for linha_id, ultimo_posto in ler_configuracao_linhas():
+        linhas.registrar(montar_linha(linha_id, ultimo_posto, mqtt, socketio))
+    supervisor = linhas.padrao
+    # as tabelas legadas posto_0..posto_n são da linha padrão (sem prefixo)
+    init_postos_models(ultimo_posto=len(supervisor.postos) - 1)
+    # postos dos funcionários: tabela indexada só pelo nome, cobre a maior linha
+    inicializa_funcionario(ultimo_posto=max(len(s.postos) for s in linhas) - 1)
+    app.state = supervisor.state
+    app.linhas = linhas
 
     # Registro de funcionalidades
-    configurar_rotas(app, mqtt, socketio, supervisor)
-    rotas_funcionarios(app, mqtt, socketio,supervisor)
+    configurar_rotas(app, mqtt, socketio, linhas)
+    # funcionários e ordens: linha pela requisição (?linha=), como as demais rotas
+    rotas_funcionarios(app, mqtt, socketio, linhas)
     rotas_dashboard(app)
-    rotas_ordens(app, mqtt, socketio, supervisor)
-    configurar_mqtt_handlers(mqtt, socketio, supervisor, state=app.state)
-    configurar_socketio_handlers(socketio, supervisor)
-    register_socketio_handlers(socketio, supervisor)
+    rotas_ordens(app, mqtt, socketio, linhas)
+    configurar_mqtt_handlers(mqtt, socketio, linhas)
+    configurar_socketio_handlers(socketio, linhas)
+    register_socketio_handlers(socketio, linhas)
+    if armazem is not None:
+        PublicadorEstado(armazem, linhas, socketio).iniciar()
 
     mqtt.init_app(app)
     # ───────────────────────────────────────────────
@@ -37,11 +37,39 @@ class State:
         }
         self.notifica_armando_producao = None # callback opcional
 
+        # transições OFF/ARMED/ON: versão + ouvintes (status, versao)
+        self.versao_producao = 0
+        self._ouvintes_producao = []
+
 
     # ---------- PRODUÇÃO ----------
+    def observar_producao(self, callback):
+        """callback(status, versao) é chamado a cada transição OFF/ARMED/ON (fora do lock)."""
+        self._ouvintes_producao.append(callback)
+
+    def _mudar_status(self, novo: ProducaoStatus) -> bool:
+        # chamar com self._lock
+        if self.producao.status == novo:
+            return False
+        self.producao.status = novo
+        self.versao_producao += 1
+        return True
+
+    def _notificar_producao(self):
+        status, versao = self.get_producao_status_versionado()
+        for callback in list(self._ouvintes_producao):
+            try:
+                callback(status, versao)
+            except Exception:
+                pass
+
+    def get_producao_status_versionado(self):
+        with self._lock:
+            return self.producao.status.name, self.versao_producao
+
     def armar_producao(self, meta: int = 0, ordem_codigo: str | None = None, log_id=None, por=None, motivo=None, modelo=None):
         with self._lock:
-            self.producao.status = ProducaoStatus.ARMED
+            mudou = self._mudar_status(ProducaoStatus.ARMED)
             self.producao.meta = meta
             self.producao.modelo = modelo
             self.producao.ordem_codigo = ordem_codigo
@@ -50,6 +78,9 @@ class State:
             self.producao.motivo = motivo
             self.producao.inicio_ts = None
         
+        if mudou:
+            self._notificar_producao()
+
         if callable(self.notifica_armando_producao):
             try:
                 self.notifica_armando_producao()
@@ -58,18 +89,20 @@ class State:
 
     def ligar_producao(self, por=None, motivo=None, ordem_codigo: str | None = None, meta: int = 0, modelo: str | None = None):
         with self._lock:
-            if self.producao.status != ProducaoStatus.ON:
-                self.producao.status = ProducaoStatus.ON
+            mudou = self._mudar_status(ProducaoStatus.ON)
+            if mudou:
                 self.producao.inicio_ts = time.time()
                 self.producao.alterada_por = por
                 self.producao.motivo = motivo
                 self.producao.ordem_codigo = ordem_codigo
                 self.producao.meta = int(meta or 0)
                 self.producao.modelo = modelo
+        if mudou:
+            self._notificar_producao()
 
     def desligar_producao(self, por=None, motivo=None):
         with self._lock:
-            self.producao.status = ProducaoStatus.OFF
+            mudou = self._mudar_status(ProducaoStatus.OFF)
             self.producao.inicio_ts = None
             self.producao.meta = 0
             self.producao.modelo = None
@@ -77,6 +110,8 @@ class State:
             self.producao.log_producao_id = None
             self.producao.alterada_por = por
             self.producao.motivo = motivo
+        if mudou:
+            self._notificar_producao()
 
     def get_producao_status(self) -> str:
         with self._lock:
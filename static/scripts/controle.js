@@ -1,4 +1,4 @@
-const socket = io();
+const socket = io({ auth: { linha: LINHA_ID } });
 
 function getOrdemSelecionada() {
     const select = document.getElementById("ordem_select");
@@ -49,7 +49,8 @@ function enviarComando(comando) {
 
     const payload = {
         tipo: 'comando',
-        mensagem: comando
+        mensagem: comando,
+        linha: LINHA_ID
     };
 
     if (comando === 'Start') {
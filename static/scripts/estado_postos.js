@@ -0,0 +1,42 @@
+// Estado versionado dos postos (posto.html, posto0.html e supervisorio.html):
+// snapshot completo no join (posto/state_snapshot, com `seq`), depois só os
+// campos alterados (posto/state_patch {id, seq, campos}). Patches mesclados no
+// mesmo quadro trazem também `de` (primeiro seq coberto). Um buraco na
+// sequência chama pedirSnapshot(id) e ignora patches até o snapshot chegar.
+function criarEstadoPostos(pedirSnapshot){
+    const estados = {};
+
+    function aplicarSnapshot(s){
+        const atual = estados[s.id];
+        // snapshot mais velho que os patches já aplicados: ignora
+        if(atual && !atual._resync && s.seq < atual.seq) return null;
+        estados[s.id] = s;
+        return s;
+    }
+
+    function aplicarPatch(p){
+        const atual = estados[p.id];
+        if(!atual || atual._resync || p.seq <= atual.seq) return null;
+        // patches mesclados no mesmo quadro cobrem de `de` até `seq`
+        if((p.de ?? p.seq) > atual.seq + 1){
+            // buraco na sequência: pede o documento completo de novo
+            atual._resync = true;
+            pedirSnapshot(p.id);
+            return null;
+        }
+        Object.assign(atual, p.campos);
+        atual.seq = p.seq;
+        return atual;
+    }
+
+    // servidor pode ter reiniciado a sequência (reconexão)
+    function esquecer(id){
+        if(id === undefined){
+            for(const k in estados) delete estados[k];
+        }else{
+            delete estados[id];
+        }
+    }
+
+    return { aplicarSnapshot, aplicarPatch, esquecer };
+}
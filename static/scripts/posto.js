@@ -1,4 +1,4 @@
-const socket = io();
+const socket = io({ auth: { linha: LINHA_ID } });
 
 let progressoAtual = 0;
 let progressoDestino = 0;
@@ -25,8 +25,9 @@ function stateName(s){
 
 // Entrar apenas na sala do posto
 socket.on("connect", () => {
-    socket.emit("join_posto", { posto: `posto_${POSTO_ID}` });
-    socket.emit("posto/request_snapshot", { posto:`posto_${POSTO_ID}` });
+    estadoPostos.esquecer(`posto_${POSTO_ID}`);  // servidor pode ter reiniciado a sequência
+    socket.emit("join_posto", { linha: LINHA_ID, posto: `posto_${POSTO_ID}` });
+    socket.emit("posto/request_snapshot", { linha: LINHA_ID, posto:`posto_${POSTO_ID}` });
 });
 
 function animarProgresso(destino){
@@ -170,12 +171,19 @@ socket.on("global/sync_data", (data) => {
 
 
 // eventos
+// Estado versionado: snapshot completo no join, depois só os campos alterados (seq)
+const estadoPostos = criarEstadoPostos(id => socket.emit("posto/request_snapshot", { linha: LINHA_ID, posto: id }));
+
 socket.on("posto/state_snapshot", (s)=>{
-    if(s.id === `posto_${POSTO_ID}`) updateUI(s);
+    if(s.id !== `posto_${POSTO_ID}`) return;
+    const estado = estadoPostos.aplicarSnapshot(s);
+    if(estado) updateUI(estado);
 });
 
-socket.on("posto/state_changed", (s)=>{
-    if(s.id === `posto_${POSTO_ID}`) updateUI(s);
+socket.on("posto/state_patch", (p)=>{
+    if(p.id !== `posto_${POSTO_ID}`) return;
+    const estado = estadoPostos.aplicarPatch(p);
+    if(estado) updateUI(estado);
 });
 
 // Logs
@@ -37,7 +37,7 @@ function mostrarResposta(mensagem, cor) {
 }
 
 // Conexão com o servidor Socket.IO
-const socket = io();
+const socket = io({ auth: { linha: LINHA_ID } });
 
 socket.on('atualiza_status_producao', data => {
 
@@ -198,8 +198,9 @@ socket.on("limpar_associacao", () => {
 
 // quando reconectar, cancela monitoramento
 socket.on("connect", () => {
-    socket.emit("join_posto", { posto: `posto_${POSTO_ID}` });
-    socket.emit("posto/request_snapshot", { posto:`posto_${POSTO_ID}` });
+    estadoPostos.esquecer(`posto_${POSTO_ID}`);  // servidor pode ter reiniciado a sequência
+    socket.emit("join_posto", { linha: LINHA_ID, posto: `posto_${POSTO_ID}` });
+    socket.emit("posto/request_snapshot", { linha: LINHA_ID, posto:`posto_${POSTO_ID}` });
     mostrarResposta("", "green");
     document.getElementById("produto-input").value = "";
     document.getElementById("palete-input").value = "";
@@ -365,12 +366,19 @@ function updateUI(s){
 }
 
 // eventos
+// Estado versionado: snapshot completo no join, depois só os campos alterados (seq)
+const estadoPostos = criarEstadoPostos(id => socket.emit("posto/request_snapshot", { linha: LINHA_ID, posto: id }));
+
 socket.on("posto/state_snapshot", (s)=>{
-    if(s.id === `posto_${POSTO_ID}`) updateUI(s);
+    if(s.id !== `posto_${POSTO_ID}`) return;
+    const estado = estadoPostos.aplicarSnapshot(s);
+    if(estado) updateUI(estado);
 });
 
-socket.on("posto/state_changed", (s)=>{
-    if(s.id === `posto_${POSTO_ID}`) updateUI(s);
+socket.on("posto/state_patch", (p)=>{
+    if(p.id !== `posto_${POSTO_ID}`) return;
+    const estado = estadoPostos.aplicarPatch(p);
+    if(estado) updateUI(estado);
 });
 
 // Logs
@@ -1,5 +1,6 @@
 /* ===================== CONFIG ===================== */
 window.NUM_POSTOS = window.NUM_POSTOS ?? 3;
+window.LINHA_ID = window.LINHA_ID ?? "";  // "" = linha padrão
 let meta_prod = 100;
 let currentProd = 0; // guarda produção atual
 const transportes = {};
@@ -36,7 +37,7 @@ function buildCard(n){
 
   // aqui faz o redirecionamento
   el.onclick = () => {
-      window.location.href = `/posto/${n}`;
+      window.location.href = window.LINHA_ID ? `/posto/${n}?linha=${encodeURIComponent(window.LINHA_ID)}` : `/posto/${n}`;
   };
 
   const initialTitle = 'Espera';
@@ -98,20 +99,22 @@ buildLayout(window.NUM_POSTOS);
 ajustarGrid();
 
 // Socket.IO
-const socket = io();
+const socket = io({ auth: { linha: window.LINHA_ID } });
 
 // Entra nas salas de cada posto e pede snapshot
 function joinAll(){
   for(let n=0; n<window.NUM_POSTOS; n++){
-    socket.emit('join_posto', { posto: `posto_${n}` });
+    socket.emit('join_posto', { linha: window.LINHA_ID, posto: `posto_${n}` });
   }
 }
 
 // SINCRONIZAÇÃO GLOBAL E DOS POSTOS
 socket.on('connect', () => {
+    // servidor pode ter reiniciado a sequência dos patches
+    estadoPostos.esquecer();
     joinAll(); 
     console.log("Conectado. Solicitando sincronização global...");
-    socket.emit('global/request_sync'); 
+    socket.emit('global/request_sync', { linha: window.LINHA_ID }); 
 });
 
 // Evento disparado pelo supervisor.py quando há check-in/out
@@ -257,8 +260,17 @@ function renderTransportes() {
 }
 
 // Eventos do backend
-socket.on('posto/state_snapshot', updateFromSnapshot);
-socket.on('posto/state_changed', updateFromSnapshot);
+// Estado versionado: snapshot completo no join, depois só os campos alterados (seq)
+const estadoPostos = criarEstadoPostos(id => socket.emit('posto/request_snapshot', { linha: window.LINHA_ID, posto: id }));
+
+socket.on('posto/state_snapshot', s => {
+  const estado = estadoPostos.aplicarSnapshot(s);
+  if(estado) updateFromSnapshot(estado);
+});
+socket.on('posto/state_patch', p => {
+  const estado = estadoPostos.aplicarPatch(p);
+  if(estado) updateFromSnapshot(estado);
+});
 socket.on('producao/control', data => {
   meta_prod = data.meta_producao;
   setKpiProducao(currentProd, meta_prod);
@@ -285,7 +297,7 @@ socket.on("transporte/update", (data) => {
 
 // Comandos → backend → Supervisor → Posto → MQTT
 function cmd(n, command, args={}){
-  socket.emit('posto/command', { posto:`posto_${n}`, cmd:command, args });
+  socket.emit('posto/command', { linha: window.LINHA_ID, posto:`posto_${n}`, cmd:command, args });
 }
 window.cmd = cmd; // para testar no console
 
@@ -404,6 +416,24 @@ socket.on("timer/control", (msg) => {
 /* ========= KPI Produção + Projeção (Backend-Driven) ========= */
 
 // NOVO MÉTODO: Apenas exibe o texto da projeção que veio do Python
+// KPIs da linha (vazão, takt, gargalo) calculados no backend
+socket.on('kpi/update', kpi => {
+  const vazaoEl = document.getElementById("kpi-vazao");
+  if (vazaoEl) vazaoEl.textContent = kpi.vazao_h != null ? kpi.vazao_h.toFixed(1) : "--";
+
+  const gargaloEl = document.getElementById("kpi-gargalo");
+  if (gargaloEl) {
+    gargaloEl.textContent = kpi.gargalo ? `Posto ${kpi.gargalo.split('_')[1]}` : "--";
+    gargaloEl.title = kpi.gargalo_trabalho_s != null ? `${kpi.gargalo_trabalho_s} s de trabalho (EWMA)` : "";
+  }
+
+  document.querySelectorAll('.posto.gargalo').forEach(el => el.classList.remove('gargalo'));
+  if (kpi.gargalo) {
+    const card = document.getElementById(kpi.gargalo);
+    if (card) card.classList.add('gargalo');
+  }
+});
+
 function setKpiProjecao(texto) {
   const projEl = document.getElementById("kpi-proj");
   if (projEl) projEl.textContent = texto || "--";
@@ -0,0 +1,33 @@
+# tests/conftest.py
+"""
+Ambiente dos testes: sem Postgres (escritores write-behind nulos) e arquivos
+de trabalho (CSVs, diários, associações) em uma pasta temporária.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# engines do banco são criados na importação dos módulos (conexão só no uso)
+for chave, valor in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "teste",
+                     "DB_PASSWORD": "teste", "DEBUG": "1"}.items():
+    os.environ.setdefault(chave, valor)
+
+# auxiliares.classes cria a tabela de associações no diretório atual ao ser importado
+os.chdir(tempfile.mkdtemp(prefix="testes_dd_"))
+
+import auxiliares.posto_repo as posto_repo  # noqa: E402
+
+posto_repo.desativar_gravacao()
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    """Diretório de trabalho vazio (DATA_DIR é relativo ao diretório atual)."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,91 @@
+# tests/test_associacoes.py
+import csv
+
+from auxiliares.classes import Tabela_Assoc
+
+
+def _consistente(tabela):
+    """Os dois índices descrevem o mesmo conjunto de pares (palete, produto)."""
+    por_palete = {(pl, a[0]) for pl, assocs in tabela._por_palete.items() for a in assocs}
+    por_produto = {(pl, pr) for pr, paletes in tabela._por_produto.items() for pl in paletes}
+    assert por_palete == por_produto
+    assert all(tabela._por_palete.values()) and all(tabela._por_produto.values())
+    assert {(pl, pr) for pl, pr, _ in tabela._ordem.values()} == por_palete
+    return por_palete
+
+
+def test_indices_em_associa_desassocia_e_reassocia(pasta):
+    tabela = Tabela_Assoc("assoc_teste")
+    tabela.associa("PLT1", "P1")
+    tabela.associa("PLT2", "P2")
+    tabela.associa("PLT1", "P3")          # palete reaproveitado: vale o último
+    assert _consistente(tabela) == {("PLT1", "P1"), ("PLT2", "P2"), ("PLT1", "P3")}
+    assert tabela.palete_produto("PLT1") == "P3"
+
+    tabela.desassocia("P3")
+    assert tabela.palete_produto("PLT1") == "P1"
+    tabela.desassocia("P1")
+    assert not tabela.palete_associado("PLT1")
+    assert "P1" not in tabela._por_produto
+    assert _consistente(tabela) == {("PLT2", "P2")}
+
+    tabela.desassocia("P1")               # já solto: nada muda, nada vai ao diário
+    tabela.associa("PLT1", "P1")          # reassocia
+    tabela.associa("PLT2", "P1")          # produto trocou de palete
+    assert _consistente(tabela) == {("PLT2", "P2"), ("PLT1", "P1"), ("PLT2", "P1")}
+    assert tabela.palete_produto("PLT2") == "P1"
+
+    tabela.desassocia("P1")               # solta o produto dos dois paletes
+    assert _consistente(tabela) == {("PLT2", "P2")}
+    assert tabela.palete_produto("PLT2") == "P2"
+    assert tabela.paletes_assoc() == ["PLT2"]
+
+
+def test_indices_reconstruidos_do_diario(pasta):
+    tabela = Tabela_Assoc("assoc_teste")
+    tabela.associa("PLT1", "P1")
+    tabela.associa("PLT2", "P2")
+    tabela.desassocia("P1")
+    tabela.associa("PLT1", "P3")
+
+    recarregada = Tabela_Assoc("assoc_teste")
+    assert _consistente(recarregada) == _consistente(tabela)
+    assert recarregada.palete_produto("PLT1") == "P3"
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8") as f:
+        return [linha[:2] for linha in csv.reader(f)][1:]
+
+
+def test_snapshot_mantem_a_ordem_de_insercao(pasta):
+    tabela = Tabela_Assoc("assoc_teste")
+    for palete, produto in [("PLT1", "P1"), ("PLT2", "P2"), ("PLT1", "P3"), ("PLT3", "P4"), ("PLT2", "P5")]:
+        tabela.associa(palete, produto)
+    tabela.desassocia("P2")
+    tabela.salvarDadosLocais()
+    assert _linhas_csv(tabela.csvPath) == [["P1", "PLT1"], ["P3", "PLT1"], ["P4", "PLT3"], ["P5", "PLT2"]]
+
+
+def test_diario_e_compactacao_reproduzem_a_tabela(pasta):
+    tabela = Tabela_Assoc("assoc_teste")
+    tabela.diario.limite_compactacao = 3      # compacta no meio das operações
+    operacoes = [("A", "PLT1", "P1"), ("A", "PLT2", "P2"), ("A", "PLT3", "P3"), ("D", "P2"),
+                 ("A", "PLT2", "P4"), ("A", "PLT1", "P5"), ("D", "P1"), ("A", "PLT4", "P6")]
+    for op in operacoes:
+        if op[0] == "A":
+            tabela.associa(op[1], op[2])
+        else:
+            tabela.desassocia(op[1])
+    assert tabela.csvPath.exists() and tabela.diario.registros_pendentes > 0
+
+    # snapshot + diário pendente
+    recarregada = Tabela_Assoc("assoc_teste")
+    assert list(recarregada._ordem.values()) == list(tabela._ordem.values())
+    assert recarregada.palete_produto("PLT1") == "P5"
+
+    # compactar de novo reproduz a mesma tabela, na mesma ordem
+    recarregada.salvarDadosLocais()
+    final = Tabela_Assoc("assoc_teste")
+    assert list(final._ordem.values()) == list(tabela._ordem.values())
+    assert _linhas_csv(final.csvPath) == [[pr, pl] for pl, pr, _ in tabela._ordem.values()]
@@ -0,0 +1,85 @@
+# tests/test_diario.py
+import pandas as pd
+
+from auxiliares.diario import DiarioAppend, fechar_diarios_removidos
+
+
+def _novo_posto():
+    from app.simulacao import MqttSimulado
+    from auxiliares.classes import Posto
+    return Posto("posto_1", MqttSimulado(), ultimo_posto=2)
+
+
+def _rodar_ciclos(posto, inicio, fim):
+    for i in range(inicio, fim):
+        posto.inicia_montagem(arrival=100.0 + i)
+        posto.atualiza_produto(f"P{i:03d}")
+        posto.atualizar_tempo(f"P{i:03d}", "tempo_preparo", 1.5 + i)
+        posto.atualizar_tempo(f"P{i:03d}", "tempo_montagem", 2.25)
+        if i % 2 == 0:
+            posto.atualizar_tempo(f"P{i:03d}", "tempo_espera", 0.5)
+
+
+def _tabela(posto) -> pd.DataFrame:
+    return posto.historico.to_dataframe().reset_index(drop=True)
+
+
+def test_anexar_ler_e_truncar(pasta):
+    diario = DiarioAppend(pasta / "d.journal.csv", limite_compactacao=3)
+    diario.anexar("N", 0)
+    diario.anexar_varios([("S", 0, "produto", "P1"), ("S", 0, "tempo_espera", None)])
+    assert list(diario.registros()) == [["N", "0"], ["S", "0", "produto", "P1"], ["S", "0", "tempo_espera", ""]]
+    assert diario.precisa_compactar()
+
+    diario.truncar()
+    assert not diario.caminho.exists()
+    assert list(diario.registros()) == []
+    assert diario.registros_pendentes == 0
+
+    diario.anexar("N", 1)
+    assert diario.contar_registros() == 1
+
+
+def test_fechar_diarios_removidos(pasta):
+    diario = DiarioAppend(pasta / "d.journal.csv")
+    diario.anexar("N", 0)
+    assert fechar_diarios_removidos() == 0
+
+    diario.caminho.unlink()  # ex: apagar_arquivos_sistema
+    assert diario.arquivo_removido()
+    assert fechar_diarios_removidos() == 1
+    assert diario.registros_pendentes == 0
+
+    diario.anexar("N", 1)
+    assert list(diario.registros()) == [["N", "1"]]
+
+
+def test_diario_reconstroi_o_historico_no_meio_da_producao(pasta):
+    posto = _novo_posto()
+    _rodar_ciclos(posto, 0, 5)
+    assert posto.diario.registros_pendentes > 0
+
+    # queda do processo sem compactar: o CSV não existe, só o diário
+    reconstruido = _novo_posto()
+    pd.testing.assert_frame_equal(_tabela(reconstruido), _tabela(posto))
+    assert reconstruido.historico.produtos_completos() == posto.historico.produtos_completos()
+
+
+def test_diario_depois_da_compactacao(pasta):
+    posto = _novo_posto()
+    _rodar_ciclos(posto, 0, 4)
+    posto.salvarDadosLocais()          # CSV consolidado + diário truncado
+    assert not posto.diario.caminho.exists()
+    _rodar_ciclos(posto, 4, 7)         # diário com o que veio depois
+
+    reconstruido = _novo_posto()
+    pd.testing.assert_frame_equal(_tabela(reconstruido), _tabela(posto))
+    assert reconstruido.historico.indices_produto("P005") == posto.historico.indices_produto("P005")
+
+
+def test_reaplicar_diario_duas_vezes_nao_duplica(pasta):
+    posto = _novo_posto()
+    _rodar_ciclos(posto, 0, 3)
+    reconstruido = _novo_posto()
+    reconstruido._reaplicar_diario(reconstruido.historico)
+    assert len(reconstruido.historico) == 3
@@ -0,0 +1,107 @@
+# tests/test_historico_ciclos.py
+import math
+
+import numpy as np
+import pandas as pd
+
+from auxiliares.historico_ciclos import COLS_POSTO, HistoricoCiclos
+
+
+def _linha_completa(produto, t=1.0):
+    return {"produto": produto, "arrival_time": t, "tempo_preparo": 2.0,
+            "tempo_montagem": 3.0, "tempo_espera": 0.5, "ordem_producao": "OP1", "hora": "01/01/2025, 08:00:00"}
+
+
+def test_capacidade_dobra_sem_perder_linhas():
+    hist = HistoricoCiclos()
+    assert len(hist._tempos) == 256
+    for i in range(600):
+        hist.nova_linha({"produto": f"P{i}", "arrival_time": float(i)})
+    assert len(hist) == 600
+    assert len(hist._tempos) == 1024
+    assert [hist.get(i, "arrival_time") for i in (0, 255, 256, 599)] == [0.0, 255.0, 256.0, 599.0]
+    assert hist.get(599, "tempo_ciclo") is None
+    assert hist.indices_produto("P300") == [300]
+
+
+def test_none_nan_ida_e_volta():
+    hist = HistoricoCiclos()
+    idx = hist.nova_linha({"produto": "P1", "tempo_preparo": None, "tempo_montagem": 4})
+    assert hist.get(idx, "tempo_preparo") is None
+    assert hist.get(idx, "tempo_montagem") == 4.0
+    assert hist.get(idx, "ordem_producao") is None
+
+    df = hist.to_dataframe()
+    assert math.isnan(df.loc[0, "tempo_preparo"])
+    assert df.loc[0, "ordem_producao"] is None
+
+    volta = HistoricoCiclos.from_dataframe(df)
+    assert volta.get(0, "tempo_preparo") is None
+    assert volta.get(0, "ordem_producao") is None
+    hist.set(idx, "tempo_montagem", None)
+    assert hist.get(idx, "tempo_montagem") is None
+
+
+def test_indices_e_completos_quando_o_produto_muda():
+    hist = HistoricoCiclos()
+    a = hist.nova_linha(_linha_completa("P1"))
+    b = hist.nova_linha({"produto": "P2", "arrival_time": 2.0})
+    assert hist.indices_produto("P1") == [a]
+    assert hist.produto_completo("P1")
+    assert not hist.produto_completo("P2")
+
+    # a linha completa passa a ser do P2 (_mover_produto)
+    hist.set(a, "produto", "P2")
+    assert hist.indices_produto("P1") == []
+    assert hist.indices_produto("P2") == [a, b]
+    assert not hist.produto_completo("P1")
+    # vale a última linha do produto (b), ainda incompleta
+    assert not hist.produto_completo("P2")
+
+    for col in ("tempo_preparo", "tempo_montagem", "tempo_espera"):
+        hist.set(b, col, 1.0)
+    assert hist.produto_completo("P2")
+
+    hist.set(b, "produto", None)
+    assert hist.indices_produto("P2") == [a]
+    assert hist.produto_completo("P2")      # a (completa) volta a ser a última
+    hist.set(a, "tempo_espera", None)
+    assert not hist.produto_completo("P2")
+    assert hist.produtos() == {"P2"}
+
+
+def test_dataframe_e_csv_equivalentes(tmp_path):
+    hist = HistoricoCiclos()
+    hist.nova_linha(_linha_completa("P1", 1.0))
+    hist.nova_linha({"produto": "P2", "arrival_time": 2.5, "tempo_preparo": 1.25})
+    hist.nova_linha({"arrival_time": 3.0})
+
+    df = hist.to_dataframe()
+    assert list(df.columns) == COLS_POSTO
+
+    caminho = tmp_path / "POSTO_0.csv"
+    df.to_csv(caminho, index=False)
+    lido = HistoricoCiclos.from_dataframe(pd.read_csv(caminho))
+    assert [lido.linha(i) for i in range(len(lido))] == [hist.linha(i) for i in range(len(hist))]
+    assert lido.produtos_completos() == {"P1"}
+    pd.testing.assert_frame_equal(lido.to_dataframe(), df)
+
+
+def test_from_dataframe_com_colunas_antigas():
+    # CSV antigo: sem tempo_transferencia/tempo_ciclo e com uma coluna a mais
+    antigo = pd.DataFrame({
+        "produto": ["P1", np.nan],
+        "arrival_time": [1.0, 2.0],
+        "tempo_preparo": [2.0, np.nan],
+        "tempo_montagem": [3.0, np.nan],
+        "tempo_espera": [0.5, np.nan],
+        "ordem_producao": ["OP1", "OP1"],
+        "hora": ["01/01/2025, 08:00:00", "01/01/2025, 08:01:00"],
+        "coluna_removida": [1, 2],
+    })
+    hist = HistoricoCiclos.from_dataframe(antigo)
+    assert len(hist) == 2
+    assert hist.get(0, "tempo_ciclo") is None
+    assert hist.get(1, "produto") is None
+    assert hist.produto_completo("P1")
+    assert list(hist.to_dataframe().columns) == COLS_POSTO
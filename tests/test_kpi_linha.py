@@ -0,0 +1,139 @@
+# tests/test_kpi_linha.py
+import pytest
+
+from app.kpi_linha import KpiLinha
+from auxiliares.relogio import RelogioVirtual
+
+POSTOS = ("posto_0", "posto_1", "posto_2")
+
+
+@pytest.fixture
+def relogio():
+    return RelogioVirtual(epoch_inicial=0.0)
+
+
+@pytest.fixture
+def kpi(relogio, monkeypatch):
+    monkeypatch.setenv("TEMPO_TURNO_H", "8")
+    return KpiLinha(POSTOS, alfa=0.2, janela_vazao_s=100.0, relogio=relogio)
+
+
+def _concluir(kpi, relogio, instantes):
+    for t in instantes:
+        relogio.ajustar(t)
+        kpi.registrar_conclusao()
+
+
+def test_sem_conclusoes(kpi):
+    r = kpi.resumo(meta=10)
+    assert (r["produzidos"], r["vazao_h"], r["ritmo_s"], r["gargalo"]) == (0, None, None, None)
+    assert r["takt_s"] == 2880.0
+
+
+def test_uma_conclusao_nao_tem_vazao_nem_ritmo(kpi, relogio):
+    _concluir(kpi, relogio, [12.0])
+    r = kpi.resumo(meta=480)
+    assert r["produzidos"] == 1
+    assert (r["vazao_h"], r["ritmo_s"], r["aderencia_takt"]) == (None, None, None)
+    assert r["takt_s"] == 60.0
+
+
+def test_vazao_na_janela_e_ritmo_ewma(kpi, relogio):
+    _concluir(kpi, relogio, [0.0, 30.0, 90.0])
+    r = kpi.resumo(meta=480)
+    # 2 intervalos em 90 s
+    assert r["vazao_h"] == 80.0
+    # EWMA(alfa=0.2) dos intervalos 30, 60
+    assert r["ritmo_s"] == 36.0
+    assert r["aderencia_takt"] == round(60.0 / 36.0, 3)
+
+    _concluir(kpi, relogio, [100.0])
+    relogio.ajustar(120.0)
+    r = kpi.resumo(meta=480)
+    # janela de 100 s: a conclusão em t=0 saiu, 30/90/100 ficaram
+    assert r["produzidos"] == 4
+    assert r["vazao_h"] == round(2 * 3600.0 / 70.0, 1)
+    assert r["ritmo_s"] == round(0.2 * 10.0 + 0.8 * 36.0, 2)
+
+    # sem conclusões na janela: vazão indefinida, o ritmo continua o último
+    relogio.ajustar(500.0)
+    r = kpi.resumo(meta=480)
+    assert r["vazao_h"] is None and r["ritmo_s"] == 30.8
+
+
+def test_meta_zero_sem_takt(kpi, relogio):
+    _concluir(kpi, relogio, [0.0, 30.0])
+    r = kpi.resumo(meta=0)
+    assert r["ritmo_s"] == 30.0
+    assert (r["takt_s"], r["aderencia_takt"]) == (None, None)
+
+
+def test_gargalo_pelo_ewma_de_trabalho(kpi):
+    kpi.registrar_tempo("posto_0", "tempo_preparo", 10.0)
+    kpi.registrar_tempo("posto_0", "tempo_montagem", 20.0)
+    kpi.registrar_tempo("posto_0", "tempo_montagem", 60.0)   # EWMA: 0.2*60 + 0.8*20 = 28
+    kpi.registrar_tempo("posto_0", "tempo_espera", 500.0)    # bloqueado: não é trabalho
+    kpi.registrar_tempo("posto_1", "tempo_preparo", 5.0)
+    kpi.registrar_tempo("posto_1", "tempo_montagem", 40.0)
+    kpi.registrar_tempo("posto_2", "tempo_preparo", 90.0)    # sem montagem: fora da comparação
+    kpi.registrar_tempo("posto_9", "tempo_preparo", 1.0)     # posto desconhecido: ignorado
+    kpi.registrar_tempo("posto_1", "tempo_transferencia", 99.0)  # campo fora dos KPIs
+
+    r = kpi.resumo()
+    assert (r["gargalo"], r["gargalo_trabalho_s"]) == ("posto_1", 45.0)
+    p0 = r["postos"]["posto_0"]
+    assert p0["trabalho_ewma_s"] == 38.0 and p0["carga_relativa"] == round(38.0 / 45.0, 3)
+    assert p0["montagem"] == {"n": 2, "media_s": 40.0, "ewma_s": 28.0, "janela_s": 40.0}
+    assert "trabalho_ewma_s" not in r["postos"]["posto_2"]
+    assert r["postos"]["posto_1"]["carga_relativa"] == 1.0
+
+
+def test_versao_e_limpar(kpi, relogio):
+    v0 = kpi.versao
+    kpi.registrar_tempo("posto_0", "tempo_preparo", 1.0)
+    _concluir(kpi, relogio, [5.0])
+    assert kpi.resumo()["versao"] == v0 + 2
+
+    kpi.limpar()
+    r = kpi.resumo()
+    assert r["versao"] == v0 + 3
+    assert (r["produzidos"], r["gargalo"]) == (0, None)
+    assert r["postos"]["posto_0"]["preparo"]["n"] == 0
+
+
+def test_vazao_usa_o_instante_do_bd_e_nao_o_do_processamento(pasta, monkeypatch):
+    """Worker atrasado: os BDs são processados juntos, bem depois de recebidos."""
+    import auxiliares.relogio as relogio_mod
+    from app.gerador_carga import uids_paletes
+    from app.simulacao import montar_linha_simulada
+    from auxiliares.configuracoes import cartao_palete
+
+    monkeypatch.setattr(relogio_mod, "_relogio", relogio_mod.relogio_atual())
+    monkeypatch.setenv("NUMERO_POSTOS", "1")
+    paletes = uids_paletes(3)
+    for uid, palete in paletes:
+        monkeypatch.setitem(cartao_palete, uid, palete)
+
+    relogio = RelogioVirtual(epoch_inicial=0.0)
+    linha = montar_linha_simulada(pasta=str(pasta), relogio=relogio)
+    sup = linha.supervisor
+    for pid in sup.postos:
+        sup.vision_state.update_estado(pid, "FINALIZADO")
+    relogio.ajustar(400.0)
+
+    for k, (uid, _) in enumerate(paletes):
+        base = 100.0 * k
+        for n, pid in enumerate(sup.postos):
+            posto = sup.postos[pid]
+            inicio = base + 20.0 * n
+            sup.processar_evento_dispositivo(posto, uid, inicio)
+            if pid == "posto_0":
+                assert linha.associar_produto_posto_0()
+            for dt, payload in ((5.0, "BT1"), (10.0, "BT2"), (15.0, "BD")):
+                sup.processar_evento_dispositivo(posto, payload, inicio + dt)
+
+    r = sup.kpi_atual()
+    assert r["produzidos"] == 3
+    # BDs do último posto em 35, 135 e 235 (e não todos em t=400)
+    assert r["ritmo_s"] == 100.0
+    assert r["vazao_h"] == 36.0
@@ -0,0 +1,59 @@
+# tests/test_mqtt_outbox.py
+import threading
+
+from auxiliares.mqtt_outbox import OutboxMQTT
+
+
+class ClienteGravador:
+    def __init__(self, falhas: int = 0):
+        self.publicados = []
+        self.falhas = falhas
+        self._lock = threading.Lock()
+
+    def publish(self, topico, payload=None, qos=0, retain=False):
+        with self._lock:
+            if self.falhas:
+                self.falhas -= 1
+                return (4, None)
+            self.publicados.append((topico, payload))
+            return (0, len(self.publicados))
+
+
+def test_acoes_nao_sao_coalescidas():
+    cliente = ClienteGravador()
+    outbox = OutboxMQTT(cliente, janela_s=0.05)
+    for payload in ("restart", "stop", "restart"):
+        outbox.enviar("sistema/camera/posto_1", payload)
+    outbox.enviar("rastreio_nfc/raspberry/posto_1/sistema", "batedor")
+    outbox.enviar("rastreio_nfc/raspberry/posto_1/sistema", "batedor")
+    assert outbox.drenar()
+
+    assert cliente.publicados == [
+        ("sistema/camera/posto_1", "restart"),
+        ("sistema/camera/posto_1", "stop"),
+        ("sistema/camera/posto_1", "restart"),
+        ("rastreio_nfc/raspberry/posto_1/sistema", "batedor"),
+        ("rastreio_nfc/raspberry/posto_1/sistema", "batedor"),
+    ]
+    assert outbox.estatisticas()["coalescidos"] == 0
+
+
+def test_topico_de_estado_coalescido_o_mais_novo_vence():
+    cliente = ClienteGravador()
+    outbox = OutboxMQTT(cliente, janela_s=0.05)
+    outbox.enviar("ControleProducao_DD", "Stop", atraso=5, coalescer=True)
+    outbox.enviar("ControleProducao_DD", "Start", coalescer=True)
+    assert outbox.drenar()
+
+    assert cliente.publicados == [("ControleProducao_DD", "Start")]
+    assert outbox.estatisticas()["coalescidos"] == 1
+
+
+def test_falha_volta_para_a_fila_sem_perder_a_acao():
+    cliente = ClienteGravador(falhas=1)
+    outbox = OutboxMQTT(cliente, janela_s=0.0)
+    outbox.enviar("sistema/camera/posto_2", "restart")
+    assert outbox.drenar()
+
+    assert cliente.publicados == [("sistema/camera/posto_2", "restart")]
+    assert outbox.estatisticas()["falhas"] == 1
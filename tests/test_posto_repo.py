@@ -0,0 +1,53 @@
+# tests/test_posto_repo.py
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import auxiliares.posto_repo as posto_repo
+from auxiliares.db_base_prod import BaseProd
+from auxiliares.posto_models import CicloProducao
+
+
+@pytest.fixture
+def banco(pasta, monkeypatch):
+    """Banco SQLite no lugar do Postgres de produção."""
+    engine = create_engine(f"sqlite:///{pasta / 'producao.db'}")
+    BaseProd.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(posto_repo, "SessionProducao", Session)
+    monkeypatch.setattr(posto_repo, "_garantir_particao", lambda momento: None)
+    return Session
+
+
+def _linhas(Session):
+    with Session() as s:
+        return s.execute(select(CicloProducao).order_by(CicloProducao.id)).scalars().all()
+
+
+def test_atualizacao_apos_despejo_do_mapa_nunca_vira_insert(banco, monkeypatch):
+    monkeypatch.setattr(posto_repo.EscritorPosto, "MAX_IDS_CONHECIDOS", 2)
+    escritor = posto_repo.EscritorPosto("posto_1")
+
+    aberta = escritor.nova_linha(produto=None, aberta=True)
+    assert escritor.drenar()
+    fechados = []
+    for i in range(4):
+        h = escritor.nova_linha(produto=f"P{i}", aberta=True)
+        escritor.atualizar(h, aberta=False)
+        assert escritor.drenar()
+        fechados.append(h)
+
+    # a linha aberta continua conhecida mesmo com o mapa acima do limite
+    escritor.atualizar(aberta, tempo_ciclo=9.0)
+    # a última fechada ainda recebe tempos (db_row_id_ultima do posto)
+    escritor.atualizar(fechados[-1], tempo_transferencia=1.5)
+    # a mais antiga foi despejada: a atualização é descartada, sem INSERT
+    escritor.atualizar(fechados[0], tempo_transferencia=2.5)
+    assert escritor.drenar()
+
+    linhas = _linhas(banco)
+    assert len(linhas) == 5
+    assert linhas[0].tempo_ciclo == 9.0 and linhas[0].aberta
+    assert linhas[-1].tempo_transferencia == 1.5
+    assert linhas[1].tempo_transferencia is None
+    assert [l.aberta for l in linhas[1:]] == [False] * 4
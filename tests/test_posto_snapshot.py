@@ -0,0 +1,32 @@
+# tests/test_posto_snapshot.py
+from app.simulacao import MqttSimulado
+from auxiliares.classes import Posto, PostoState
+
+
+def _novo_posto(pasta):
+    return Posto("posto_1", MqttSimulado(), ultimo_posto=2)
+
+
+def test_snapshot_em_cache_ate_um_setter_alterar_o_posto(pasta):
+    posto = _novo_posto(pasta)
+    s0 = posto.snapshot()
+    assert posto.snapshot() is s0
+
+    posto.set_palete_atual("PALETE01")
+    s1 = posto.snapshot()
+    assert s1.palete == "PALETE01" and s1.versao == s0.versao + 1
+
+    posto.add_funcionario("Ana", "ana.png")
+    s2 = posto.snapshot()
+    assert (s2.funcionario_nome, s2.funcionario_imagem) == ("Ana", "ana.png")
+
+    posto.atualizar_estado(2)
+    assert posto.snapshot().state is PostoState.BT1
+
+
+def test_setter_sem_mudanca_nao_gera_nova_versao(pasta):
+    posto = _novo_posto(pasta)
+    posto.set_palete_atual("PALETE01")
+    versao = posto.versao_snapshot
+    posto.set_palete_atual("PALETE01")
+    assert posto.versao_snapshot == versao
@@ -0,0 +1,51 @@
+# tests/test_rastreio_transporte.py
+import numpy as np
+import pytest
+
+from app.rastreio_transporte import EstatisticaTrecho, QuantilP2
+
+
+def _estimar(p, amostras):
+    q = QuantilP2(p)
+    for x in amostras:
+        q.adicionar(float(x))
+    return q.valor()
+
+
+def test_sem_amostras():
+    assert QuantilP2(0.5).valor() is None
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4])
+@pytest.mark.parametrize("p", [0.5, 0.95])
+def test_menos_de_cinco_amostras_e_exato(n, p):
+    amostras = [7.0, 1.5, 4.0, 2.25][:n]
+    assert _estimar(p, amostras) == pytest.approx(np.quantile(amostras, p))
+
+
+@pytest.mark.parametrize("p", [0.5, 0.95])
+def test_exato_ate_o_limite(p):
+    amostras = np.random.default_rng(3).exponential(2.0, QuantilP2.LIMITE_EXATO)
+    assert _estimar(p, amostras) == pytest.approx(np.quantile(amostras, p))
+
+
+@pytest.mark.parametrize("p", [0.5, 0.95])
+def test_estimativa_p2_converge_para_o_quantil(p):
+    # tempos de transporte: assimétricos à direita, como os reais
+    amostras = np.random.default_rng(7).lognormal(mean=1.0, sigma=0.4, size=20_000)
+    assert _estimar(p, amostras) == pytest.approx(np.quantile(amostras, p), rel=0.02)
+
+
+def test_resumo_do_trecho():
+    amostras = np.random.default_rng(11).normal(10.0, 1.0, 5_000)
+    est = EstatisticaTrecho()
+    for x in amostras:
+        est.adicionar(float(x))
+
+    r = est.resumo()
+    assert r["n"] == 5_000
+    assert r["media_s"] == pytest.approx(amostras.mean(), abs=1e-3)
+    assert r["desvio_s"] == pytest.approx(amostras.std(ddof=1), abs=1e-3)
+    assert (r["min_s"], r["max_s"]) == (round(amostras.min(), 3), round(amostras.max(), 3))
+    assert r["p50_s"] == pytest.approx(np.quantile(amostras, 0.5), rel=0.02)
+    assert r["p95_s"] == pytest.approx(np.quantile(amostras, 0.95), rel=0.02)
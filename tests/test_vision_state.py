@@ -0,0 +1,120 @@
+# tests/test_vision_state.py
+import dataclasses
+
+import pytest
+
+from auxiliares.relogio import RelogioVirtual
+from vision_state import ESTADOS_ORDEM, AnelTransicoes, VisionStateStore
+
+T0 = 1000.0
+
+
+@pytest.fixture
+def relogio():
+    return RelogioVirtual(epoch_inicial=T0)
+
+
+def _publicar(store, relogio, sequencia, posto="posto_1"):
+    """sequencia: [(t desde o início, estado)]"""
+    for t, estado in sequencia:
+        relogio.ajustar(t)
+        store.update_estado(posto, estado)
+
+
+# INICIO 0-10, MONTAGEM 10-10.4 (flap), INICIO 10.4-11 (flap), MONTAGEM 11-30, FINALIZADO 30-40
+SEQUENCIA = [(0, "INICIO"), (10, "MONTAGEM"), (10.4, "INICIO"), (11, "MONTAGEM"), (30, "FINALIZADO")]
+
+
+def test_anel_sobrescreve_a_transicao_mais_antiga():
+    anel = AnelTransicoes(3)
+    for i, estado in enumerate(["INICIO", "MONTAGEM", "FINALIZADO", "INICIO", "MONTAGEM"]):
+        anel.anexar(float(i), estado)
+
+    ts, estados = anel.copia()
+    assert len(anel) == 3
+    assert ts.tolist() == [2.0, 3.0, 4.0]
+    assert [ESTADOS_ORDEM[c] for c in estados] == ["FINALIZADO", "INICIO", "MONTAGEM"]
+
+    # cópias: escrever depois não altera o que já foi lido
+    anel.anexar(5.0, "FINALIZADO")
+    assert ts.tolist() == [2.0, 3.0, 4.0]
+
+
+def test_tempo_por_estado(relogio):
+    store = VisionStateStore(relogio=relogio)
+    _publicar(store, relogio, SEQUENCIA)
+    relogio.ajustar(40)
+
+    tempos = store.tempo_por_estado("posto_1")
+    assert tempos["INICIO"] == {"total_s": 10.6, "fracao": 0.265, "intervalos": 2, "media_s": 5.3, "max_s": 10.0}
+    assert tempos["MONTAGEM"] == {"total_s": 19.4, "fracao": 0.485, "intervalos": 2, "media_s": 9.7, "max_s": 19.0}
+    assert tempos["FINALIZADO"] == {"total_s": 10.0, "fracao": 0.25, "intervalos": 1, "media_s": 10.0, "max_s": 10.0}
+
+    # janela dos últimos 20 s: só o fim da MONTAGEM e o FINALIZADO em andamento
+    janela = store.tempo_por_estado("1", janela_s=20)
+    assert janela["INICIO"]["intervalos"] == 0 and janela["INICIO"]["media_s"] is None
+    assert janela["MONTAGEM"]["total_s"] == 10.0
+    assert janela["FINALIZADO"]["fracao"] == 0.5
+
+
+def test_taxa_flap(relogio):
+    store = VisionStateStore(relogio=relogio)
+    _publicar(store, relogio, SEQUENCIA)
+    relogio.ajustar(40)
+
+    flap = store.taxa_flap("posto_1", janela_s=60, limiar_s=1.0)
+    assert (flap["transicoes"], flap["flaps"]) == (5, 2)
+    assert (flap["transicoes_por_min"], flap["flaps_por_min"]) == (5.0, 2.0)
+
+    # janela curta: só a transição para FINALIZADO (em andamento, não é flap)
+    flap = store.taxa_flap("posto_1", janela_s=15, limiar_s=1.0)
+    assert (flap["transicoes"], flap["flaps"]) == (1, 0)
+
+
+def test_estavel_desde_ignora_mensagens_repetidas(relogio):
+    store = VisionStateStore(relogio=relogio)
+    assert store.estavel_desde("posto_1") is None
+
+    _publicar(store, relogio, SEQUENCIA + [(35, "FINALIZADO"), (38, "done")])
+    relogio.ajustar(40)
+
+    assert store.estavel_desde("posto_1") == {"estado": "FINALIZADO", "desde_ts": T0 + 30, "estavel_ha_s": 10.0}
+    assert store.estatisticas("posto_1")["transicoes_guardadas"] == len(SEQUENCIA)
+    assert store.is_finalizado("posto_1", min_stable_s=5, max_age_s=3)
+    assert not store.is_finalizado("posto_1", min_stable_s=5, max_age_s=1)
+
+
+def test_historico_do_posto_limitado_a_capacidade(relogio):
+    store = VisionStateStore(relogio=relogio, capacidade_historico=3)
+    _publicar(store, relogio, SEQUENCIA)
+    relogio.ajustar(40)
+
+    assert store.estatisticas("posto_1")["transicoes_guardadas"] == 3
+    # o histórico começa na 3ª transição (INICIO em 10.4)
+    tempos = store.tempo_por_estado("posto_1")
+    assert sum(v["total_s"] for v in tempos.values()) == pytest.approx(40 - 10.4)
+    assert tempos["INICIO"]["intervalos"] == 1
+
+
+def test_snapshot_trocado_inteiro_a_cada_mensagem(relogio):
+    store = VisionStateStore(relogio=relogio)
+    store.update_estado("posto_1", "MONTAGEM")
+    antes = store.get_snapshot("posto_1")
+
+    relogio.avancar(2)
+    assert store.update_estado("posto_1", "FINALIZADO")
+    depois = store.get_snapshot("posto_1")
+
+    # quem leu antes continua com o snapshot antigo, intacto
+    assert depois is not antes
+    assert (antes.estado, antes.since_ts, antes.last_seen_ts) == ("MONTAGEM", T0, T0)
+    assert (depois.estado, depois.since_ts, depois.last_seen_ts) == ("FINALIZADO", T0 + 2, T0 + 2)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        antes.estado = "FINALIZADO"
+
+    # mesma mensagem de novo: snapshot novo, mesmo "since", last_seen atualizado
+    relogio.avancar(1)
+    assert not store.update_estado("posto_1", "FINALIZADO")
+    ultimo = store.get_snapshot("posto_1")
+    assert ultimo is not depois
+    assert (ultimo.since_ts, ultimo.last_seen_ts) == (T0 + 2, T0 + 3)
@@ -2,16 +2,90 @@ from __future__ import annotations
 
 import json
 import re
-import time
 import threading
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict, Optional, Tuple, Any
 
+import numpy as np
+
+from auxiliares.relogio import relogio_atual
+
 
 VALID_ESTADOS = {"INICIO", "MONTAGEM", "FINALIZADO"}
 
+# variações aceitas (já em maiúsculas) -> estado canônico
+_ESTADOS = {
+    **{e: e for e in VALID_ESTADOS},
+    "FINISH": "FINALIZADO",
+    "DONE": "FINALIZADO",
+    "FINAL": "FINALIZADO",
+    "MOUNT": "MONTAGEM",
+    "ASSEMBLY": "MONTAGEM",
+    "START": "INICIO",
+    "BEGIN": "INICIO",
+}
+
+# código numérico de cada estado no histórico (arrays int8)
+ESTADOS_ORDEM = ("INICIO", "MONTAGEM", "FINALIZADO")
+_CODIGO_ESTADO = {e: i for i, e in enumerate(ESTADOS_ORDEM)}
+
+_RE_POSTO_TOPICO = re.compile(r"posto_\d+|\d+")
+_RE_POSTO_FIM_TOPICO = re.compile(r"/(?P<posto>posto_\d+|\d+)/estado$")
+_RE_NUMERO = re.compile(r"(\d+)")
+
+
+# -----------------------------------------------------------------------------
+# Parsing memorizado: as câmeras publicam sem parar, mas o conjunto de tópicos
+# e payloads distintos é pequeno. Cada string é analisada uma única vez.
+# -----------------------------------------------------------------------------
+@lru_cache(maxsize=256)
+def _posto_normalizado(posto: str) -> str:
+    posto = (posto or "").strip().lower()
+    if posto.isdigit():
+        return f"posto_{posto}"
+    if _RE_POSTO_TOPICO.fullmatch(posto) and posto.startswith("posto_"):
+        return posto
+    # fallback: tenta extrair número
+    m = _RE_NUMERO.search(posto)
+    if m:
+        return f"posto_{m.group(1)}"
+    return posto or "posto_0"
+
+@lru_cache(maxsize=256)
+def _posto_do_topico(topic: str) -> Optional[str]:
+    # Captura ".../(posto_2|2)/estado"
+    m = _RE_POSTO_FIM_TOPICO.search((topic or "").strip())
+    return _posto_normalizado(m.group("posto")) if m else None
+
+@lru_cache(maxsize=256)
+def _posto_do_nivel(nivel: str) -> Optional[str]:
+    """Segundo nível de visao/<posto>/estado (posto_2 ou 2)."""
+    return _posto_normalizado(nivel) if _RE_POSTO_TOPICO.fullmatch(nivel) else None
+
+@lru_cache(maxsize=256)
+def _estado_do_payload(payload: str) -> Optional[str]:
+    """Estado a partir do payload (texto puro ou JSON {"estado": ...}); None se inválido."""
+    payload = (payload or "").strip()
+
+    # payload pode ser JSON
+    estado = None
+    if payload.startswith("{") and payload.endswith("}"):
+        try:
+            data = json.loads(payload)
+            if isinstance(data, dict):
+                estado = data.get("estado") or data.get("state")
+        except Exception:
+            estado = None
+    else:
+        estado = payload
+
+    if not estado:
+        return None
+    return _ESTADOS.get(str(estado).strip().upper())
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class VisionSnapshot:
     posto: str                 # ex: "posto_0"
     estado: str                # "INICIO" | "MONTAGEM" | "FINALIZADO"
@@ -19,50 +93,83 @@ class VisionSnapshot:
     last_seen_ts: float        # quando recebemos a última msg MQTT desse posto
 
 
+class AnelTransicoes:
+    """
+    Histórico de transições (ts, estado) de um posto em arrays pré-alocados.
+    Ao encher, a transição mais antiga é sobrescrita: memória fixa.
+    """
+
+    __slots__ = ("_ts", "_estado", "_inicio", "_n")
+
+    def __init__(self, capacidade: int) -> None:
+        self._ts = np.zeros(capacidade, dtype=np.float64)
+        self._estado = np.zeros(capacidade, dtype=np.int8)
+        self._inicio = 0
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def anexar(self, ts: float, estado: str) -> None:
+        cap = len(self._ts)
+        i = (self._inicio + self._n) % cap
+        self._ts[i] = ts
+        self._estado[i] = _CODIGO_ESTADO[estado]
+        if self._n < cap:
+            self._n += 1
+        else:
+            self._inicio = (self._inicio + 1) % cap
+
+    def copia(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ts, estados) em ordem cronológica (cópias)."""
+        idx = (self._inicio + np.arange(self._n)) % len(self._ts)
+        return self._ts[idx], self._estado[idx]
+
+
 class VisionStateStore:
     """
     Cache do estado da visão por posto.
-    - Thread-safe (Flask + MQTT callbacks)
+    - Snapshots imutáveis, trocados inteiros a cada mensagem (copy-on-write):
+      leitores (is_finalizado a cada BT2, status) não pegam lock;
+      só as escritas são serializadas
     - Mantém "since" para debounce/estabilidade
     - Mantém "last_seen" para TTL/stale detection
+    - Guarda as últimas `capacidade_historico` transições de cada posto
+      (AnelTransicoes) para tempo por estado, flapping e "estável desde"
     """
 
-    def __init__(self) -> None:
-        self._lock = threading.RLock()
+    def __init__(self, relogio=None, capacidade_historico: int = 512) -> None:
+        self._relogio = relogio or relogio_atual()
+        self._lock = threading.Lock()  # só para escritores
         self._by_posto: Dict[str, VisionSnapshot] = {}
+        self._capacidade_historico = int(capacidade_historico)
+        self._historico: Dict[str, AnelTransicoes] = {}
 
     # ----------------------------
-    # API de consulta
+    # API de consulta (sem lock)
     # ----------------------------
 
     def get_estado(self, posto: str) -> str:
         """Retorna o estado atual (ou INICIO se não existir)."""
-        posto = self._normalize_posto(posto)
-        with self._lock:
-            snap = self._by_posto.get(posto)
-            return snap.estado if snap else "INICIO"
+        snap = self._by_posto.get(_posto_normalizado(posto))
+        return snap.estado if snap else "INICIO"
 
     def get_snapshot(self, posto: str) -> VisionSnapshot:
         """Retorna snapshot completo (cria default se não existir)."""
-        posto = self._normalize_posto(posto)
-        now = time.time()
+        posto = _posto_normalizado(posto)
+        snap = self._by_posto.get(posto)
+        if snap:
+            return snap
         with self._lock:
-            snap = self._by_posto.get(posto)
-            if snap:
-                return snap
-            default = VisionSnapshot(posto=posto, estado="INICIO", since_ts=now, last_seen_ts=0.0)
-            self._by_posto[posto] = default
-            return default
+            default = VisionSnapshot(posto=posto, estado="INICIO", since_ts=self._relogio.agora(), last_seen_ts=0.0)
+            return self._by_posto.setdefault(posto, default)
 
     def is_stale(self, posto: str, max_age_s: float = 3.0) -> bool:
         """True se o estado está 'velho' (sem update MQTT há muito tempo)."""
-        posto = self._normalize_posto(posto)
-        now = time.time()
-        with self._lock:
-            snap = self._by_posto.get(posto)
-            if not snap:
-                return True
-            return (now - snap.last_seen_ts) > float(max_age_s)
+        snap = self._by_posto.get(_posto_normalizado(posto))
+        if not snap:
+            return True
+        return (self._relogio.agora() - snap.last_seen_ts) > float(max_age_s)
 
     def is_finalizado(
         self,
@@ -77,23 +184,18 @@ class VisionStateStore:
         - FINALIZADO está estável por pelo menos min_stable_s
         """
 
-        posto = self._normalize_posto(posto)
-        now = time.time()
-
-        with self._lock:
-            snap = self._by_posto.get(posto)
-            if not snap:
-                return False
+        snap = self._by_posto.get(_posto_normalizado(posto))
+        if not snap or snap.estado != "FINALIZADO":
+            return False
 
-            # 🔵 Só aplica TTL se max_age_s NÃO for None
-            if max_age_s is not None:
-                if (now - snap.last_seen_ts) > float(max_age_s):
-                    return False
+        now = self._relogio.agora()
 
-            if snap.estado != "FINALIZADO":
+        # 🔵 Só aplica TTL se max_age_s NÃO for None
+        if max_age_s is not None:
+            if (now - snap.last_seen_ts) > float(max_age_s):
                 return False
 
-            return (now - snap.since_ts) >= float(min_stable_s)
+        return (now - snap.since_ts) >= float(min_stable_s)
 
     # ----------------------------
     # Atualização (interno)
@@ -104,29 +206,118 @@ class VisionStateStore:
         Atualiza o cache.
         Retorna True se houve mudança de estado.
         """
-        posto = self._normalize_posto(posto)
+        posto = _posto_normalizado(posto)
         estado = self._normalize_estado(estado)
-        now = ts or time.time()
+        now = ts or self._relogio.agora()
 
         with self._lock:
             prev = self._by_posto.get(posto)
-            if not prev:
-                self._by_posto[posto] = VisionSnapshot(
-                    posto=posto,
-                    estado=estado,
-                    since_ts=now,
-                    last_seen_ts=now,
-                )
-                return True
-
-            changed = (prev.estado != estado)
+            changed = prev is None or prev.estado != estado
+            since = now if changed else prev.since_ts
+            # troca atômica: quem já leu o snapshot anterior continua com ele
+            self._by_posto[posto] = VisionSnapshot(posto, estado, since, now)
             if changed:
-                prev.estado = estado
-                prev.since_ts = now
-
-            prev.last_seen_ts = now
+                anel = self._historico.get(posto)
+                if anel is None:
+                    anel = self._historico[posto] = AnelTransicoes(self._capacidade_historico)
+                anel.anexar(now, estado)
             return changed
 
+    # ----------------------------
+    # Histórico de transições
+    # ----------------------------
+
+    def postos_com_historico(self):
+        return sorted(self._historico)
+
+    def _transicoes(self, posto: str) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            anel = self._historico.get(posto)
+            if anel is None:
+                return np.zeros(0), np.zeros(0, dtype=np.int8)
+            return anel.copia()
+
+    def _intervalos(self, posto: str, janela_s: Optional[float]):
+        """
+        Intervalos (estado, início, fim, duração na janela) a partir das transições.
+        O último intervalo está em andamento (fim = agora).
+        """
+        ts, estados = self._transicoes(posto)
+        agora = self._relogio.agora()
+        if not len(ts):
+            return estados, ts, ts, ts, agora
+        fins = np.append(ts[1:], agora)
+        ini_janela = ts[0] if janela_s is None else agora - float(janela_s)
+        dentro = np.clip(fins, ini_janela, None) - np.clip(ts, ini_janela, None)
+        return estados, ts, fins, np.maximum(dentro, 0.0), agora
+
+    def tempo_por_estado(self, posto: str, janela_s: Optional[float] = None) -> Dict[str, dict]:
+        """
+        Tempo em cada estado (dentro da janela, ou em todo o histórico guardado):
+        total, fração, número de intervalos, duração média e máxima.
+        """
+        posto = _posto_normalizado(posto)
+        estados, _, _, dentro, _ = self._intervalos(posto, janela_s)
+        total_geral = float(dentro.sum()) if len(dentro) else 0.0
+        out = {}
+        for codigo, nome in enumerate(ESTADOS_ORDEM):
+            d = dentro[(estados == codigo) & (dentro > 0)]
+            total = float(d.sum()) if len(d) else 0.0
+            out[nome] = {
+                "total_s": round(total, 3),
+                "fracao": round(total / total_geral, 4) if total_geral > 0 else 0.0,
+                "intervalos": int(len(d)),
+                "media_s": round(float(d.mean()), 3) if len(d) else None,
+                "max_s": round(float(d.max()), 3) if len(d) else None,
+            }
+        return out
+
+    def taxa_flap(self, posto: str, janela_s: float = 60.0, limiar_s: float = 1.0) -> dict:
+        """
+        Quantas transições houve na janela e quantas delas foram "flaps"
+        (estado que durou menos de `limiar_s` antes de mudar de novo).
+        """
+        posto = _posto_normalizado(posto)
+        estados, inicios, fins, _, agora = self._intervalos(posto, janela_s)
+        na_janela = inicios >= agora - float(janela_s)
+        transicoes = int(na_janela.sum())
+        # o intervalo em andamento ainda não acabou: não conta como flap
+        curtos = (fins - inicios) < float(limiar_s)
+        if len(curtos):
+            curtos[-1] = False
+        flaps = int((na_janela & curtos).sum())
+        minutos = float(janela_s) / 60.0
+        return {
+            "janela_s": float(janela_s),
+            "limiar_s": float(limiar_s),
+            "transicoes": transicoes,
+            "flaps": flaps,
+            "transicoes_por_min": round(transicoes / minutos, 3) if minutos > 0 else None,
+            "flaps_por_min": round(flaps / minutos, 3) if minutos > 0 else None,
+        }
+
+    def estavel_desde(self, posto: str) -> Optional[dict]:
+        """Estado atual, desde quando e há quantos segundos (None se o posto nunca publicou)."""
+        snap = self._by_posto.get(_posto_normalizado(posto))
+        if not snap:
+            return None
+        return {
+            "estado": snap.estado,
+            "desde_ts": snap.since_ts,
+            "estavel_ha_s": round(self._relogio.agora() - snap.since_ts, 3),
+        }
+
+    def estatisticas(self, posto: str, janela_s: Optional[float] = None, limiar_flap_s: float = 1.0) -> dict:
+        """Resumo para o supervisório (REST /api/visao/...)."""
+        posto = _posto_normalizado(posto)
+        return {
+            "posto": posto,
+            "atual": self.estavel_desde(posto),
+            "tempo_por_estado": self.tempo_por_estado(posto, janela_s),
+            "flap": self.taxa_flap(posto, janela_s or 60.0, limiar_flap_s),
+            "transicoes_guardadas": len(self._historico.get(posto, ())),
+        }
+
     # ----------------------------
     # MQTT handler
     # ----------------------------
@@ -148,6 +339,24 @@ class VisionStateStore:
 
         self.update_estado(posto, estado)
 
+    def handle_evento_vision(self, evento: Any) -> None:
+        """
+        Handler do roteador MQTT (visao/+/estado): tópico e payload já vêm
+        decodificados, então o posto sai direto do segundo nível.
+        """
+        try:
+            posto = _posto_do_nivel(evento.partes[1])
+        except (AttributeError, IndexError):
+            return
+        if not posto:
+            return
+
+        estado = _estado_do_payload(evento.payload)
+        if not estado:
+            return
+
+        self.update_estado(posto, estado)
+
     # ----------------------------
     # Parsing / normalização
     # ----------------------------
@@ -159,68 +368,24 @@ class VisionStateStore:
         - topic: visao/0/estado        payload: {"estado":"MONTAGEM"}
         - topic: camera/posto_1/estado ...
         """
-        topic = (topic or "").strip()
-        payload = (payload or "").strip()
-
         posto = self._posto_from_topic(topic)
         if not posto:
             return None, None
 
-        # payload pode ser JSON
-        estado = None
-        if payload.startswith("{") and payload.endswith("}"):
-            try:
-                data = json.loads(payload)
-                if isinstance(data, dict):
-                    estado = data.get("estado") or data.get("state")
-            except Exception:
-                estado = None
-        else:
-            estado = payload
+        return posto, self._parse_estado(payload)
 
-        if not estado:
-            return posto, None
-
-        try:
-            estado = self._normalize_estado(str(estado))
-        except Exception:
-            return posto, None
-
-        return posto, estado
+    def _parse_estado(self, payload: str) -> Optional[str]:
+        """Estado a partir do payload (texto puro ou JSON {"estado": ...})."""
+        return _estado_do_payload(payload)
 
     def _posto_from_topic(self, topic: str) -> Optional[str]:
-        # Captura ".../(posto_2|2)/estado"
-        m = re.search(r"/(?P<posto>posto_\d+|\d+)/estado$", topic)
-        if not m:
-            return None
-        raw = m.group("posto")
-        return self._normalize_posto(raw)
+        return _posto_do_topico(topic)
 
     def _normalize_posto(self, posto: str) -> str:
-        posto = (posto or "").strip().lower()
-        if posto.isdigit():
-            return f"posto_{posto}"
-        if re.fullmatch(r"posto_\d+", posto):
-            return posto
-        # fallback: tenta extrair número
-        m = re.search(r"(\d+)", posto)
-        if m:
-            return f"posto_{m.group(1)}"
-        return posto or "posto_0"
+        return _posto_normalizado(posto)
 
     def _normalize_estado(self, estado: str) -> str:
-        estado = (estado or "").strip().upper()
-        # aceita variações
-        aliases = {
-            "FINISH": "FINALIZADO",
-            "DONE": "FINALIZADO",
-            "FINAL": "FINALIZADO",
-            "MOUNT": "MONTAGEM",
-            "ASSEMBLY": "MONTAGEM",
-            "START": "INICIO",
-            "BEGIN": "INICIO",
-        }
-        estado = aliases.get(estado, estado)
-        if estado not in VALID_ESTADOS:
-            raise ValueError(f"Estado inválido: {estado}")
-        return estado
+        normalizado = _ESTADOS.get(estado) or _ESTADOS.get((estado or "").strip().upper())
+        if normalizado is None:
+            raise ValueError(f"Estado inválido: {(estado or '').strip().upper()}")
+        return normalizado